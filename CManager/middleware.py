@@ -1,61 +1,74 @@
 from django.conf import settings
+from django.http import FileResponse
+from django.middleware.gzip import GZipMiddleware
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.db.utils import OperationalError, ProgrammingError
 
 
+class DownloadAwareGZipMiddleware(GZipMiddleware):
+    """与 GZipMiddleware 相同，但跳过文件下载（FileResponse / 附件）与分段响应（206）：
+    再压缩 PDF/ZIP 只浪费 CPU，还会破坏 Range 与 sendfile。"""
+
+    def process_response(self, request, response):
+        if isinstance(response, FileResponse) or response.status_code == 206:
+            return response
+        if response.get('Content-Disposition', '').startswith('attachment'):
+            return response
+        return super().process_response(request, response)
+
+
 class VisitTrackingMiddleware:
-    """统计每日页面访问量，写入 DailyStat 表。
+    """统计页面访问量，按日期、小时和路由名写入 DailyStat / HourlyVisitStat。
     静态文件、媒体文件、API 及管理接口不计入统计。
-    使用缓存批量聚合访问量，每 VISIT_STAT_FLUSH_INTERVAL 次请求才写一次 DB。"""
+    请求只在进程内存中累加，由 clubs.visit_stats 定时（VISIT_STAT_FLUSH_SECONDS）
+    及进程退出时批量写库，不产生同步的缓存或数据库往返。"""
     _SKIP_PREFIXES = ('/static/', '/media/', '/admin/', '/api/', '/sw.js', '/favicon')
 
     def __init__(self, get_response):
+        from clubs.visit_stats import visit_aggregator
+
         self.get_response = get_response
+        self.aggregator = visit_aggregator
 
     def __call__(self, request):
         response = self.get_response(request)
         path = request.path or ''
-        if not any(path.startswith(p) for p in self._SKIP_PREFIXES):
+        if not path.startswith(self._SKIP_PREFIXES):
             try:
-                from django.utils import timezone
-                from django.core.cache import cache
-                from clubs.models import DailyStat
-                from django.db.models import F
-
-                today = timezone.localdate()
-                flush_interval = getattr(settings, 'VISIT_STAT_FLUSH_INTERVAL', 20)
-                lock_seconds = getattr(settings, 'VISIT_STAT_FLUSH_LOCK_SECONDS', 5)
-                counter_key = f'visit_counter:{today}'
-
-                # 原子性递增计数器；若 key 不存在则初始化
-                if not cache.add(counter_key, 1, timeout=86400):
-                    count = cache.incr(counter_key)
-                else:
-                    count = 1
-
-                # 每累积 flush_interval 次才批量写入 DB
-                if count % flush_interval == 0:
-                    lock_key = f'visit_flush_lock:{today}'
-                    if cache.add(lock_key, 1, timeout=lock_seconds):
-                        DailyStat.objects.update_or_create(
-                            date=today,
-                            defaults={},
-                            create_defaults={'visits': 0},
-                        )
-                        DailyStat.objects.filter(date=today).update(
-                            visits=F('visits') + flush_interval
-                        )
+                match = getattr(request, 'resolver_match', None)
+                self.aggregator.record(match.view_name if match else '')
             except Exception:
                 pass
         return response
 
 
+class PrincipalMiddleware:
+    """在 request.principal 上挂载惰性的请求级身份对象（角色、社长社团、干事社团）。
+    需放在 AuthenticationMiddleware 之后；只有首次读取时才查询数据库。"""
+
+    def __init__(self, get_response):
+        from clubs.principal import lazy_principal
+
+        self.get_response = get_response
+        self._lazy_principal = lazy_principal
+
+    def __call__(self, request):
+        request.principal = self._lazy_principal(request)
+        return self.get_response(request)
+
+
 class InitialSetupMiddleware:
-    """首启引导中间件：如果还没有管理员账号，则强制进入 OOBE。"""
+    """首启引导中间件：如果还没有管理员账号，则强制进入 OOBE。
+    一旦确认存在管理员即设置进程级闩锁，此后每个请求直接放行；
+    需要重新检测时调用 clubs.oobe_bootstrap.reset_setup_complete()。"""
 
     def __init__(self, get_response):
+        from clubs.oobe_bootstrap import is_setup_complete
+
         self.get_response = get_response
+        self._is_setup_complete = is_setup_complete
+        self._oobe_url = None
 
     def _ensure_bootstrap_host_and_origin_trusted(self, request):
         """During first-run OOBE, trust current host/origin to avoid CSRF bootstrap deadlock."""
@@ -86,8 +99,13 @@ class InitialSetupMiddleware:
             settings.CSRF_TRUSTED_ORIGINS = trusted_origins
 
     def __call__(self, request):
+        if self._is_setup_complete():
+            return self.get_response(request)
+
         path = request.path or ''
-        oobe_url = reverse('clubs:oobe_setup')
+        if self._oobe_url is None:
+            self._oobe_url = reverse('clubs:oobe_setup')
+        oobe_url = self._oobe_url
         exempt_prefixes = (
             '/oobe/',
             '/static/',
@@ -107,18 +125,19 @@ class InitialSetupMiddleware:
             return self.get_response(request)
 
         try:
-            from clubs.oobe_bootstrap import bootstrap_oobe_if_needed
+            from clubs.oobe_bootstrap import HAS_ADMIN_CACHE_KEY, bootstrap_oobe_if_needed, mark_setup_complete
             from clubs.models import UserProfile
             from django.core.cache import cache
 
             bootstrap_oobe_if_needed()
 
-            cache_key = 'oobe:has_admin'
-            has_admin = cache.get(cache_key)
+            has_admin = cache.get(HAS_ADMIN_CACHE_KEY)
             if has_admin is None:
                 has_admin = UserProfile.objects.filter(role='admin').exists()
-                cache.set(cache_key, has_admin,
+                cache.set(HAS_ADMIN_CACHE_KEY, has_admin,
                           timeout=getattr(settings, 'INITIAL_SETUP_CACHE_SECONDS', 30))
+            if has_admin:
+                mark_setup_complete()
         except (OperationalError, ProgrammingError):
             has_admin = False
         except Exception:
@@ -157,12 +157,13 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'CManager.middleware.InitialSetupMiddleware',
     'CManager.middleware.VisitTrackingMiddleware',
-    'django.middleware.gzip.GZipMiddleware',
+    'CManager.middleware.DownloadAwareGZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'CManager.middleware.PrincipalMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -219,6 +220,10 @@ DATABASES = {
 
 if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
     DATABASES['default']['CONN_MAX_AGE'] = _env_int('SQLITE_CONN_MAX_AGE', _env_int('DB_CONN_MAX_AGE', 60))
+    # 测试库也用文件而不是内存库：内存库的共享缓存按表加锁且不等待，多线程的并发预约测试无法运行
+    DATABASES['default']['TEST'] = {
+        'NAME': os.getenv('SQLITE_TEST_NAME', str(Path(default_db_name).with_name('test_' + Path(default_db_name).name))),
+    }
     DATABASES['default']['OPTIONS'] = {
         'timeout': _env_int('SQLITE_TIMEOUT', 30),
         'init_command': (
@@ -292,10 +297,21 @@ elif _env_bool('SESSION_USE_CACHED_DB', True):
     SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
     SESSION_CACHE_ALIAS = 'default'
 
-# 并发调优参数 - 访问统计批量写入 & 初始化检测缓存
-VISIT_STAT_FLUSH_INTERVAL = _env_int('VISIT_STAT_FLUSH_INTERVAL', 20)
-VISIT_STAT_FLUSH_LOCK_SECONDS = _env_int('VISIT_STAT_FLUSH_LOCK_SECONDS', 5)
+# 并发调优参数 - 访问统计定时批量写入（秒） & 初始化检测缓存
+VISIT_STAT_FLUSH_SECONDS = _env_int('VISIT_STAT_FLUSH_SECONDS', 30)
 INITIAL_SETUP_CACHE_SECONDS = _env_int('INITIAL_SETUP_CACHE_SECONDS', 30)
+# 导航角标计数缓存时长（提交变更时会主动失效，此值只限制多进程 locmem 下的陈旧窗口）
+NAV_COUNTER_CACHE_SECONDS = _env_int('NAV_COUNTER_CACHE_SECONDS', 60)
+# 房间日程导出文件缓存时长（缓存键包含预约最新更新时间，数据变化后自动换键）
+ROOM_EXPORT_CACHE_SECONDS = _env_int('ROOM_EXPORT_CACHE_SECONDS', 600)
+# 动态表单通道编译结构的缓存时长（字段变更时会主动失效，此值只限制多进程 locmem 下的陈旧窗口）
+FORM_SCHEMA_CACHE_SECONDS = _env_int('FORM_SCHEMA_CACHE_SECONDS', 300)
+# 审核中心每栏每页条数（游标分页，“加载更多”时按同样条数追加）
+AUDIT_CENTER_PAGE_SIZE = _env_int('AUDIT_CENTER_PAGE_SIZE', 20)
+# 社长审批记录中每个通道“进行中 / 已处理”每页条数
+APPROVAL_CENTER_GROUP_SIZE = _env_int('APPROVAL_CENTER_GROUP_SIZE', 10)
+# 审核中心一次批量通过/打回的最大条数（整批在同一事务内加锁处理）
+BULK_REVIEW_MAX_ITEMS = _env_int('BULK_REVIEW_MAX_ITEMS', 100)
 
 
 # Password validation
@@ -339,6 +355,20 @@ STATICFILES_DIRS = [BASE_DIR / 'static'] if (BASE_DIR / 'static').exists() else
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# 文件下载交给前端代理发送：'x-accel-redirect'（Nginx）、'x-sendfile'（Apache/lighttpd），留空则由 Django 流式发送
+FILE_OFFLOAD_BACKEND = os.getenv('FILE_OFFLOAD_BACKEND', '').strip().lower()
+# X-Accel-Redirect 使用的 Nginx internal location，需映射到 MEDIA_ROOT
+FILE_OFFLOAD_INTERNAL_PREFIX = os.getenv('FILE_OFFLOAD_INTERNAL_PREFIX', '/protected-media/')
+# 公开媒体（站点图标、轮播图、头像、公告附件）的浏览器缓存时长（秒）
+MEDIA_PUBLIC_CACHE_SECONDS = _env_int('MEDIA_PUBLIC_CACHE_SECONDS', 30 * 24 * 3600)
+# 材料打包任务心跳超时（秒）：超过后视为进程已崩溃，下次查询进度时从检查点继续
+SUBMISSION_EXPORT_STALE_SECONDS = _env_int('SUBMISSION_EXPORT_STALE_SECONDS', 120)
+# 合并 Word 后台生成的线程数，以及占位超过多久（秒）未完成视为中断并重新排队
+WORD_MERGE_WORKERS = _env_int('WORD_MERGE_WORKERS', 1)
+WORD_MERGE_STALE_SECONDS = _env_int('WORD_MERGE_STALE_SECONDS', 600)
+# PDF 页面渲染进程数；渲染结果缓存在 MEDIA_ROOT/cache/pdf_pages，可随时清空
+PDF_RASTER_WORKERS = _env_int('PDF_RASTER_WORKERS', min(4, os.cpu_count() or 1))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
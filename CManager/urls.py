@@ -44,16 +44,13 @@ urlpatterns = [
 # 在生产环境中，静态文件应该由Web服务器提供，但为了解决当前问题，我们添加这个配置
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
-# 媒体文件服务 - 确保在所有环境下都能访问媒体文件
-# 注意：要确保这个配置不会与应用中的路由冲突
-from django.views.static import serve
+# 媒体文件服务：公开资源与受保护的上传文件在 clubs.media_serving 中分别鉴权，
+# 配置 FILE_OFFLOAD_BACKEND 后由前端代理发送文件内容
 from django.urls import re_path
+from clubs.media_serving import serve_media
 
 # 使用re_path而不是static函数，以确保正确处理中文文件名
 # 将媒体文件路由放在应用路由之后，避免冲突
 urlpatterns += [
-    re_path(r'^media/(?P<path>.*)$', serve, {
-        'document_root': settings.MEDIA_ROOT,
-    }),
+    re_path(r'^media/(?P<path>.*)$', serve_media, name='media'),
 ]
-
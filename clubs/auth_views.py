@@ -16,6 +16,7 @@ from PIL import Image
 from io import BytesIO
 from django.core.files.base import ContentFile
 from .lifecycle_utils import extend_inactive_account
+from .nav_counters import club_unread_total
 
 # 登录限制配置
 MAX_LOGIN_ATTEMPTS = 5
@@ -930,7 +931,7 @@ def user_dashboard(request):
     ).prefetch_related('responsible_staff', 'responsible_staff__staff')
     channels = list(FormChannel.objects.filter(is_active=True).prefetch_related('cycles').order_by('order', 'id'))
     club_ids = [club.id for club in clubs]
-    unread_total = FormSubmission.objects.filter(club_id__in=club_ids, status__in=['pending', 'rejected']).count()
+    unread_total = club_unread_total(club_ids)
 
     clubs_with_submission_status = []
     for club in clubs:
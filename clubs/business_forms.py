@@ -64,7 +64,9 @@ def missing_required_field_keys(channel) -> list[str]:
     action = get_business_action(channel.builtin_action)
     if not action:
         return []
-    existing = set(channel.fields.filter(is_active=True).values_list('field_key', flat=True))
+    from .form_schema import get_channel_schema
+
+    existing = get_channel_schema(channel).field_keys
     return [key for key in action.required_fields if key not in existing]
 
 
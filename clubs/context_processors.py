@@ -1,49 +1,94 @@
-"""上下文处理器：动态表单导航、审核数量和站点设置。"""
+"""上下文处理器：动态表单导航、审核数量和站点设置。
+
+所有值都包装成惰性对象，只有模板真正读取时才查询数据库或文件系统；
+同一请求内的计算结果缓存在 request 上，视图直接调用也不会重复计算。
+"""
 import os
 from django.conf import settings
-from .models import FormChannel, FormSubmission, Officer
+from django.utils.functional import SimpleLazyObject
+from .models import Club
+from .nav_counters import approval_channel_counts, audit_channel_counts, get_active_channels
+from .principal import get_principal
 
 
-def _get_president_club_ids(user):
-    return list(Officer.objects.filter(
-        user_profile__user=user,
-        position='president',
-        is_current=True
-    ).values_list('club_id', flat=True))
+DEFAULT_FONT_ICON_URL = 'https://fonts.font.im/icon?family=Material+Icons'
 
+_REQUEST_MEMO_ATTR = '_cmanager_context_memo'
 
-def site_settings(request):
+
+def _request_memo(request, key, builder):
+    """在请求对象上记忆计算结果，同一请求只计算一次。"""
+    memo = request.__dict__.setdefault(_REQUEST_MEMO_ATTR, {})
+    if key not in memo:
+        memo[key] = builder()
+    return memo[key]
+
+
+def _lazy_item(request, key, builder, item):
+    return SimpleLazyObject(lambda: _request_memo(request, key, builder)[item])
+
+
+def _favicon_url(base_media_url, filename):
+    """以文件修改时间作为版本号，文件不存在时返回 None。"""
+    try:
+        mtime = int(os.stat(os.path.join(settings.MEDIA_ROOT, 'site', filename)).st_mtime)
+    except OSError:
+        return None
+    return f"{base_media_url}site/{filename}?v={mtime}"
+
+
+def _build_site_settings():
     base_media_url = f"/{settings.MEDIA_URL.lstrip('/')}"
     if not base_media_url.endswith('/'):
         base_media_url = f"{base_media_url}/"
-    favicon_path = os.path.join(settings.MEDIA_ROOT, 'site', 'favicon.ico')
-    favicon_preview_path = os.path.join(settings.MEDIA_ROOT, 'site', 'favicon.png')
-    import time
-    cache_buster = int(time.time())
-    site_favicon_url = f"{base_media_url}site/favicon.ico?v={cache_buster}" if os.path.exists(favicon_path) else None
-    site_favicon_preview_url = f"{base_media_url}site/favicon.png?v={cache_buster}" if os.path.exists(favicon_preview_path) else None
 
     try:
         from .models import SiteSettings
         font_cfg = SiteSettings.get_settings()
-        font_icon_url = font_cfg.font_icon_url or 'https://fonts.font.im/icon?family=Material+Icons'
+        font_icon_url = font_cfg.font_icon_url or DEFAULT_FONT_ICON_URL
         body_font_url = font_cfg.body_font_url or ''
         body_font_family = font_cfg.body_font_family or ''
     except Exception:
-        font_icon_url = 'https://fonts.font.im/icon?family=Material+Icons'
+        font_icon_url = DEFAULT_FONT_ICON_URL
         body_font_url = ''
         body_font_family = ''
 
     return {
-        'site_favicon_url': site_favicon_url,
-        'site_favicon_preview_url': site_favicon_preview_url,
+        'site_favicon_url': _favicon_url(base_media_url, 'favicon.ico'),
+        'site_favicon_preview_url': _favicon_url(base_media_url, 'favicon.png'),
         'font_icon_url': font_icon_url,
         'body_font_url': body_font_url,
         'body_font_family': body_font_family,
     }
 
 
-def audit_center_counts(request):
+def get_site_settings(request):
+    return _request_memo(request, 'site_settings', _build_site_settings)
+
+
+def site_settings(request):
+    return {
+        key: _lazy_item(request, 'site_settings', _build_site_settings, key)
+        for key in (
+            'site_favicon_url',
+            'site_favicon_preview_url',
+            'font_icon_url',
+            'body_font_url',
+            'body_font_family',
+        )
+    }
+
+
+_AUDIT_CONTEXT_KEYS = (
+    'audit_center_counts',
+    'unread_approval_counts',
+    'active_form_channels',
+    'sidebar_primary_club',
+    'sidebar_president_clubs',
+)
+
+
+def _build_audit_center_counts(request):
     empty = {
         'audit_center_counts': {'total': 0, 'channels': {}},
         'unread_approval_counts': {'total': 0, 'channels': {}},
@@ -54,45 +99,22 @@ def audit_center_counts(request):
     if not request.user.is_authenticated:
         return empty
 
-    try:
-        role = request.user.profile.role
-    except Exception:
+    principal = get_principal(request.user)
+    if principal.role is None:
         return empty
 
-    channels = list(
-        FormChannel.objects.filter(is_active=True)
-        .exclude(slug='')
-        .order_by('order', 'id')
-    )
-    audit_channels = {}
-    approval_channels = {}
-    audit_total = 0
-    approval_total = 0
-
-    if role in ['staff', 'admin'] or request.user.is_superuser:
-        for channel in channels:
-            count = FormSubmission.objects.filter(channel=channel, status='pending').count()
-            audit_channels[channel.slug] = count
-            audit_total += count
+    channels = get_active_channels()
+    audit_total, audit_channels = 0, {}
+    approval_total, approval_channels = 0, {}
+
+    if principal.is_staff_or_admin:
+        audit_total, audit_channels = audit_channel_counts(channels)
 
     president_clubs = []
-    primary_club = None
-    if role == 'president':
-        president_clubs = list(Officer.objects.filter(
-            user_profile__user=request.user,
-            position='president',
-            is_current=True,
-        ).select_related('club').order_by('club__name'))
-        primary_club = president_clubs[0].club if president_clubs else None
-        club_ids = [item.club_id for item in president_clubs]
-        for channel in channels:
-            count = FormSubmission.objects.filter(
-                channel=channel,
-                club_id__in=club_ids,
-                status__in=['pending', 'rejected'],
-            ).count()
-            approval_channels[channel.slug] = count
-            approval_total += count
+    if principal.is_president:
+        if principal.president_club_ids:
+            president_clubs = list(Club.objects.filter(id__in=principal.president_club_ids).order_by('name'))
+        approval_total, approval_channels = approval_channel_counts(principal.president_club_ids, channels)
 
     result = {
         'audit_center_counts': {
@@ -101,11 +123,28 @@ def audit_center_counts(request):
         },
         'unread_approval_counts': {'total': approval_total, 'channels': approval_channels},
         'active_form_channels': channels,
-        'sidebar_primary_club': primary_club,
-        'sidebar_president_clubs': [item.club for item in president_clubs],
+        'sidebar_primary_club': president_clubs[0] if president_clubs else None,
+        'sidebar_president_clubs': president_clubs,
     }
     return result
 
 
+def get_audit_center_counts(request):
+    """返回导航计数字典（已求值），同一请求内多次调用只计算一次。"""
+    return _request_memo(request, 'audit_center_counts', lambda: _build_audit_center_counts(request))
+
+
+def audit_center_counts(request):
+    if request.user.is_authenticated:
+        # 基础模板总会读取 user.profile：先解析 Principal，让这一条带社团 ID 的
+        # 查询顺带填充 profile 缓存，避免模板与侧边栏各查一次
+        get_principal(request.user)
+    builder = lambda: _build_audit_center_counts(request)
+    return {
+        key: _lazy_item(request, 'audit_center_counts', builder, key)
+        for key in _AUDIT_CONTEXT_KEYS
+    }
+
+
 def unread_approvals(request):
     return audit_center_counts(request)
@@ -1,113 +1,91 @@
 """
 导出相关的视图函数
 """
-from django.shortcuts import redirect, get_object_or_404
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, Http404, JsonResponse
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Q, Count, Max
 from datetime import datetime, timedelta, time
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.worksheet import Worksheet
+import calendar
+import hashlib
+import io
 import urllib.parse
 
-from .models import RoomBooking, Room, FormSubmission, PublishedActivity
+from .file_serving import serve_file
+from .models import Room, RoomBooking, TimeSlot, FormChannel, FormCycle, FormSubmission, PublishedActivity, SubmissionExportJob
+from .room_availability import RoomAvailability
+from .submission_export import archive_path, get_or_start_export, resume_if_stale
 from .views import is_staff_or_admin
 
 
-def _is_staff(user):
-    """检查用户是否为干事"""
-    if not user.is_authenticated:
-        return False
-    try:
-        return user.profile.role == 'staff'
-    except:
-        return False
-
+# 未配置 TimeSlot 时使用的默认时间段
+DEFAULT_EXPORT_TIME_SLOTS = [
+    {'start': time(8, 15), 'end': time(9, 55), 'label': '第1-2节'},
+    {'start': time(10, 5), 'end': time(11, 40), 'label': '第3-4节'},
+    {'start': time(11, 40), 'end': time(13, 0), 'label': '午休'},
+    {'start': time(13, 0), 'end': time(14, 35), 'label': '第5-6节'},
+    {'start': time(14, 45), 'end': time(16, 20), 'label': '第7-8节'},
+    {'start': time(16, 20), 'end': time(18, 0), 'label': '课外时间'},
+    {'start': time(18, 0), 'end': time(19, 0), 'label': '晚餐'},
+    {'start': time(19, 0), 'end': time(20, 0), 'label': '晚间1'},
+    {'start': time(20, 0), 'end': time(21, 0), 'label': '晚间2'},
+    {'start': time(21, 0), 'end': time(22, 0), 'label': '晚间3'},
+]
 
-def _is_admin(user):
-    """检查用户是否为管理员"""
-    if not user.is_authenticated:
-        return False
-    try:
-        return user.profile.role == 'admin'
-    except:
-        return False
+WEEKDAY_NAMES = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
 
 
-@login_required(login_url='clubs:login')
-def export_room_bookings_weekly(request):
-    """
-    导出房间一周的预约日程为 xlsx 表格
-    表格以天为列，时间段为行
-    """
-    # 检查权限
-    if not is_staff_or_admin(request.user):
-        messages.error(request, '您没有权限导出日程安排')
-        return redirect('clubs:room_calendar')
-    
-    # 获取房间
-    room_id = request.GET.get('room_id')
-    if room_id:
-        room = get_object_or_404(Room, pk=room_id)
-    else:
-        # 默认使用第一个房间
-        room = Room.objects.first()
-        if not room:
-            messages.error(request, '系统中没有房间')
-            return redirect('clubs:room_calendar')
-
-    # 获取周开始日期
-    week_start_str = request.GET.get('week_start')
-    if week_start_str:
-        try:
-            week_start = datetime.strptime(week_start_str, '%Y-%m-%d').date()
-        except ValueError:
-            messages.error(request, '无效的日期格式')
-            return redirect('clubs:room_calendar')
-    else:
-        # 默认为当前周
-        today = timezone.now().date()
-        week_start = today - timedelta(days=today.weekday())
-    
-    week_end = week_start + timedelta(days=6)
-    
-    # 定义时间段
-    time_slots = [
-        {'start': time(8, 15), 'end': time(9, 55), 'label': '第1-2节(8:15-9:55)'},
-        {'start': time(10, 5), 'end': time(11, 40), 'label': '第3-4节(10:05-11:40)'},
-        {'start': time(11, 40), 'end': time(13, 0), 'label': '午休(11:40-13:00)'},
-        {'start': time(13, 0), 'end': time(14, 35), 'label': '第5-6节(13:00-14:35)'},
-        {'start': time(14, 45), 'end': time(16, 20), 'label': '第7-8节(14:45-16:20)'},
-        {'start': time(16, 20), 'end': time(18, 0), 'label': '课外时间(16:20-18:00)'},
-        {'start': time(18, 0), 'end': time(19, 0), 'label': '晚餐(18:00-19:00)'},
-        {'start': time(19, 0), 'end': time(20, 0), 'label': '晚间1(19:00-20:00)'},
-        {'start': time(20, 0), 'end': time(21, 0), 'label': '晚间2(20:00-21:00)'},
-        {'start': time(21, 0), 'end': time(22, 0), 'label': '晚间3(21:00-22:00)'},
+def _export_time_slots():
+    slots = [
+        {'start': slot.start_time, 'end': slot.end_time, 'label': slot.label}
+        for slot in TimeSlot.objects.filter(is_active=True).order_by('start_time')
     ]
-    
-    # 获取该周的所有有效预约
-    bookings = RoomBooking.objects.filter(
-        room=room,
-        booking_date__gte=week_start,
-        booking_date__lte=week_end,
-        status='active'
-    ).select_related('user__profile', 'club').order_by('booking_date', 'start_time')
-    
-    # 创建工作簿
-    wb = Workbook()
-    ws = wb.active
-    if ws is None:
-        ws = wb.create_sheet()
-    ws.title = f"{room.name}日程-{week_start.strftime('%Y年%m月%d日')}"
-    
-    # 定义样式
+    # 生成新的字典，不修改模块级的 DEFAULT_EXPORT_TIME_SLOTS
+    return [
+        {**slot, 'text': f"{slot['label']}({slot['start'].strftime('%H:%M')}-{slot['end'].strftime('%H:%M')})"}
+        for slot in slots or DEFAULT_EXPORT_TIME_SLOTS
+    ]
+
+
+def _export_cache_key(rooms, start_date, end_date, slots):
+    """缓存键包含房间、日期范围、时间段配置以及预约的最新更新时间和数量（物理删除也能失效）。"""
+    state = RoomBooking.objects.filter(
+        room__in=rooms,
+        booking_date__gte=start_date,
+        booking_date__lte=end_date,
+    ).aggregate(latest=Max('updated_at'), total=Count('id'))
+    signature = repr((
+        [(room.pk, room.name, room.updated_at.isoformat()) for room in rooms],
+        start_date.isoformat(),
+        end_date.isoformat(),
+        [slot['text'] for slot in slots],
+        state['latest'].isoformat() if state['latest'] else '',
+        state['total'],
+    ))
+    return 'room_schedule_export:' + hashlib.md5(signature.encode('utf-8')).hexdigest()
+
+
+def _build_room_schedule_workbook(rooms, start_date, end_date, slots):
+    """用 openpyxl 只写模式生成日程表：每个房间一个工作表，按周（周一至周日）纵向排列。"""
+    availability = RoomAvailability(rooms, start_date, end_date)
+    matrix = availability.slot_bookings(slots)
+
     header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
     header_font = Font(bold=True, color="FFFFFF", size=12)
     time_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
     time_font = Font(bold=True, size=11)
+    booked_fill = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
     center_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
     border = Border(
         left=Side(style='thin'),
@@ -115,123 +93,175 @@ def export_room_bookings_weekly(request):
         top=Side(style='thin'),
         bottom=Side(style='thin')
     )
-    
-    # 设置列宽
-    ws.column_dimensions['A'].width = 22
-    for col in range(2, 9):
-        ws.column_dimensions[get_column_letter(col)].width = 18
-    
-    # 写入标题
-    ws['A1'] = f"{room.name}日程安排 ({week_start.strftime('%Y年%m月%d日')} - {week_end.strftime('%m月%d日')})"
-    ws['A1'].font = Font(bold=True, size=14)
-    ws.merge_cells('A1:H1')
-    ws['A1'].alignment = center_alignment
-    
-    # 写入日期行
-    ws['A2'] = '时间段'
-    ws['A2'].fill = header_fill
-    ws['A2'].font = header_font
-    ws['A2'].alignment = center_alignment
-    ws['A2'].border = border
-    
-    weekdays = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
-    for i, day_offset in enumerate(range(7)):
-        current_date = week_start + timedelta(days=day_offset)
-        col = i + 2
-        col_letter = get_column_letter(col)
-        
-        # 写入日期和星期
-        header_text = f"{weekdays[i]}\n{current_date.strftime('%m-%d')}"
-        ws[f'{col_letter}2'] = header_text
-        ws[f'{col_letter}2'].fill = header_fill
-        ws[f'{col_letter}2'].font = header_font
-        ws[f'{col_letter}2'].alignment = center_alignment
-        ws[f'{col_letter}2'].border = border
-    
-    # 写入时间段和预约信息
-    for row_idx, slot in enumerate(time_slots, start=3):
-        row = row_idx
-        
-        # 时间段标签
-        ws[f'A{row}'] = slot['label']
-        ws[f'A{row}'].fill = time_fill
-        ws[f'A{row}'].font = time_font
-        ws[f'A{row}'].alignment = center_alignment
-        ws[f'A{row}'].border = border
-        ws[f'A{row}'].number_format = '@'
-        
-        # 为每一天填充预约信息
-        for day_offset in range(7):
-            current_date = week_start + timedelta(days=day_offset)
-            col = day_offset + 2
-            col_letter = get_column_letter(col)
-            
-            # 获取该日期该时间段的预约
-            day_bookings = bookings.filter(booking_date=current_date)
-            
-            # 找出与该时间段有重叠的预约
-            slot_bookings = []
-            for booking in day_bookings:
-                # 检查预约时间是否与时间段有重叠
-                if booking.start_time < slot['end'] and booking.end_time > slot['start']:
-                    slot_bookings.append(booking)
-            
-            # 显示预约信息
-            if slot_bookings:
-                booking_info = []
-                for booking in slot_bookings:
-                    club_name = booking.club.name if booking.club else "未关联社团"
-                    info = f"{club_name}\n({booking.start_time.strftime('%H:%M')}-{booking.end_time.strftime('%H:%M')})\n{booking.purpose}"
-                    booking_info.append(info)
-                
-                cell_value = '\n---\n'.join(booking_info)
-                ws[f'{col_letter}{row}'] = cell_value
-                ws[f'{col_letter}{row}'].fill = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
-            else:
-                ws[f'{col_letter}{row}'] = ''
-            
-            ws[f'{col_letter}{row}'].alignment = Alignment(
-                horizontal="center", 
-                vertical="center", 
-                wrap_text=True
+
+    def styled(ws, value, fill=None, font=None, number_format=None):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.alignment = center_alignment
+        cell.border = border
+        if fill:
+            cell.fill = fill
+        if font:
+            cell.font = font
+        if number_format:
+            cell.number_format = number_format
+        return cell
+
+    week_starts = []
+    week_start = start_date - timedelta(days=start_date.weekday())
+    while week_start <= end_date:
+        week_starts.append(week_start)
+        week_start += timedelta(days=7)
+
+    wb = Workbook(write_only=True)
+    used_titles = set()
+    for room in rooms:
+        # 工作表名最长 31 个字符且不能重复
+        title = room.name[:31]
+        if title in used_titles:
+            title = f"{room.name[:24]}-{room.pk}"[:31]
+        used_titles.add(title)
+        ws = wb.create_sheet(title=title)
+
+        # 只写模式下列宽、打印设置必须在写入第一行之前完成
+        ws.column_dimensions['A'].width = 22
+        for col in range(2, 9):
+            ws.column_dimensions[get_column_letter(col)].width = 18
+        ws.print_options.horizontalCentered = True
+        ws.page_setup.paperSize = Worksheet.PAPERSIZE_A4
+        ws.page_setup.orientation = 'landscape'
+        ws.page_setup.fitToWidth = 1
+        ws.page_setup.fitToHeight = 0
+        ws.sheet_properties.pageSetUpPr.fitToPage = True
+        ws.page_margins.left = 0.5
+        ws.page_margins.right = 0.5
+        ws.page_margins.top = 1
+        ws.page_margins.bottom = 1
+
+        room_days = matrix[room.pk]
+        row = 0
+        for week_start in week_starts:
+            week_end = week_start + timedelta(days=6)
+            title_cell = WriteOnlyCell(
+                ws,
+                value=f"{room.name}日程安排 ({week_start.strftime('%Y年%m月%d日')} - {week_end.strftime('%m月%d日')})",
             )
-            ws[f'{col_letter}{row}'].border = border
-        
-        # 设置行高
-        ws.row_dimensions[row].height = 60
-    
-    # 设置打印格式
-    ws.print_options.horizontalCentered = True
-    ws.page_setup.paperSize = ws.PAPERSIZE_A4
-    ws.page_setup.orientation = 'landscape'
-    
-    # 设置页边距
-    ws.page_margins.left = 0.5
-    ws.page_margins.right = 0.5
-    ws.page_margins.top = 1
-    ws.page_margins.bottom = 1
-    
-    # 设置打印区域和按页适配
-    ws.print_area = f'A1:H{2 + len(time_slots)}'
-    ws.page_setup.fitToHeight = 1
-    ws.page_setup.fitToWidth = 1
-    
+            title_cell.font = Font(bold=True, size=14)
+            title_cell.alignment = center_alignment
+            row += 1
+            ws.merged_cells.add(f'A{row}:H{row}')
+            ws.append([title_cell])
+
+            header = [styled(ws, '时间段', header_fill, header_font)]
+            for offset in range(7):
+                current_date = week_start + timedelta(days=offset)
+                header.append(styled(ws, f"{WEEKDAY_NAMES[offset]}\n{current_date.strftime('%m-%d')}", header_fill, header_font))
+            row += 1
+            ws.append(header)
+
+            for slot_idx, slot in enumerate(slots):
+                cells = [styled(ws, slot['text'], time_fill, time_font, '@')]
+                for offset in range(7):
+                    current_date = week_start + timedelta(days=offset)
+                    # 月度导出时首尾周可能超出范围，超出部分留空
+                    slot_bookings = room_days[current_date][slot_idx] if start_date <= current_date <= end_date else []
+                    if slot_bookings:
+                        booking_info = []
+                        for booking in slot_bookings:
+                            club_name = booking.club.name if booking.club else "未关联社团"
+                            booking_info.append(
+                                f"{club_name}\n({booking.start_time.strftime('%H:%M')}-{booking.end_time.strftime('%H:%M')})\n{booking.purpose}"
+                            )
+                        cells.append(styled(ws, '\n---\n'.join(booking_info), booked_fill))
+                    else:
+                        cells.append(styled(ws, ''))
+                row += 1
+                ws.row_dimensions[row].height = 60
+                ws.append(cells)
+
+            # 周与周之间空一行
+            row += 1
+            ws.append([])
+
+        ws.print_area = f'A1:H{max(row - 1, 1)}'
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+@login_required(login_url='clubs:login')
+def export_room_bookings_weekly(request):
+    """
+    导出房间预约日程为 xlsx 表格（周表或月表，可多选房间）
+    表格以天为列，时间段为行；每个房间一个工作表，月表按周纵向排列。
+
+    参数：room_id（可重复；取 all 表示全部可用房间，缺省为第一个房间）、
+    week_start（周表起始日期）、period=week|month、month=YYYY-MM（月表，缺省取 week_start 所在月）。
+    生成结果按（房间, 日期范围, 预约最新更新）缓存，多人重复下载直接命中缓存。
+    """
+    # 检查权限
+    if not is_staff_or_admin(request.user):
+        messages.error(request, '您没有权限导出日程安排')
+        return redirect('clubs:room_calendar')
+
+    # 获取房间
+    room_ids = [value for value in request.GET.getlist('room_id') if value]
+    if 'all' in room_ids:
+        rooms = list(Room.objects.filter(status='available'))
+    elif room_ids:
+        rooms = list(Room.objects.filter(pk__in=[value for value in room_ids if value.isdigit()]))
+        if not rooms:
+            raise Http404('房间不存在')
+    else:
+        # 默认使用第一个房间
+        rooms = list(Room.objects.all()[:1])
+    if not rooms:
+        messages.error(request, '系统中没有房间')
+        return redirect('clubs:room_calendar')
+
+    # 获取日期范围
+    period = request.GET.get('period', 'week')
+    try:
+        week_start_str = request.GET.get('week_start')
+        if week_start_str:
+            week_start = datetime.strptime(week_start_str, '%Y-%m-%d').date()
+        else:
+            # 默认为当前周
+            today = timezone.now().date()
+            week_start = today - timedelta(days=today.weekday())
+        if period == 'month':
+            month_str = request.GET.get('month')
+            month_start = datetime.strptime(month_str, '%Y-%m').date() if month_str else week_start.replace(day=1)
+            start_date = month_start.replace(day=1)
+            end_date = start_date.replace(day=calendar.monthrange(start_date.year, start_date.month)[1])
+        else:
+            start_date = week_start
+            end_date = week_start + timedelta(days=6)
+    except ValueError:
+        messages.error(request, '无效的日期格式')
+        return redirect('clubs:room_calendar')
+
+    slots = _export_time_slots()
+    cache_key = _export_cache_key(rooms, start_date, end_date, slots)
+    content = cache.get(cache_key)
+    if content is None:
+        content = _build_room_schedule_workbook(rooms, start_date, end_date, slots)
+        cache.set(cache_key, content, timeout=getattr(settings, 'ROOM_EXPORT_CACHE_SECONDS', 600))
+
     # 生成响应
     response = HttpResponse(
+        content,
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
-    filename = f"{room.name}日程-{week_start.strftime('%Y%m%d')}.xlsx"
+    room_label = rooms[0].name if len(rooms) == 1 else f'{len(rooms)}个房间'
+    if period == 'month':
+        filename = f"{room_label}日程-{start_date.strftime('%Y%m')}.xlsx"
+    else:
+        filename = f"{room_label}日程-{start_date.strftime('%Y%m%d')}.xlsx"
     response['Content-Disposition'] = f'attachment; filename*=UTF-8\'\'{urllib.parse.quote(filename)}'
-    
-    wb.save(response)
     return response
 
 
-
-
-
-
-
 # ---- Dynamic form exports ------------------------------------------------------
 
 def export_activities(request):
@@ -260,10 +290,7 @@ def export_audit_center_data(request, tab):
     from django.http import HttpResponse
     if not request.user.is_authenticated:
         return redirect('clubs:login')
-    try:
-        if request.user.profile.role not in ['staff', 'admin']:
-            return redirect('clubs:index')
-    except Exception:
+    if request.principal.role not in ['staff', 'admin']:
         return redirect('clubs:index')
 
     slug = tab.replace('_', '-')
@@ -285,3 +312,70 @@ def export_audit_center_data(request, tab):
             item.review_comment,
         ])
     return response
+
+
+def _export_job_payload(job):
+    payload = {
+        'success': True,
+        'id': job.pk,
+        'state': job.state,
+        'state_label': job.get_state_display(),
+        'processed': job.processed_files,
+        'total': job.total_files,
+        'percent': job.progress_percent,
+        'error': job.error,
+        'status_url': reverse('clubs:submission_export_status', args=[job.pk]),
+        'download_url': '',
+    }
+    if job.state == 'done':
+        payload['download_url'] = reverse('clubs:download_submission_export', args=[job.pk])
+    return payload
+
+
+@login_required(login_url=settings.LOGIN_URL)
+@require_POST
+def start_submission_export(request, tab):
+    """把通道（可选周期、状态）的全部提交材料按社团打包，后台执行，返回任务进度 JSON。"""
+    if not request.principal.is_staff_or_admin:
+        return JsonResponse({'success': False, 'message': '仅干事和管理员可以导出材料'}, status=403)
+
+    channel = get_object_or_404(FormChannel, slug=tab.replace('_', '-'))
+    cycle = None
+    cycle_id = request.POST.get('cycle', '').strip()
+    if cycle_id:
+        cycle = FormCycle.objects.filter(channel=channel, pk=cycle_id).first() if cycle_id.isdigit() else None
+        if cycle is None:
+            return JsonResponse({'success': False, 'message': '周期不存在'}, status=400)
+    status_filter = request.POST.get('status', '').strip()
+    if status_filter and status_filter not in dict(FormSubmission.STATUS_CHOICES):
+        return JsonResponse({'success': False, 'message': '无效的提交状态'}, status=400)
+
+    job = get_or_start_export(channel, cycle, status_filter, user=request.user)
+    return JsonResponse(_export_job_payload(job))
+
+
+@login_required(login_url=settings.LOGIN_URL)
+@require_GET
+def submission_export_status(request, job_id):
+    if not request.principal.is_staff_or_admin:
+        return JsonResponse({'success': False, 'message': '权限不足'}, status=403)
+    job = get_object_or_404(SubmissionExportJob, pk=job_id)
+    # 执行该任务的进程已退出时，由这次轮询重新拉起并从检查点继续
+    resume_if_stale(job)
+    return JsonResponse(_export_job_payload(job))
+
+
+@login_required(login_url=settings.LOGIN_URL)
+@require_GET
+def download_submission_export(request, job_id):
+    if not request.principal.is_staff_or_admin:
+        messages.error(request, '权限不足')
+        return redirect('clubs:index')
+    job = get_object_or_404(SubmissionExportJob.objects.select_related('channel', 'cycle'), pk=job_id)
+    path = archive_path(job)
+    if path is None:
+        raise Http404('压缩包不存在或尚未生成完成')
+    parts = [job.channel.name, job.cycle.name if job.cycle else '全部周期']
+    if job.status_filter:
+        parts.append(dict(FormSubmission.STATUS_CHOICES).get(job.status_filter, job.status_filter))
+    return serve_file(request, path, filename='-'.join(parts) + '.zip', content_type='application/zip')
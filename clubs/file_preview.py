@@ -0,0 +1,183 @@
+"""表单上传文件的站内预览：DOCX 转为轻量 HTML，PDF 逐页渲染为图片，图片直接显示。
+
+预览结果按 FormUploadedFile 缓存在 MEDIA_ROOT/cache/previews/ 下，缓存文件名由记录主键
+和存储路径摘要组成，原文件被替换后自动失效。PDF 页面图片复用 pdf_raster 的页面缓存，
+与合并 Word 共用同一份渲染结果；页面在浏览器请求时才渲染，长文档无需等待整本转换。
+"""
+import hashlib
+import json
+import os
+from html import escape
+
+from django.conf import settings
+
+from .pdf_raster import file_sha256, page_image_path, page_plan, render_page
+
+
+PREVIEW_DOCX = 'docx'
+PREVIEW_PDF = 'pdf'
+PREVIEW_IMAGE = 'image'
+
+_EXTENSION_KINDS = {
+    '.docx': PREVIEW_DOCX,
+    '.pdf': PREVIEW_PDF,
+    '.jpg': PREVIEW_IMAGE,
+    '.jpeg': PREVIEW_IMAGE,
+    '.png': PREVIEW_IMAGE,
+    '.gif': PREVIEW_IMAGE,
+    '.webp': PREVIEW_IMAGE,
+}
+
+# DOCX 预览最多输出的正文字符数，超出部分提示下载原文件查看
+MAX_DOCX_PREVIEW_CHARS = 200000
+
+# 预览 HTML 的生成规则变化时递增，使旧缓存失效
+PREVIEW_FORMAT_VERSION = 1
+
+
+def preview_kind(uploaded):
+    """可预览时返回预览类型，否则返回空字符串。"""
+    if not uploaded.file:
+        return ''
+    filename = uploaded.original_name or uploaded.file.name
+    return _EXTENSION_KINDS.get(os.path.splitext(filename)[1].lower(), '')
+
+
+def preview_cache_root():
+    return getattr(settings, 'FILE_PREVIEW_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'cache', 'previews'))
+
+
+def _cache_path(uploaded, suffix):
+    name_digest = hashlib.sha1(f'{PREVIEW_FORMAT_VERSION}:{uploaded.file.name}'.encode()).hexdigest()[:12]
+    return os.path.join(preview_cache_root(), str(uploaded.pk % 100), f'{uploaded.pk}-{name_digest}{suffix}')
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as handle:
+        handle.write(text)
+    os.replace(temp_path, path)
+
+
+def docx_preview_html(uploaded):
+    """DOCX 正文与表格转换后的 HTML 片段（内容均已转义），首次生成后从缓存读取。"""
+    cache_path = _cache_path(uploaded, '.html')
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as handle:
+            return handle.read()
+    html = render_docx_html(uploaded.file.path)
+    _write_atomic(cache_path, html)
+    return html
+
+
+def _run_html(run):
+    parts = []
+    if run._element.xpath('.//w:drawing | .//w:pict'):
+        parts.append('<span class="doc-image">[图片]</span>')
+    text = escape(run.text)
+    if text:
+        if run.bold:
+            text = f'<strong>{text}</strong>'
+        if run.italic:
+            text = f'<em>{text}</em>'
+        if run.underline:
+            text = f'<u>{text}</u>'
+        parts.append(text)
+    return ''.join(parts)
+
+
+def _paragraph_html(paragraph):
+    content = ''.join(_run_html(run) for run in paragraph.runs).replace('\n', '<br>')
+    if not content.strip():
+        return '', 0
+    style_name = (paragraph.style.name if paragraph.style is not None else '') or ''
+    if style_name == 'Title':
+        tag = 'h2'
+    elif style_name.startswith('Heading'):
+        tag = 'h3' if style_name.endswith(' 1') else 'h4'
+    else:
+        tag = 'p'
+    css_class = ' class="doc-list"' if style_name.startswith('List') else ''
+    return f'<{tag}{css_class}>{content}</{tag}>', len(paragraph.text)
+
+
+def _table_html(table):
+    rows = []
+    length = 0
+    for row in table.rows:
+        cells = []
+        # 横向合并的单元格在 row.cells 中重复出现，按底层元素合并为 colspan
+        for cell in row.cells:
+            if cells and cells[-1][0] is cell._tc:
+                cells[-1][1] += 1
+                continue
+            cells.append([cell._tc, 1, cell.text])
+        row_html = []
+        for _tc, span, text in cells:
+            colspan = f' colspan="{span}"' if span > 1 else ''
+            row_html.append(f'<td{colspan}>{escape(text.strip()).replace(chr(10), "<br>")}</td>')
+            length += len(text)
+        rows.append(f"<tr>{''.join(row_html)}</tr>")
+    return f"<table>{''.join(rows)}</table>", length
+
+
+def render_docx_html(path):
+    """按文档顺序输出段落（保留标题、加粗/斜体/下划线）与表格，图片以占位符标出。"""
+    from docx import Document
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = Document(path)
+    body = document.element.body
+    blocks = []
+    total = 0
+    for child in body.iterchildren():
+        tag = child.tag.rsplit('}', 1)[-1]
+        if tag == 'p':
+            html, length = _paragraph_html(Paragraph(child, document._body))
+        elif tag == 'tbl':
+            html, length = _table_html(Table(child, document._body))
+        else:
+            continue
+        if not html:
+            continue
+        blocks.append(html)
+        total += length
+        if total >= MAX_DOCX_PREVIEW_CHARS:
+            blocks.append('<p class="doc-notice">文档较长，预览只显示前面部分，请下载原文件查看全文。</p>')
+            break
+    if not blocks:
+        blocks.append('<p class="doc-notice">这个 Word 文档没有可提取的正文内容。</p>')
+    return '\n'.join(blocks)
+
+
+def pdf_preview_manifest(uploaded):
+    """PDF 的文件哈希与各页 DPI；缓存后再次打开预览无需重新计算哈希或读取页面尺寸。"""
+    cache_path = _cache_path(uploaded, '.json')
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as handle:
+            return json.load(handle)
+    path = uploaded.file.path
+    manifest = {
+        'hash': file_sha256(path),
+        'dpis': [dpi for _page_index, dpi in page_plan(path)],
+    }
+    _write_atomic(cache_path, json.dumps(manifest))
+    return manifest
+
+
+def pdf_preview_page_count(uploaded):
+    return len(pdf_preview_manifest(uploaded)['dpis'])
+
+
+def pdf_preview_page_path(uploaded, page_number):
+    """第 page_number 页（从 1 开始）的 PNG 路径，缺失时当场渲染该页；页码越界返回 None。"""
+    manifest = pdf_preview_manifest(uploaded)
+    if not 1 <= page_number <= len(manifest['dpis']):
+        return None
+    dpi = manifest['dpis'][page_number - 1]
+    target = page_image_path(manifest['hash'], page_number, dpi)
+    if os.path.exists(target):
+        return target
+    return render_page(uploaded.file.path, manifest['hash'], page_number, dpi)
@@ -0,0 +1,146 @@
+"""文件下载响应：鉴权之后交给前端代理发送（X-Accel-Redirect / X-Sendfile），
+未配置代理时由 Django 流式发送，支持 ETag / If-None-Match 与单段 HTTP Range。
+"""
+import mimetypes
+import os
+import re
+import urllib.parse
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class UnsafeFilePath(Exception):
+    """请求的路径不在允许的目录之内"""
+
+
+def resolve_media_path(relative_path):
+    """把相对 MEDIA_ROOT 的路径解析为绝对路径；越出 MEDIA_ROOT（含符号链接）时抛出 UnsafeFilePath。"""
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    full_path = os.path.realpath(os.path.join(media_root, relative_path))
+    if os.path.commonpath([media_root, full_path]) != media_root:
+        raise UnsafeFilePath(relative_path)
+    return full_path
+
+
+def _offload_backend():
+    return (getattr(settings, 'FILE_OFFLOAD_BACKEND', '') or '').strip().lower()
+
+
+def _content_disposition(filename, as_attachment):
+    disposition = 'attachment' if as_attachment else 'inline'
+    if not filename:
+        return disposition
+    return f"{disposition}; filename*=UTF-8''{urllib.parse.quote(filename)}"
+
+
+def _file_etag(stat):
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def _offload_response(full_path, backend):
+    """交给前端代理发送文件，Django 只返回响应头。"""
+    response = HttpResponse()
+    # 让代理按文件扩展名自行确定 Content-Type
+    del response['Content-Type']
+    if backend == 'x-accel-redirect':
+        relative_path = os.path.relpath(full_path, os.path.realpath(settings.MEDIA_ROOT))
+        prefix = getattr(settings, 'FILE_OFFLOAD_INTERNAL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + urllib.parse.quote(relative_path.replace(os.sep, '/'))
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+def _iter_file_range(full_path, start, length):
+    with open(full_path, 'rb') as handle:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(FILE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _parse_range(header, size):
+    """解析单段 Range 头，返回 (start, end)；多段或无法满足时返回 None。"""
+    match = _RANGE_RE.match(header.strip())
+    if not match or size == 0:
+        return None
+    first, last = match.groups()
+    if first == '' and last == '':
+        return None
+    if first == '':
+        # bytes=-N：最后 N 个字节
+        length = int(last)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start > end:
+        return None
+    return start, end
+
+
+def serve_file(request, full_path, filename=None, as_attachment=True, content_type=None, cache_control=None):
+    """在鉴权完成后发送本地文件。
+
+    FILE_OFFLOAD_BACKEND 为 'x-accel-redirect'（Nginx）或 'x-sendfile'（Apache/lighttpd）时，
+    只返回内部重定向头，由代理零拷贝发送；否则用 FileResponse 流式发送，
+    并处理 If-None-Match / If-Modified-Since（304）与 Range（206/416）。
+    """
+    stat = os.stat(full_path)
+    etag = _file_etag(stat)
+    backend = _offload_backend()
+
+    if backend in ('x-accel-redirect', 'x-sendfile'):
+        response = _offload_response(full_path, backend)
+    else:
+        response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            response = _stream_response(request, full_path, stat, etag, content_type)
+
+    if response.status_code != 304:
+        response['Content-Disposition'] = _content_disposition(filename, as_attachment)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if cache_control:
+        response['Cache-Control'] = cache_control
+    return response
+
+
+def _stream_response(request, full_path, stat, etag, content_type):
+    size = stat.st_size
+    if content_type is None:
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    range_header = request.headers.get('Range', '')
+    if_range = request.headers.get('If-Range', '')
+    # If-Range 与当前 ETag 不一致说明文件已变化，应返回完整内容
+    if range_header and (not if_range or if_range == etag):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(_iter_file_range(full_path, start, length), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+    else:
+        # FileResponse 分块读取，WSGI 服务器支持时还会使用 sendfile
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        response['Content-Length'] = str(size)
+    response['Accept-Ranges'] = 'bytes'
+    return response
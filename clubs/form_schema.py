@@ -0,0 +1,138 @@
+"""动态表单通道的编译期结构：启用字段（已排序）与解析好的校验规则，缓存在进程内与共享缓存中。
+
+提交、补交、审核页都要读取通道字段，并反复解析 FormField.validation / options。
+这里按通道把字段与规则编译一次：
+
+- 版本号由 FormChannel.updated_at 与该通道字段的（最大 updated_at, 数量）组成；
+  字段版本戳保存在共享缓存里，字段保存或删除后（signals）重新计算，因此多进程会一起失效。
+- 进程内副本以版本号校验，命中时整个读取过程不访问数据库，只读一次共享缓存的版本戳。
+
+返回的 FormField 实例在多个请求间共享，调用方只能读取，不能修改后保存。
+"""
+import threading
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .models import FormField
+
+
+FIELDS_STAMP_CACHE_KEY = 'form_schema:fields_stamp:{channel_id}'
+SCHEMA_CACHE_KEY = 'form_schema:schema:{channel_id}:{version}'
+
+_local_lock = threading.Lock()
+_local_schemas = {}
+
+
+def _cache_timeout():
+    return getattr(settings, 'FORM_SCHEMA_CACHE_SECONDS', 300)
+
+
+@dataclass(frozen=True)
+class FieldRules:
+    """单个字段解析后的校验规则。"""
+
+    options: tuple
+    option_set: frozenset
+    max_length: int | None
+    allowed_extensions: tuple
+    allowed_extension_set: frozenset
+    max_size_mb: int
+    allow_multiple: bool
+    merge_to_word: bool
+
+    @property
+    def max_size_bytes(self):
+        return self.max_size_mb * 1024 * 1024
+
+
+def compile_field_rules(field):
+    options = tuple(str(item) for item in field.options) if isinstance(field.options, list) else ()
+    try:
+        max_length = int(field.validation.get('max_length') or 0) or None
+    except (TypeError, ValueError):
+        max_length = None
+    allowed_extensions = tuple(str(item).lower() for item in field.allowed_extensions())
+    return FieldRules(
+        options=options,
+        option_set=frozenset(options),
+        max_length=max_length,
+        allowed_extensions=allowed_extensions,
+        allowed_extension_set=frozenset(allowed_extensions),
+        max_size_mb=field.max_size_mb(),
+        allow_multiple=field.allow_multiple_files(),
+        merge_to_word=field.merge_files_to_word(),
+    )
+
+
+@dataclass(frozen=True)
+class ChannelSchema:
+    channel_id: int
+    version: str
+    fields: tuple
+    rules: dict
+
+    @property
+    def field_keys(self):
+        return frozenset(field.field_key for field in self.fields)
+
+    def rules_for(self, field):
+        rules = self.rules.get(field.id)
+        return rules if rules is not None else compile_field_rules(field)
+
+    def fields_with_ids(self, field_ids):
+        """按通道顺序返回 id 在 field_ids 中的启用字段。"""
+        field_ids = set(field_ids)
+        return [field for field in self.fields if field.id in field_ids]
+
+
+def _fields_stamp(channel_id):
+    key = FIELDS_STAMP_CACHE_KEY.format(channel_id=channel_id)
+    stamp = cache.get(key)
+    if stamp is None:
+        row = FormField.objects.filter(channel_id=channel_id).aggregate(latest=Max('updated_at'), total=Count('id'))
+        stamp = f"{row['latest'].timestamp() if row['latest'] else 0}:{row['total']}"
+        cache.set(key, stamp, timeout=_cache_timeout())
+    return stamp
+
+
+def _compile(channel_id, version):
+    fields = tuple(FormField.objects.filter(channel_id=channel_id, is_active=True).order_by('order', 'id'))
+    return ChannelSchema(
+        channel_id=channel_id,
+        version=version,
+        fields=fields,
+        rules={field.id: compile_field_rules(field) for field in fields},
+    )
+
+
+def get_channel_schema(channel):
+    """返回通道当前版本的编译结构；依次查找进程内副本、共享缓存，都未命中时查询并编译。"""
+    channel_updated = channel.updated_at.timestamp() if channel.updated_at else 0
+    version = f'{channel_updated}:{_fields_stamp(channel.pk)}'
+
+    schema = _local_schemas.get(channel.pk)
+    if schema is not None and schema.version == version:
+        return schema
+
+    cache_key = SCHEMA_CACHE_KEY.format(channel_id=channel.pk, version=version)
+    schema = cache.get(cache_key)
+    if schema is None:
+        schema = _compile(channel.pk, version)
+        cache.set(cache_key, schema, timeout=_cache_timeout())
+    with _local_lock:
+        _local_schemas[channel.pk] = schema
+    return schema
+
+
+def invalidate_channel_schema(channel_id):
+    """字段新增、修改、删除后调用；在事务提交后才清除版本戳，避免读到旧字段再回填。"""
+    def _clear():
+        cache.delete(FIELDS_STAMP_CACHE_KEY.format(channel_id=channel_id))
+        with _local_lock:
+            _local_schemas.pop(channel_id, None)
+
+    transaction.on_commit(_clear)
@@ -0,0 +1,48 @@
+"""提交列表的游标（keyset）分页：按 (-submitted_at, id) 排序，用上一页最后一条定位下一页。
+
+与 OFFSET 分页不同，翻到多深都只读取一页的行，可直接利用以 -submitted_at 结尾的索引
+（fs_channel_status_idx / fs_club_status_idx）；翻页期间有新提交插入也不会重复或漏掉。
+游标是 “提交时间|主键” 的 URL 安全 base64，格式不对时按第一页处理。
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+KEYSET_ORDERING = ('-submitted_at', 'id')
+
+
+def encode_cursor(submission):
+    raw = f'{submission.submitted_at.isoformat()}|{submission.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """返回 (submitted_at, id)；游标为空或无法解析时返回 None。"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        submitted_at, pk = raw.split('|', 1)
+        return datetime.fromisoformat(submitted_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def keyset_page(queryset, cursor=None, page_size=20):
+    """取游标之后的一页，返回 (items, next_cursor)；没有下一页时 next_cursor 为空字符串。
+
+    多取一条判断是否还有下一页，不做 COUNT。
+    """
+    queryset = queryset.order_by(*KEYSET_ORDERING)
+    position = decode_cursor(cursor)
+    if position is not None:
+        submitted_at, pk = position
+        queryset = queryset.filter(Q(submitted_at__lt=submitted_at) | Q(submitted_at=submitted_at, id__gt=pk))
+    items = list(queryset[:page_size + 1])
+    if len(items) > page_size:
+        items = items[:page_size]
+        return items, encode_cursor(items[-1])
+    return items, ''
@@ -0,0 +1,52 @@
+"""按 FormSubmissionReview 重新计算提交的本次通过/打回计数，修复计数漂移。"""
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from clubs.models import FormSubmission, FormSubmissionReview
+
+
+def _tally(status):
+    reviews = (
+        FormSubmissionReview.objects.filter(
+            submission=OuterRef('pk'),
+            submission_attempt=OuterRef('resubmission_count'),
+            status=status,
+        )
+        .order_by()
+        .values('submission')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(reviews, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = '按审核记录重新计算每个提交的本次通过/打回计数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计不一致的提交，不写入')
+
+    def handle(self, *args, **options):
+        drifted = list(
+            FormSubmission.objects.annotate(actual_approved=_tally('approved'), actual_rejected=_tally('rejected'))
+            .exclude(current_approved_count=F('actual_approved'), current_rejected_count=F('actual_rejected'))
+            .only('pk', 'public_id', 'current_approved_count', 'current_rejected_count')
+            .order_by('pk')
+        )
+        for submission in drifted:
+            self.stdout.write(
+                f'{submission.public_id}: 通过 {submission.current_approved_count} -> {submission.actual_approved}，'
+                f'打回 {submission.current_rejected_count} -> {submission.actual_rejected}'
+            )
+        if options['dry_run']:
+            self.stdout.write(f'共 {len(drifted)} 个提交计数不一致（未写入）')
+            return
+
+        for submission in drifted:
+            # 以子查询就地重算，期间新增的审核也会被计入
+            FormSubmission.objects.filter(pk=submission.pk).update(
+                current_approved_count=_tally('approved'),
+                current_rejected_count=_tally('rejected'),
+            )
+        self.stdout.write(self.style.SUCCESS(f'已修复 {len(drifted)} 个提交的审核计数'))
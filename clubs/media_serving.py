@@ -0,0 +1,122 @@
+"""/media/ 访问入口：按路径前缀区分公开资源与受保护的上传文件。
+
+公开资源（站点图标、轮播图、头像、公告附件）无需登录，带长期缓存头；
+表单提交的上传文件只允许干事/管理员、该社团社长和提交人访问；
+批量导出的压缩包与渲染缓存仅限干事/管理员；其余上传目录（模板、示例文件等）要求登录。
+download_file 与本视图共用 can_access_media 鉴权，鉴权之后统一交给 file_serving.serve_file，配置 FILE_OFFLOAD_BACKEND 时由前端代理发送。
+"""
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseForbidden
+
+from .file_serving import UnsafeFilePath, resolve_media_path, serve_file
+from .models import FormSubmission
+from .principal import get_principal
+
+
+MEDIA_ACCESS_PUBLIC = 'public'
+MEDIA_ACCESS_SUBMISSION = 'submission'
+MEDIA_ACCESS_AUTHENTICATED = 'authenticated'
+MEDIA_ACCESS_STAFF = 'staff'
+
+# 按顺序匹配的路径前缀；未列出的目录按需登录处理
+MEDIA_ACCESS_RULES = (
+    ('site/', MEDIA_ACCESS_PUBLIC),
+    ('carousel/', MEDIA_ACCESS_PUBLIC),
+    ('avatars/', MEDIA_ACCESS_PUBLIC),
+    ('announcements/', MEDIA_ACCESS_PUBLIC),
+    ('form_submissions/', MEDIA_ACCESS_SUBMISSION),
+    ('exports/', MEDIA_ACCESS_STAFF),
+    ('cache/', MEDIA_ACCESS_STAFF),
+)
+
+# 受保护文件允许在浏览器内直接打开的类型，其余类型一律作为附件下载，
+# 避免上传的 HTML/SVG 在本站域名下执行脚本
+_INLINE_CONTENT_TYPES = ('application/pdf', 'text/plain', 'image/png', 'image/jpeg', 'image/gif', 'image/webp')
+
+_PRIVATE_CACHE_CONTROL = 'private, no-cache'
+
+
+def classify_media_path(relative_path):
+    for prefix, access in MEDIA_ACCESS_RULES:
+        if relative_path.startswith(prefix):
+            return access
+    return MEDIA_ACCESS_AUTHENTICATED
+
+
+def _public_cache_control():
+    max_age = getattr(settings, 'MEDIA_PUBLIC_CACHE_SECONDS', 30 * 24 * 3600)
+    return f'public, max-age={max_age}'
+
+
+def can_access_submission_media(user, relative_path):
+    """form_submissions/<请求编号>/... 的访问权限：干事/管理员、该社团社长或提交人。"""
+    parts = relative_path.split('/')
+    if len(parts) < 3 or not parts[1]:
+        return False
+    principal = get_principal(user)
+    if principal.is_staff_or_admin:
+        return True
+    owner = FormSubmission.objects.filter(public_id=parts[1]).values('club_id', 'submitter_id').first()
+    if owner is None:
+        return False
+    return owner['submitter_id'] == user.pk or principal.is_president_of(owner['club_id'])
+
+
+def media_relative_path(full_path):
+    """resolve_media_path 解析出的绝对路径在 MEDIA_ROOT 中的实际位置，按它而不是请求原文分类。"""
+    relative_path = os.path.relpath(full_path, os.path.realpath(settings.MEDIA_ROOT))
+    return relative_path.replace(os.sep, '/')
+
+
+def can_access_media(user, full_path):
+    """user 能否读取 MEDIA_ROOT 内的 full_path；serve_media 与 download_file 共用这一检查。"""
+    relative_path = media_relative_path(full_path)
+    access = classify_media_path(relative_path)
+    if access == MEDIA_ACCESS_PUBLIC:
+        return True
+    if not user.is_authenticated:
+        return False
+    if access == MEDIA_ACCESS_SUBMISSION:
+        return can_access_submission_media(user, relative_path)
+    if access == MEDIA_ACCESS_STAFF:
+        return get_principal(user).is_staff_or_admin
+    return True
+
+
+def serve_media(request, path):
+    """替代 django.views.static.serve 的媒体文件视图。"""
+    relative_path = posixpath.normpath(path).lstrip('/')
+    if relative_path in ('', '.') or relative_path.startswith('..'):
+        raise Http404('文件不存在')
+    try:
+        full_path = resolve_media_path(relative_path)
+    except UnsafeFilePath:
+        raise Http404('文件不存在')
+
+    if classify_media_path(media_relative_path(full_path)) == MEDIA_ACCESS_PUBLIC:
+        if not os.path.isfile(full_path):
+            raise Http404('文件不存在')
+        return serve_file(request, full_path, as_attachment=False, cache_control=_public_cache_control())
+
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path(), settings.LOGIN_URL)
+    if not can_access_media(request.user, full_path):
+        return HttpResponseForbidden('无权访问此文件')
+    if not os.path.isfile(full_path):
+        raise Http404('文件不存在')
+
+    content_type = mimetypes.guess_type(full_path)[0]
+    response = serve_file(
+        request,
+        full_path,
+        filename=os.path.basename(full_path),
+        as_attachment=content_type not in _INLINE_CONTENT_TYPES,
+        cache_control=_PRIVATE_CACHE_CONTROL,
+    )
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
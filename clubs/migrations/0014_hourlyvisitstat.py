@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0001_squashed_0013_formchannel_show_zip_download'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyVisitStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('hour', models.PositiveSmallIntegerField(verbose_name='小时')),
+                ('route_name', models.CharField(blank=True, max_length=150, verbose_name='路由名称')),
+                ('visits', models.PositiveIntegerField(default=0, verbose_name='访问次数')),
+            ],
+            options={
+                'verbose_name': '分时访问统计',
+                'verbose_name_plural': '分时访问统计',
+                'ordering': ['-date', 'hour', 'route_name'],
+                'unique_together': {('date', 'hour', 'route_name')},
+            },
+        ),
+    ]
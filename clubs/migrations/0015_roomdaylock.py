@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0014_hourlyvisitstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomDayLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='版本')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_locks', to='clubs.room', verbose_name='房间')),
+            ],
+            options={
+                'verbose_name': '房间预约锁',
+                'verbose_name_plural': '房间预约锁',
+                'constraints': [models.UniqueConstraint(fields=('room', 'date'), name='room_day_lock_unique')],
+            },
+        ),
+    ]
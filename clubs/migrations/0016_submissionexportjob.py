@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0015_roomdaylock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status_filter', models.CharField(blank=True, max_length=20, verbose_name='提交状态筛选')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='内容指纹')),
+                ('state', models.CharField(choices=[('pending', '排队中'), ('running', '打包中'), ('done', '已完成'), ('failed', '失败')], default='pending', max_length=20, verbose_name='任务状态')),
+                ('total_files', models.PositiveIntegerField(default=0, verbose_name='文件总数')),
+                ('processed_files', models.PositiveIntegerField(default=0, verbose_name='已打包文件数')),
+                ('archive_name', models.CharField(blank=True, max_length=255, verbose_name='压缩包路径')),
+                ('error', models.TextField(blank=True, verbose_name='错误信息')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='最近心跳')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='clubs.formchannel', verbose_name='通道')),
+                ('cycle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='clubs.formcycle', verbose_name='周期')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='submission_export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='发起人')),
+            ],
+            options={
+                'verbose_name': '材料打包任务',
+                'verbose_name_plural': '材料打包任务',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['channel', 'cycle', 'status_filter', 'fingerprint'], name='export_job_lookup_idx')],
+            },
+        ),
+    ]
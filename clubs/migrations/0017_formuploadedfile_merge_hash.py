@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0016_submissionexportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formuploadedfile',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='生成内容哈希'),
+        ),
+        migrations.AddField(
+            model_name='formuploadedfile',
+            name='generation_error',
+            field=models.TextField(blank=True, verbose_name='生成失败原因'),
+        ),
+    ]
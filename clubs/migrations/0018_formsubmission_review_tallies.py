@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:00
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_review_tallies(apps, schema_editor):
+    FormSubmission = apps.get_model('clubs', 'FormSubmission')
+    FormSubmissionReview = apps.get_model('clubs', 'FormSubmissionReview')
+
+    def tally(status):
+        reviews = (
+            FormSubmissionReview.objects.filter(
+                submission=OuterRef('pk'),
+                submission_attempt=OuterRef('resubmission_count'),
+                status=status,
+            )
+            .order_by()
+            .values('submission')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        return Coalesce(Subquery(reviews, output_field=IntegerField()), Value(0))
+
+    FormSubmission.objects.update(
+        current_approved_count=tally('approved'),
+        current_rejected_count=tally('rejected'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0017_formuploadedfile_merge_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formsubmission',
+            name='current_approved_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='本次通过数'),
+        ),
+        migrations.AddField(
+            model_name='formsubmission',
+            name='current_rejected_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='本次打回数'),
+        ),
+        migrations.RunPython(backfill_review_tallies, migrations.RunPython.noop),
+    ]
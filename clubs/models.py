@@ -524,6 +524,9 @@ class FormSubmission(models.Model):
         ('rejected', '已拒绝'),
     ]
 
+    # display_title 依次尝试的字段标识
+    DISPLAY_TITLE_KEYS = ('activity_name', 'club_name', 'title', 'name')
+
     channel = models.ForeignKey(FormChannel, on_delete=models.CASCADE, related_name='submissions', verbose_name='通道')
     public_id = models.CharField(max_length=32, unique=True, default=generate_submission_public_id, verbose_name='请求编号')
     club = models.ForeignKey(Club, on_delete=models.CASCADE, related_name='form_submissions', verbose_name='社团')
@@ -535,6 +538,10 @@ class FormSubmission(models.Model):
     submitted_at = models.DateTimeField(auto_now_add=True, verbose_name='提交时间')
     reviewed_at = models.DateTimeField(null=True, blank=True, verbose_name='审核时间')
     resubmission_count = models.IntegerField(default=1, verbose_name='提交次数')
+    # 本次提交（resubmission_count 对应轮次）的审核计数，审核时以 F() 原子递增，补交时清零；
+    # 与 FormSubmissionReview 不一致时用 reconcile_review_tallies 命令修复
+    current_approved_count = models.PositiveIntegerField(default=0, verbose_name='本次通过数')
+    current_rejected_count = models.PositiveIntegerField(default=0, verbose_name='本次打回数')
     is_read = models.BooleanField(default=False, verbose_name='已读')
     metadata = models.JSONField(default=dict, blank=True, verbose_name='扩展信息')
 
@@ -553,6 +560,10 @@ class FormSubmission(models.Model):
 
     def field_value(self, key, default=''):
         value = self.values.filter(field__field_key=key).first()
+        return self._field_value_or_default(value, default)
+
+    @staticmethod
+    def _field_value_or_default(value, default=''):
         if not value:
             return default
         if value.value_json not in (None, {}, []):
@@ -561,8 +572,13 @@ class FormSubmission(models.Model):
 
     @property
     def display_title(self):
-        for key in ['activity_name', 'club_name', 'title', 'name']:
-            value = self.field_value(key)
+        # 列表页以 Prefetch(..., to_attr='display_values') 只预取标题字段（连同 field），此时直接在内存中查找
+        prefetched = getattr(self, 'display_values', None)
+        for key in self.DISPLAY_TITLE_KEYS:
+            if prefetched is not None:
+                value = self._field_value_or_default(next((item for item in prefetched if item.field.field_key == key), None))
+            else:
+                value = self.field_value(key)
             if value:
                 return value
         return self.club.name
@@ -578,13 +594,13 @@ class FormSubmission(models.Model):
         return self.reviews.filter(submission_attempt=self.resubmission_count)
 
     def approved_review_count(self):
-        return self.current_attempt_reviews().filter(status='approved').count()
+        return self.current_approved_count
 
     def rejected_review_count(self):
-        return self.current_attempt_reviews().filter(status='rejected').count()
+        return self.current_rejected_count
 
     def approval_progress_label(self):
-        return f'{self.approved_review_count()}/{self.required_approval_count}'
+        return f'{self.current_approved_count}/{self.required_approval_count}'
 
 
 class FormSubmissionReview(models.Model):
@@ -660,6 +676,8 @@ class FormUploadedFile(models.Model):
     review_status = models.CharField(max_length=20, choices=REVIEW_STATUS_CHOICES, default='pending', verbose_name='文件审核状态')
     review_comment = models.TextField(blank=True, verbose_name='文件打回原因')
     is_generated = models.BooleanField(default=False, verbose_name='系统生成文件')
+    content_hash = models.CharField(max_length=64, blank=True, verbose_name='生成内容哈希')
+    generation_error = models.TextField(blank=True, verbose_name='生成失败原因')
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name='上传时间')
 
     class Meta:
@@ -671,6 +689,50 @@ class FormUploadedFile(models.Model):
         return self.original_name or self.file.name
 
 
+class SubmissionExportJob(models.Model):
+    """通道/周期全部提交材料的打包导出任务，由后台线程执行，可断点续传。"""
+
+    STATE_CHOICES = [
+        ('pending', '排队中'),
+        ('running', '打包中'),
+        ('done', '已完成'),
+        ('failed', '失败'),
+    ]
+
+    channel = models.ForeignKey(FormChannel, on_delete=models.CASCADE, related_name='export_jobs', verbose_name='通道')
+    cycle = models.ForeignKey(FormCycle, on_delete=models.CASCADE, null=True, blank=True, related_name='export_jobs', verbose_name='周期')
+    status_filter = models.CharField(max_length=20, blank=True, verbose_name='提交状态筛选')
+    fingerprint = models.CharField(max_length=64, verbose_name='内容指纹')
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default='pending', verbose_name='任务状态')
+    total_files = models.PositiveIntegerField(default=0, verbose_name='文件总数')
+    processed_files = models.PositiveIntegerField(default=0, verbose_name='已打包文件数')
+    archive_name = models.CharField(max_length=255, blank=True, verbose_name='压缩包路径')
+    error = models.TextField(blank=True, verbose_name='错误信息')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='submission_export_jobs', verbose_name='发起人')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='最近心跳')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+
+    class Meta:
+        verbose_name = '材料打包任务'
+        verbose_name_plural = '材料打包任务'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['channel', 'cycle', 'status_filter', 'fingerprint'], name='export_job_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.channel_id} - {self.get_state_display()} ({self.processed_files}/{self.total_files})'
+
+    @property
+    def progress_percent(self):
+        if self.state == 'done':
+            return 100
+        if not self.total_files:
+            return 0
+        return min(99, self.processed_files * 100 // self.total_files)
+
+
 class Template(models.Model):
     """材料模板模型 - 干事可以上传各类模板"""
     TEMPLATE_TYPES = [
@@ -1052,44 +1114,77 @@ class RoomBooking(models.Model):
     
     def has_conflict(self):
         """检查是否与已有效的预订有时间冲突"""
+        from .room_availability import RoomAvailability
+
         # 排除自己和已取消的，查找同一房间同一天内有效的预订
-        conflicting_bookings = RoomBooking.objects.filter(
-            room=self.room,
-            booking_date=self.booking_date,
-            status='active'
-        ).exclude(pk=self.pk)
-        
-        for booking in conflicting_bookings:
-            # 检查时间是否重叠
-            if (self.start_time < booking.end_time and self.end_time > booking.start_time):
-                return True
-        return False
+        availability = RoomAvailability([self.room_id], self.booking_date, exclude_booking_id=self.pk)
+        return not availability.is_free(self.room_id, self.booking_date, self.start_time, self.end_time)
+
+    @staticmethod
+    def _is_booking_manager(user):
+        """管理员和干事可以编辑/删除任何预约"""
+        from .principal import get_principal
+
+        return get_principal(user).role in ['admin', 'staff']
+
+    def _is_owner_or_president(self, user):
+        # 借用人本人，或所属社团的现任社长
+        if self.user_id == user.pk:
+            return True
+        return bool(self.club and self.club.president == user)
 
     def can_delete(self, user):
         """检查用户是否有权限删除此预约"""
-        # 管理员和干事可以删除任何预约
-        if hasattr(user, 'profile') and user.profile.role in ['admin', 'staff']:
-            return True
-        # 借用人本人可以删除
-        if self.user == user:
-            return True
-        # 社团社长可以删除本社团的预约
-        if self.club and self.club.president == user:
-            return True
-        return False
+        return self._is_booking_manager(user) or self._is_owner_or_president(user)
 
     def can_edit(self, user):
         """检查用户是否有权限编辑此预约"""
-        # 管理员和干事可以编辑任何预约
-        if hasattr(user, 'profile') and user.profile.role in ['admin', 'staff']:
-            return True
-        # 借用人本人可以编辑
-        if self.user == user:
-            return True
-        # 社团社长可以编辑本社团的预约
-        if self.club and self.club.president == user:
-            return True
-        return False
+        return self._is_booking_manager(user) or self._is_owner_or_president(user)
+
+    @classmethod
+    def bulk_permissions(cls, user, bookings):
+        """批量计算用户对一组预约的编辑/删除权限。
+
+        角色只判断一次，各预约所属社团的现任社长通过一次 Prefetch
+        （to_attr='_president_list'，与 Club.president 的缓存约定一致）取回，
+        不再为每条预约单独查询 Officer。
+        返回 {booking.pk: {'can_edit': bool, 'can_delete': bool}}。
+        """
+        bookings = list(bookings)
+        if cls._is_booking_manager(user):
+            return {booking.pk: {'can_edit': True, 'can_delete': True} for booking in bookings}
+
+        models.prefetch_related_objects(
+            [booking for booking in bookings if booking.club_id],
+            'club',
+            models.Prefetch(
+                'club__officers',
+                queryset=Officer.objects.filter(position='president', is_current=True).select_related('user_profile__user'),
+                to_attr='_president_list',
+            ),
+        )
+        permissions = {}
+        for booking in bookings:
+            allowed = booking._is_owner_or_president(user)
+            permissions[booking.pk] = {'can_edit': allowed, 'can_delete': allowed}
+        return permissions
+
+
+class RoomDayLock(models.Model):
+    """房间按天的预约锁行：创建预约前在事务内先写这一行，串行化同一房间同一天的冲突检查"""
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='day_locks', verbose_name='房间')
+    date = models.DateField(verbose_name='日期')
+    version = models.PositiveIntegerField(default=0, verbose_name='版本')
+
+    class Meta:
+        verbose_name = '房间预约锁'
+        verbose_name_plural = '房间预约锁'
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'date'], name='room_day_lock_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_id} - {self.date}"
 
 
 class SiteSettings(models.Model):
@@ -1136,3 +1231,20 @@ class DailyStat(models.Model):
 
     def __str__(self):
         return f"{self.date} — {self.visits} 次访问"
+
+
+class HourlyVisitStat(models.Model):
+    """按日期、小时和路由名聚合的访问统计（DailyStat 的细分明细）"""
+    date = models.DateField(verbose_name='日期')
+    hour = models.PositiveSmallIntegerField(verbose_name='小时')
+    route_name = models.CharField(max_length=150, blank=True, verbose_name='路由名称')
+    visits = models.PositiveIntegerField(default=0, verbose_name='访问次数')
+
+    class Meta:
+        verbose_name = '分时访问统计'
+        verbose_name_plural = '分时访问统计'
+        ordering = ['-date', 'hour', 'route_name']
+        unique_together = [('date', 'hour', 'route_name')]
+
+    def __str__(self):
+        return f"{self.date} {self.hour:02d}时 {self.route_name or '-'} — {self.visits} 次访问"
@@ -0,0 +1,103 @@
+"""导航栏角标计数：一次分组查询得到所有通道的待审/打回数量并写入缓存。"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import FormChannel, FormSubmission
+
+
+COUNTS_CACHE_KEY = 'nav_counters:submission_counts'
+CHANNELS_CACHE_KEY = 'nav_counters:active_channels'
+
+# 参与角标统计的提交状态：干事看 pending，社长看 pending + rejected
+_COUNTED_STATUSES = ('pending', 'rejected')
+
+
+def _cache_timeout():
+    return getattr(settings, 'NAV_COUNTER_CACHE_SECONDS', 60)
+
+
+def _load_submission_counts():
+    """按 (通道, 社团, 状态) 分组统计，返回 {channel_id: {club_id: {status: count}}}。"""
+    counts = defaultdict(lambda: defaultdict(dict))
+    rows = (
+        FormSubmission.objects.filter(status__in=_COUNTED_STATUSES)
+        .order_by()
+        .values('channel_id', 'club_id', 'status')
+        .annotate(total=Count('id'))
+    )
+    for row in rows:
+        counts[row['channel_id']][row['club_id']][row['status']] = row['total']
+    return {channel_id: dict(by_club) for channel_id, by_club in counts.items()}
+
+
+def get_submission_counts():
+    counts = cache.get(COUNTS_CACHE_KEY)
+    if counts is None:
+        counts = _load_submission_counts()
+        cache.set(COUNTS_CACHE_KEY, counts, timeout=_cache_timeout())
+    return counts
+
+
+def get_active_channels():
+    """侧边栏使用的启用通道列表（按排序），与计数共用缓存生命周期。"""
+    channels = cache.get(CHANNELS_CACHE_KEY)
+    if channels is None:
+        channels = list(
+            FormChannel.objects.filter(is_active=True)
+            .exclude(slug='')
+            .order_by('order', 'id')
+        )
+        cache.set(CHANNELS_CACHE_KEY, channels, timeout=_cache_timeout())
+    return channels
+
+
+def _sum_counts(by_club, statuses, club_ids=None):
+    total = 0
+    for club_id, by_status in by_club.items():
+        if club_ids is not None and club_id not in club_ids:
+            continue
+        total += sum(by_status.get(status, 0) for status in statuses)
+    return total
+
+
+def audit_channel_counts(channels=None):
+    """干事/管理员视角：每个通道的待审核数量，返回 (total, {slug: count})。"""
+    channels = get_active_channels() if channels is None else channels
+    counts = get_submission_counts()
+    per_channel = {}
+    for channel in channels:
+        per_channel[channel.slug] = _sum_counts(counts.get(channel.id, {}), ('pending',))
+    return sum(per_channel.values()), per_channel
+
+
+def approval_channel_counts(club_ids, channels=None):
+    """社长视角：本人社团在每个通道中待审核与被打回的数量，返回 (total, {slug: count})。"""
+    channels = get_active_channels() if channels is None else channels
+    counts = get_submission_counts()
+    club_ids = set(club_ids)
+    per_channel = {}
+    for channel in channels:
+        per_channel[channel.slug] = _sum_counts(counts.get(channel.id, {}), _COUNTED_STATUSES, club_ids)
+    return sum(per_channel.values()), per_channel
+
+
+def club_unread_total(club_ids):
+    """社长视角下不限通道的待处理总数（含已停用通道）。"""
+    club_ids = set(club_ids)
+    return sum(
+        _sum_counts(by_club, _COUNTED_STATUSES, club_ids)
+        for by_club in get_submission_counts().values()
+    )
+
+
+def invalidate_submission_counts():
+    """提交新建、审核、取消或删除后调用；在事务提交后才清除，避免读到旧数据再回填。"""
+    transaction.on_commit(lambda: cache.delete(COUNTS_CACHE_KEY))
+
+
+def invalidate_active_channels():
+    transaction.on_commit(lambda: cache.delete(CHANNELS_CACHE_KEY))
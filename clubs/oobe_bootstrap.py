@@ -4,6 +4,7 @@ from pathlib import Path
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.management import call_command
 from django.db.utils import OperationalError, ProgrammingError
 
@@ -12,6 +13,30 @@ from .models import SMTPConfig, UserProfile
 
 logger = logging.getLogger(__name__)
 
+HAS_ADMIN_CACHE_KEY = 'oobe:has_admin'
+
+# 进程级闩锁：确认存在管理员后置为 True，此后首启检测不再访问缓存、数据库或文件系统。
+_setup_complete = False
+
+
+def is_setup_complete() -> bool:
+    return _setup_complete
+
+
+def mark_setup_complete():
+    global _setup_complete
+    _setup_complete = True
+
+
+def reset_setup_complete():
+    """管理员被删除或重新进入 OOBE 时调用，让当前进程重新检测首启状态。"""
+    global _setup_complete
+    _setup_complete = False
+    try:
+        cache.delete(HAS_ADMIN_CACHE_KEY)
+    except Exception:
+        pass
+
 
 def _pending_file_path() -> Path:
     return Path(settings.BASE_DIR) / '.oobe_pending.json'
@@ -27,6 +52,7 @@ def write_pending_oobe_setup(payload: dict):
         json.dumps(payload, ensure_ascii=False, indent=2),
         encoding='utf-8'
     )
+    reset_setup_complete()
 
 
 def has_admin_user() -> bool:
@@ -0,0 +1,152 @@
+"""PDF 页面栅格化：进程池并行渲染，渲染结果按（文件哈希, 页码, DPI）缓存在磁盘上。
+
+合并 Word 与文件预览都通过 rasterize_pdf() 取页面图片：同一文件再次使用时直接
+读取缓存的 PNG，只有缺失的页面才会分批交给进程池渲染。DPI 按页面尺寸自适应，
+让普通 A4 页面保持原先 2 倍（144 DPI）的清晰度，小票据更清晰、大幅面不过度放大。
+
+缓存目录可随时整体清空，下次使用时会重新渲染。
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# 长边目标像素：A4（842pt）在 144 DPI 下的长边
+TARGET_LONG_SIDE_PX = 1684
+MIN_DPI = 72
+MAX_DPI = 216
+# DPI 取整步长，尺寸相近的页面共用同一缓存档位
+DPI_STEP = 24
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+_pool_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def page_cache_root():
+    return getattr(settings, 'PDF_PAGE_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'cache', 'pdf_pages'))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def adaptive_dpi(width_pt, height_pt):
+    """按页面长边计算 DPI，使渲染结果长边接近 TARGET_LONG_SIDE_PX。"""
+    long_side = max(width_pt, height_pt, 1)
+    dpi = TARGET_LONG_SIDE_PX * 72 / long_side
+    dpi = int(round(dpi / DPI_STEP)) * DPI_STEP
+    return max(MIN_DPI, min(MAX_DPI, dpi))
+
+
+def page_image_path(file_hash, page_number, dpi):
+    return os.path.join(page_cache_root(), file_hash[:2], file_hash, f'{page_number}-{dpi}.png')
+
+
+def _render_pages(pdf_path, jobs):
+    """进程池中执行：打开一次 PDF，渲染一批 (页序号, DPI, 目标路径)。"""
+    import fitz
+
+    pdf = fitz.open(pdf_path)
+    try:
+        for page_index, dpi, target in jobs:
+            pixmap = pdf[page_index].get_pixmap(dpi=dpi, alpha=False)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temp_path = f'{target}.{os.getpid()}.tmp.png'
+            pixmap.save(temp_path)
+            os.replace(temp_path, target)
+    finally:
+        pdf.close()
+    return len(jobs)
+
+
+def _workers():
+    return max(1, getattr(settings, 'PDF_RASTER_WORKERS', min(4, os.cpu_count() or 1)))
+
+
+def _get_pool():
+    """每个（fork 后的）进程各自创建进程池；子进程以 spawn 启动，不继承 Web 进程的线程与连接。"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=_workers(), mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def _split(items, parts):
+    size = -(-len(items) // parts)
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def _render_missing(pdf_path, missing):
+    """把缺失页面按进程数切成连续批次并行渲染；进程池不可用时在当前进程内渲染。"""
+    workers = _workers()
+    if workers == 1 or len(missing) == 1:
+        _render_pages(pdf_path, missing)
+        return
+    try:
+        pool = _get_pool()
+        futures = [pool.submit(_render_pages, pdf_path, batch) for batch in _split(missing, workers)]
+        for future in futures:
+            future.result()
+    except (BrokenProcessPool, OSError) as exc:
+        logger.warning('PDF 渲染进程池不可用，改为在当前进程渲染: %s', exc)
+        _reset_pool()
+        _render_pages(pdf_path, [job for job in missing if not os.path.exists(job[2])])
+
+
+def page_plan(pdf_path, dpi=None):
+    """每页的 (页序号, DPI)；dpi 为空时按页面尺寸自适应。只读取页面尺寸，不渲染。"""
+    import fitz
+
+    pdf = fitz.open(pdf_path)
+    try:
+        return [(page_index, dpi or adaptive_dpi(page.rect.width, page.rect.height)) for page_index, page in enumerate(pdf)]
+    finally:
+        pdf.close()
+
+
+def render_page(pdf_path, file_hash, page_number, dpi):
+    """在当前进程内渲染（或直接复用缓存的）单个页面，返回 PNG 路径；供逐页加载的预览使用。"""
+    target = page_image_path(file_hash, page_number, dpi)
+    if not os.path.exists(target):
+        _render_pages(pdf_path, [(page_number - 1, dpi, target)])
+    return target
+
+
+def rasterize_pdf(pdf_path, dpi=None, file_hash=None):
+    """返回 [(页码, PNG 路径), ...]，页码从 1 开始。
+
+    dpi 为空时按每页尺寸自适应；已缓存的页面直接复用，缺失的页面并行渲染。
+    """
+    file_hash = file_hash or file_sha256(pdf_path)
+    pages = [
+        (page_index, page_dpi, page_image_path(file_hash, page_index + 1, page_dpi))
+        for page_index, page_dpi in page_plan(pdf_path, dpi)
+    ]
+
+    missing = [job for job in pages if not os.path.exists(job[2])]
+    if missing:
+        _render_missing(pdf_path, missing)
+    return [(page_index + 1, target) for page_index, _dpi, target in pages]
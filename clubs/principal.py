@@ -0,0 +1,134 @@
+"""请求级身份对象：一次查询解析当前用户的角色、社长社团与干事负责社团。
+
+PrincipalMiddleware 在 request.principal 上挂一个惰性对象，视图、上下文处理器
+和 views 中的角色辅助函数共用同一结果（记忆在 user 对象上），
+同一请求内角色与社团解析最多产生一次数据库查询。
+"""
+from django.db.models import F, FilteredRelation, Q
+from django.utils.functional import SimpleLazyObject
+
+from .models import UserProfile
+
+
+_USER_MEMO_ATTR = '_cmanager_principal'
+
+
+class Principal:
+    """当前用户的角色快照。未登录或缺少 UserProfile 时 role 为 None。
+
+    社团 ID 在构造时给出；若为 None（档案已被其他代码提前加载），
+    则在首次读取时用一条查询补齐。
+    """
+
+    def __init__(self, user, profile=None, president_club_ids=(), staff_club_ids=()):
+        self.user = user
+        self.profile = profile
+        self.role = profile.role if profile else None
+        self.is_superuser = bool(getattr(user, 'is_superuser', False))
+        self._club_ids = None
+        if president_club_ids is not None and staff_club_ids is not None:
+            self._club_ids = (frozenset(president_club_ids), frozenset(staff_club_ids))
+
+    def _get_club_ids(self):
+        if self._club_ids is None:
+            rows = _profile_rows(self.profile.pk).values_list('president_club_id', 'staff_club_id')
+            self._club_ids = (
+                frozenset(president_id for president_id, _ in rows if president_id),
+                frozenset(staff_id for _, staff_id in rows if staff_id),
+            )
+        return self._club_ids
+
+    @property
+    def president_club_ids(self):
+        return self._get_club_ids()[0]
+
+    @property
+    def staff_club_ids(self):
+        return self._get_club_ids()[1]
+
+    @property
+    def is_president(self):
+        return self.role == 'president'
+
+    @property
+    def is_staff(self):
+        return self.role == 'staff'
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+    @property
+    def is_staff_or_admin(self):
+        """干事或管理员；超级用户也视为管理员。"""
+        return self.is_superuser or self.role in ('staff', 'admin')
+
+    def is_president_of(self, club):
+        """是否为该社团的现任社长（按 Officer 表判断，与 role 无关）。"""
+        if self.profile is None:
+            return False
+        club_id = getattr(club, 'pk', club)
+        return club_id in self.president_club_ids
+
+
+def _profile_rows(profile_pk=None, user_pk=None):
+    # 两个 FilteredRelation 的 LEFT JOIN 在一条查询内取回档案与两类社团 ID；
+    # 每个用户的社长/干事社团都很少，交叉行数可以忽略
+    lookup = {'pk': profile_pk} if profile_pk is not None else {'user_id': user_pk}
+    return (
+        UserProfile.objects.filter(**lookup)
+        .annotate(
+            president_posts=FilteredRelation(
+                'officer',
+                condition=Q(officer__position='president', officer__is_current=True),
+            ),
+            staff_links=FilteredRelation(
+                'managed_clubs',
+                condition=Q(managed_clubs__is_active=True),
+            ),
+        )
+        .annotate(
+            president_club_id=F('president_posts__club_id'),
+            staff_club_id=F('staff_links__club_id'),
+        )
+    )
+
+
+def _load_principal(user):
+    if UserProfile.user.field.remote_field.is_cached(user):
+        # 档案已被模板或视图提前读取，角色无需再查，社团 ID 用到时再补
+        profile = getattr(user, 'profile', None)
+        return Principal(user, profile, None, None) if profile else Principal(user)
+
+    rows = list(_profile_rows(user_pk=user.pk))
+    if not rows:
+        return Principal(user)
+
+    profile = rows[0]
+    # 回填 user.profile 缓存，视图中再访问 request.user.profile 不会重复查询
+    user.profile = profile
+    return Principal(
+        user,
+        profile,
+        president_club_ids={row.president_club_id for row in rows if row.president_club_id},
+        staff_club_ids={row.staff_club_id for row in rows if row.staff_club_id},
+    )
+
+
+def get_principal(user):
+    """返回用户的 Principal，结果记忆在 user 对象上（即同一请求内共享）。
+
+    Principal 只在请求范围内有效，不做失效处理：请求中修改了角色或社长任职时，
+    本请求后续读到的仍是旧快照（修改角色的视图都以重定向结束），下一个请求重新解析。
+    """
+    if user is None or not user.is_authenticated:
+        return Principal(user)
+    principal = getattr(user, _USER_MEMO_ATTR, None)
+    if principal is None:
+        principal = _load_principal(user)
+        setattr(user, _USER_MEMO_ATTR, principal)
+    return principal
+
+
+def lazy_principal(request):
+    return SimpleLazyObject(lambda: get_principal(getattr(request, 'user', None)))
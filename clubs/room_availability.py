@@ -0,0 +1,250 @@
+"""房间占用计算：一次查询加载房间在日期区间内的有效预约，按区间扫描得到时段占用。"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import RoomBooking, RoomDayLock
+
+
+# 周期预约最多生成的次数（约一学年）
+MAX_SERIES_OCCURRENCES = 52
+
+
+class RoomBookingConflict(Exception):
+    """目标时间段已被有效预约占用；dates 为发生冲突的日期列表"""
+
+    def __init__(self, message, dates=()):
+        super().__init__(message)
+        self.dates = list(dates)
+
+
+def _slot_bounds(slot):
+    """时间段既可以是 TimeSlot 实例，也可以是 {'start': time, 'end': time} 字典。"""
+    if isinstance(slot, dict):
+        return slot['start'], slot['end']
+    return slot.start_time, slot.end_time
+
+
+def _date_range(start_date, end_date):
+    return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+
+
+class RoomAvailability:
+    """若干房间在 [start_date, end_date] 内的有效预约及时段占用矩阵。
+
+    构造时只执行一次查询；预约按 (房间, 日期) 分桶并按开始时间排序，
+    之后的冲突判断、当日预约列表和 房间×日期×时段 占用矩阵都在内存中完成。
+    """
+
+    def __init__(self, rooms, start_date, end_date=None, exclude_booking_id=None):
+        self.room_ids = [getattr(room, 'pk', room) for room in rooms]
+        self.start_date = start_date
+        self.end_date = end_date or start_date
+        queryset = (
+            RoomBooking.objects.filter(
+                room_id__in=self.room_ids,
+                booking_date__gte=self.start_date,
+                booking_date__lte=self.end_date,
+                status='active',
+            )
+            .select_related('user__profile', 'club')
+            .order_by('room_id', 'booking_date', 'start_time', 'id')
+        )
+        if exclude_booking_id:
+            queryset = queryset.exclude(pk=exclude_booking_id)
+
+        self._buckets = defaultdict(list)
+        for booking in queryset:
+            self._buckets[(booking.room_id, booking.booking_date)].append(booking)
+        # 每个桶内的开始时间，供二分查找
+        self._starts = {key: [b.start_time for b in items] for key, items in self._buckets.items()}
+
+    def dates(self):
+        return _date_range(self.start_date, self.end_date)
+
+    def bookings_for(self, room, day):
+        """某房间某天的有效预约（按开始时间排序）。"""
+        return list(self._buckets.get((getattr(room, 'pk', room), day), ()))
+
+    def overlapping(self, room, day, start_time, end_time):
+        """与 [start_time, end_time) 重叠的预约。"""
+        key = (getattr(room, 'pk', room), day)
+        items = self._buckets.get(key)
+        if not items:
+            return []
+        # 开始时间 >= end_time 的预约不可能重叠，只需检查其之前的部分
+        limit = bisect_left(self._starts[key], end_time)
+        return [booking for booking in items[:limit] if booking.end_time > start_time]
+
+    def is_free(self, room, day, start_time, end_time):
+        return not self.overlapping(room, day, start_time, end_time)
+
+    def slot_bookings(self, slots):
+        """返回 {room_id: {date: [[与第 i 个时段重叠的预约], ...]}}，时段顺序与传入一致。"""
+        bounds = [_slot_bounds(slot) for slot in slots]
+        order = sorted(range(len(bounds)), key=lambda index: bounds[index])
+        matrix = {}
+        for room_id in self.room_ids:
+            per_day = {}
+            for day in self.dates():
+                per_day[day] = self._sweep(self._buckets.get((room_id, day), ()), bounds, order)
+            matrix[room_id] = per_day
+        return matrix
+
+    def occupancy(self, slots):
+        """紧凑的占用矩阵：{room_id: {date: (bool, ...)}}，True 表示该时段已有预约。"""
+        return {
+            room_id: {day: tuple(bool(items) for items in cells) for day, cells in per_day.items()}
+            for room_id, per_day in self.slot_bookings(slots).items()
+        }
+
+    @staticmethod
+    def _sweep(bookings, bounds, order):
+        """时段与预约都按开始时间排序后双指针扫描，维护当前可能重叠的预约集合。"""
+        cells = [[] for _ in bounds]
+        if not bookings:
+            return cells
+        active = []
+        next_index = 0
+        for slot_index in order:
+            slot_start, slot_end = bounds[slot_index]
+            while next_index < len(bookings) and bookings[next_index].start_time < slot_end:
+                active.append(bookings[next_index])
+                next_index += 1
+            # 时段开始时间单调不减，已结束的预约不会再与后续时段重叠
+            active = [booking for booking in active if booking.end_time > slot_start]
+            cells[slot_index] = [booking for booking in active if booking.start_time < slot_end]
+        return cells
+
+    def to_grid(self, slots):
+        """序列化为前端可直接切换房间/日期的网格。
+
+        bitmap 为按时段顺序排列的 '0'/'1' 字符串，bookings 为当天预约的简要信息。
+        """
+        occupancy = self.occupancy(slots)
+        rooms = {}
+        for room_id in self.room_ids:
+            days = {}
+            for day in self.dates():
+                days[day.isoformat()] = {
+                    'bitmap': ''.join('1' if taken else '0' for taken in occupancy[room_id][day]),
+                    'bookings': [
+                        {
+                            'id': booking.pk,
+                            'start': booking.start_time.strftime('%H:%M'),
+                            'end': booking.end_time.strftime('%H:%M'),
+                            'club': booking.club.name if booking.club else '',
+                        }
+                        for booking in self._buckets.get((room_id, day), ())
+                    ],
+                }
+            rooms[str(room_id)] = days
+        return rooms
+
+
+def lock_room_day(room, day):
+    """在当前事务内锁定 (房间, 日期)，直到事务结束。
+
+    必须在 transaction.atomic() 内、作为事务的第一条语句调用：用 UPDATE 而不是
+    SELECT ... FOR UPDATE 取锁，MySQL/PostgreSQL 上获得行锁，SQLite(WAL) 上
+    第一条写语句会等待写锁（受 timeout 约束）而不是在旧快照上升级失败。
+    不同房间或不同日期的预约互不阻塞。
+    """
+    room_id = getattr(room, 'pk', room)
+    lock = RoomDayLock.objects.filter(room_id=room_id, date=day)
+    if lock.update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            RoomDayLock.objects.create(room_id=room_id, date=day, version=1)
+    except IntegrityError:
+        # 并发事务刚插入了锁行：唯一约束使本事务等待其提交，之后再按行锁排队
+        lock.update(version=F('version') + 1)
+
+
+def lock_room_days(room, days):
+    """一次 UPDATE 锁定已有的锁行，缺失的再按日期升序逐个创建。
+
+    与 lock_room_day 一样必须是事务的第一条语句；行锁按唯一索引顺序获取，
+    各事务加锁顺序一致，不会相互死锁。
+    """
+    room_id = getattr(room, 'pk', room)
+    days = sorted(set(days))
+    locks = RoomDayLock.objects.filter(room_id=room_id, date__in=days)
+    if locks.update(version=F('version') + 1) == len(days):
+        return
+    existing = set(locks.values_list('date', flat=True))
+    for day in days:
+        if day not in existing:
+            lock_room_day(room_id, day)
+
+
+def series_dates(first_date, until_date, interval_weeks=1, exclude_dates=(), limit=None):
+    """周期预约的日期序列：从 first_date 起每 interval_weeks 周一次，直到 until_date（含），跳过排除日期。
+
+    给出 limit 时最多生成 limit + 1 个日期即停止，调用方据此判断是否超过上限，
+    截止日期再远也不会逐周展开。
+    """
+    excluded = set(exclude_dates)
+    step = timedelta(weeks=interval_weeks)
+    dates = []
+    day = first_date
+    while day <= until_date:
+        if day not in excluded:
+            dates.append(day)
+            if limit is not None and len(dates) > limit:
+                break
+        try:
+            day += step
+        except OverflowError:
+            # 已到 date.max 附近，后面不会再有日期
+            break
+    return dates
+
+
+def reserve_room_booking(room, booking_date, start_time, end_time, **fields):
+    """原子地检查冲突并创建预约；冲突时抛出 RoomBookingConflict。"""
+    with transaction.atomic():
+        lock_room_day(room, booking_date)
+        availability = RoomAvailability([room], booking_date)
+        if not availability.is_free(room, booking_date, start_time, end_time):
+            raise RoomBookingConflict('该时间段已被预约，请选择其他时间')
+        return RoomBooking.objects.create(
+            room=room,
+            booking_date=booking_date,
+            start_time=start_time,
+            end_time=end_time,
+            status='active',
+            **fields,
+        )
+
+
+def reserve_room_booking_series(room, dates, start_time, end_time, **fields):
+    """原子地创建一组同一时间段的周期预约。
+
+    一次区间查询检查全部日期，任一日期冲突则整组不创建，并在
+    RoomBookingConflict.dates 中列出所有冲突日期；否则 bulk_create 一次写入。
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return []
+    with transaction.atomic():
+        lock_room_days(room, dates)
+        availability = RoomAvailability([room], dates[0], dates[-1])
+        conflicts = [day for day in dates if not availability.is_free(room, day, start_time, end_time)]
+        if conflicts:
+            raise RoomBookingConflict('以下日期该时间段已被预约：' + '、'.join(day.strftime('%Y-%m-%d') for day in conflicts), conflicts)
+        return RoomBooking.objects.bulk_create([
+            RoomBooking(
+                room=room,
+                booking_date=day,
+                start_time=start_time,
+                end_time=end_time,
+                status='active',
+                **fields,
+            )
+            for day in dates
+        ])
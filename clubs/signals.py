@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, FormChannel, FormField, FormSubmission
+from .form_schema import invalidate_channel_schema
+from .nav_counters import invalidate_active_channels, invalidate_submission_counts
+from .oobe_bootstrap import is_setup_complete, reset_setup_complete
 
 
 @receiver(post_save, sender=User)
@@ -52,4 +55,60 @@ def save_user_profile(sender, instance, **kwargs):
                 phone='00000000000',
                 wechat=instance.username,
                 political_status='non_member'
-            )
\ No newline at end of file
+            )
+
+
+@receiver(post_save, sender=FormSubmission)
+@receiver(post_delete, sender=FormSubmission)
+def refresh_submission_nav_counts(sender, instance, **kwargs):
+    """提交新建、审核、打回、取消或删除后，清除导航角标计数缓存"""
+    invalidate_submission_counts()
+
+
+@receiver(post_save, sender=FormChannel)
+@receiver(post_delete, sender=FormChannel)
+def refresh_nav_channels(sender, instance, **kwargs):
+    """通道增删改后，清除侧边栏通道列表缓存"""
+    invalidate_active_channels()
+
+
+@receiver(post_save, sender=FormField)
+@receiver(post_delete, sender=FormField)
+def refresh_channel_schema(sender, instance, **kwargs):
+    """字段增删改（save_form_field / delete_form_field / 后台）后，使通道编译结构失效"""
+    invalidate_channel_schema(instance.channel_id)
+
+
+def _reset_setup_latch_if_no_admin():
+    if not UserProfile.objects.filter(role='admin').exists():
+        reset_setup_complete()
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_loaded_role(sender, instance, **kwargs):
+    """记录加载时的角色（role 被 defer 时为 None），保存后据此判断是否有管理员被降级"""
+    instance._loaded_role = instance.__dict__.get('role')
+
+
+@receiver(post_save, sender=UserProfile)
+def refresh_setup_latch_on_role_change(sender, instance, created, update_fields=None, **kwargs):
+    """管理员被降级后，若已没有管理员则让首启检测重新生效；新增管理员时清掉缓存中的“无管理员”结果
+
+    普通资料保存不查询数据库，只有角色由 admin 改为其他值（或加载时未取 role 而无法判断）才检查。
+    """
+    if update_fields is not None and 'role' not in update_fields:
+        return
+    previous_role = None if created else instance._loaded_role
+    instance._loaded_role = instance.role
+    if instance.role == 'admin':
+        if not is_setup_complete():
+            reset_setup_complete()
+    elif previous_role == 'admin' or (previous_role is None and not created):
+        _reset_setup_latch_if_no_admin()
+
+
+@receiver(post_delete, sender=UserProfile)
+def refresh_setup_latch_on_delete(sender, instance, **kwargs):
+    """删除最后一个管理员后，让首启检测重新生效"""
+    if instance.role == 'admin':
+        _reset_setup_latch_if_no_admin()
@@ -0,0 +1,291 @@
+"""通道/周期材料批量打包：后台线程把全部提交按社团组织写入一个 ZIP，支持进度与断点续传。
+
+压缩包先写到 <名称>.part，每打包完一个提交就把中央目录（及其偏移）另存为检查点
+<名称>.part.ckpt。进程崩溃后重新认领任务时，把 .part 截断到检查点偏移并写回
+中央目录，即恢复为一个完整的 ZIP，已打包的提交据其中的路径跳过。
+
+同一组（通道、周期、状态）参数的导出以内容指纹区分：指纹由纳入的提交及其文件
+计算，任何提交或文件变化都会得到新指纹，旧压缩包在新任务完成后删除。
+"""
+import hashlib
+import logging
+import os
+import struct
+import threading
+import time
+import zipfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from .models import FormSubmission, FormUploadedFile, SubmissionExportJob
+from .zip_stream import ZipSourceUnavailable, submission_zip_entries, write_missing_note, write_zip_entry
+
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = 'exports/submissions'
+
+# 打包过程中至少每隔这么多秒刷新一次心跳
+HEARTBEAT_SECONDS = 15
+
+_CHECKPOINT_SUFFIX = '.ckpt'
+
+
+def _stale_after():
+    return timedelta(seconds=getattr(settings, 'SUBMISSION_EXPORT_STALE_SECONDS', 120))
+
+
+def export_queryset(channel, cycle=None, status_filter=''):
+    queryset = FormSubmission.objects.filter(channel=channel)
+    if cycle is not None:
+        queryset = queryset.filter(cycle=cycle)
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+    return queryset
+
+
+def export_fingerprint(channel, cycle=None, status_filter=''):
+    """纳入导出的提交及其文件的内容指纹（两条查询）。"""
+    submissions = export_queryset(channel, cycle, status_filter)
+    digest = hashlib.sha256()
+    for row in submissions.order_by('pk').values_list('pk', 'status', 'resubmission_count', 'reviewed_at', 'club__name'):
+        digest.update(repr(row).encode())
+    digest.update(b'|')
+    files = FormUploadedFile.objects.filter(submission__in=submissions).exclude(file='')
+    for row in files.order_by('pk').values_list('pk', 'submission_id', 'file', 'original_name'):
+        digest.update(repr(row).encode())
+    return digest.hexdigest()
+
+
+def export_file_count(channel, cycle=None, status_filter=''):
+    submissions = export_queryset(channel, cycle, status_filter)
+    return FormUploadedFile.objects.filter(submission__in=submissions).exclude(file='').count()
+
+
+def _full_path(archive_name):
+    return os.path.join(settings.MEDIA_ROOT, archive_name)
+
+
+def archive_path(job):
+    """已完成任务的压缩包绝对路径；文件不存在时返回 None。"""
+    if job.state != 'done' or not job.archive_name:
+        return None
+    path = _full_path(job.archive_name)
+    return path if os.path.isfile(path) else None
+
+
+def _archive_name(job):
+    parts = [str(job.pk), job.channel.slug]
+    if job.cycle_id:
+        parts.append(f'cycle{job.cycle_id}')
+    if job.status_filter:
+        parts.append(job.status_filter)
+    return f"{EXPORT_DIR}/{'-'.join(parts)}.zip"
+
+
+def _remove_files(archive_name):
+    if not archive_name:
+        return
+    path = _full_path(archive_name)
+    for candidate in (path, path + '.part', path + '.part' + _CHECKPOINT_SUFFIX):
+        try:
+            os.remove(candidate)
+        except FileNotFoundError:
+            pass
+
+
+def get_or_start_export(channel, cycle=None, status_filter='', user=None):
+    """返回与当前内容一致的导出任务：已完成的直接复用，进行中的继续等待，否则新建并启动。"""
+    fingerprint = export_fingerprint(channel, cycle, status_filter)
+    job = (
+        SubmissionExportJob.objects.filter(
+            channel=channel,
+            cycle=cycle,
+            status_filter=status_filter,
+            fingerprint=fingerprint,
+            state__in=('pending', 'running', 'done'),
+        )
+        .select_related('channel')
+        .first()
+    )
+    if job is not None and (job.state != 'done' or archive_path(job)):
+        resume_if_stale(job)
+        return job
+
+    job = SubmissionExportJob.objects.create(
+        channel=channel,
+        cycle=cycle,
+        status_filter=status_filter,
+        fingerprint=fingerprint,
+        total_files=export_file_count(channel, cycle, status_filter),
+        requested_by=user,
+    )
+    job.archive_name = _archive_name(job)
+    job.save(update_fields=['archive_name'])
+    transaction.on_commit(lambda: start_export_thread(job.pk))
+    return job
+
+
+def resume_if_stale(job):
+    """任务排队或运行中但心跳超时（进程崩溃/重启），重新启动后台线程从检查点继续。"""
+    if job.state not in ('pending', 'running'):
+        return False
+    last_seen = job.heartbeat_at or job.created_at
+    if last_seen > timezone.now() - _stale_after():
+        return False
+    start_export_thread(job.pk)
+    return True
+
+
+def start_export_thread(job_id):
+    thread = threading.Thread(target=_run_in_thread, args=(job_id,), name=f'submission-export-{job_id}', daemon=True)
+    thread.start()
+    return thread
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_export_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def _claim(job_id):
+    """原子地认领任务：排队中，或运行中但心跳已超时。多个进程同时恢复时只有一个成功。"""
+    now = timezone.now()
+    stale = now - _stale_after()
+    claimable = Q(state='pending') | (Q(state='running') & (Q(heartbeat_at__lt=stale) | Q(heartbeat_at__isnull=True)))
+    return SubmissionExportJob.objects.filter(claimable, pk=job_id).update(state='running', heartbeat_at=now) == 1
+
+
+def run_export_job(job_id):
+    """执行（或从检查点继续）导出任务；可在后台线程或命令行中调用。"""
+    if not _claim(job_id):
+        return None
+    job = SubmissionExportJob.objects.select_related('channel', 'cycle').get(pk=job_id)
+    try:
+        _build_archive(job)
+    except Exception as exc:
+        logger.exception('材料打包任务 %s 失败', job_id)
+        SubmissionExportJob.objects.filter(pk=job_id).update(state='failed', error=str(exc)[:2000], finished_at=timezone.now())
+        return None
+
+    SubmissionExportJob.objects.filter(pk=job_id).update(
+        state='done',
+        processed_files=job.processed_files,
+        total_files=job.processed_files,
+        heartbeat_at=timezone.now(),
+        finished_at=timezone.now(),
+    )
+    _prune_superseded(job)
+    return job
+
+
+def _prune_superseded(job):
+    """删除同一组参数下已过期（指纹不同）或失败的任务及其文件。"""
+    superseded = (
+        SubmissionExportJob.objects.filter(channel_id=job.channel_id, cycle_id=job.cycle_id, status_filter=job.status_filter)
+        .exclude(pk=job.pk)
+        .filter(Q(state='failed') | (Q(state='done') & ~Q(fingerprint=job.fingerprint)))
+    )
+    for archive_name in superseded.values_list('archive_name', flat=True):
+        _remove_files(archive_name)
+    superseded.delete()
+
+
+def _safe_component(name):
+    return (name or '').replace('/', '_').replace('\\', '_').strip() or '未命名'
+
+
+def _save_checkpoint(part_path, start_dir):
+    """把中央目录及其偏移另存下来；写临时文件后原子替换，崩溃时检查点总是完整的。"""
+    checkpoint = part_path + _CHECKPOINT_SUFFIX
+    with open(part_path, 'rb') as source:
+        source.seek(start_dir)
+        central_directory = source.read()
+    with open(checkpoint + '.tmp', 'wb') as target:
+        target.write(struct.pack('<Q', start_dir))
+        target.write(central_directory)
+        target.flush()
+        os.fsync(target.fileno())
+    os.replace(checkpoint + '.tmp', checkpoint)
+
+
+def _restore_checkpoint(part_path):
+    """按检查点恢复 .part 文件，返回其中已完整打包的提交编号；没有检查点时从头开始。"""
+    checkpoint = part_path + _CHECKPOINT_SUFFIX
+    if not (os.path.exists(checkpoint) and os.path.exists(part_path)):
+        for path in (part_path, checkpoint):
+            if os.path.exists(path):
+                os.remove(path)
+        return set()
+    with open(checkpoint, 'rb') as source:
+        start_dir = struct.unpack('<Q', source.read(8))[0]
+        central_directory = source.read()
+    with open(part_path, 'r+b') as target:
+        target.truncate(start_dir)
+        target.seek(start_dir)
+        target.write(central_directory)
+    with zipfile.ZipFile(part_path) as archive:
+        names = archive.namelist()
+    # 路径为 社团/提交编号/字段/文件名
+    return {name.split('/')[1] for name in names if name.count('/') >= 2}
+
+
+def _build_archive(job):
+    final_path = _full_path(job.archive_name)
+    part_path = final_path + '.part'
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    done_ids = _restore_checkpoint(part_path)
+
+    submissions = (
+        export_queryset(job.channel, job.cycle, job.status_filter)
+        .select_related('club')
+        .prefetch_related(Prefetch(
+            'uploaded_files',
+            queryset=FormUploadedFile.objects.exclude(file='').select_related('field').order_by('uploaded_at', 'pk'),
+        ))
+        .order_by('club__name', 'submitted_at', 'pk')
+    )
+
+    processed = 0
+    last_beat = time.monotonic()
+    for submission in submissions.iterator(chunk_size=100):
+        uploaded_files = list(submission.uploaded_files.all())
+        if submission.public_id in done_ids:
+            processed += len(uploaded_files)
+            continue
+        if not uploaded_files:
+            continue
+
+        prefix = f'{_safe_component(submission.club.name)}/{submission.public_id}/'
+        with zipfile.ZipFile(part_path, 'a' if os.path.exists(part_path) else 'w') as archive:
+            for arcname, file_field, modified_at in submission_zip_entries(uploaded_files, prefix=prefix):
+                try:
+                    for _ in write_zip_entry(archive, arcname, file_field, modified_at):
+                        if time.monotonic() - last_beat >= HEARTBEAT_SECONDS:
+                            SubmissionExportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now())
+                            last_beat = time.monotonic()
+                except ZipSourceUnavailable as exc:
+                    # 单个文件缺失不应让整个通道的导出失败（重试也会卡在同一个文件上）
+                    logger.warning('材料打包任务 %s 跳过缺失文件 %s', job.pk, exc)
+                    write_missing_note(archive, arcname, modified_at)
+        _save_checkpoint(part_path, archive.start_dir)
+
+        processed += len(uploaded_files)
+        SubmissionExportJob.objects.filter(pk=job.pk).update(processed_files=processed, heartbeat_at=timezone.now())
+        last_beat = time.monotonic()
+
+    if not os.path.exists(part_path):
+        # 没有任何文件时也生成一个合法的空压缩包
+        zipfile.ZipFile(part_path, 'w').close()
+    os.replace(part_path, final_path)
+    checkpoint = part_path + _CHECKPOINT_SUFFIX
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    job.processed_files = processed
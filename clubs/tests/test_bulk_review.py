@@ -0,0 +1,37 @@
+"""批量打回与单条打回一样，在审核事务提交后才调整合并文档。"""
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase
+
+from clubs import views
+from clubs.models import Club, FormChannel, FormSubmission, FormSubmissionReview, UserProfile
+
+
+class BulkRejectMergeSchedulingTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', password='pw123456!')
+        UserProfile.objects.create(user=self.staff, role='staff', real_name='干事')
+        president = User.objects.create_user('president', password='pw123456!')
+        UserProfile.objects.create(user=president, role='president', real_name='社长')
+        club = Club.objects.create(name='测试社团', founded_date=date(2020, 1, 1))
+        channel = FormChannel.objects.create(name='测试通道', slug='bulk-review-test')
+        self.submissions = [
+            FormSubmission.objects.create(channel=channel, club=club, submitter=president)
+            for _index in range(3)
+        ]
+
+    def test_merge_failure_after_commit_keeps_the_rejections(self):
+        public_ids = [submission.public_id for submission in self.submissions]
+        with mock.patch('clubs.views.schedule_submission_merges', side_effect=RuntimeError('merge failed')) as scheduled:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    results = views._bulk_review_submissions(public_ids, self.staff, 'rejected', '材料不全')
+                    scheduled.assert_not_called()
+
+        self.assertEqual(scheduled.call_count, 3)
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(FormSubmission.objects.filter(pk__in=[s.pk for s in self.submissions], status='rejected').count(), 3)
+        self.assertEqual(FormSubmissionReview.objects.filter(reviewer=self.staff, status='rejected').count(), 3)
@@ -0,0 +1,84 @@
+"""新建动态表单提交的查询次数不随字段数和文件数增长。"""
+import shutil
+import tempfile
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from clubs import views
+from clubs.form_schema import get_channel_schema
+from clubs.models import Club, FormChannel, FormField, FormUploadedFile, UserProfile
+from clubs.word_merge import schedule_field_merge
+
+
+# 统计提交次数、插入提交、批量插入字段值、批量插入上传记录，以及 atomic 的保存点与释放
+BASE_QUERY_COUNT = 6
+
+
+class SaveDynamicSubmissionQueryTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user('president', password='pw123456!')
+        UserProfile.objects.create(user=self.user, role='president', real_name='社长')
+        self.club = Club.objects.create(name='测试社团', founded_date=date(2020, 1, 1))
+
+    def _channel(self, slug, text_fields, file_fields, merge_files=0):
+        channel = FormChannel.objects.create(name=slug, slug=slug)
+        for index in range(text_fields):
+            FormField.objects.create(channel=channel, label=f'文本{index}', field_key=f'text-{index}', field_type='text', order=index)
+        for index in range(file_fields):
+            FormField.objects.create(
+                channel=channel, label=f'附件{index}', field_key=f'file-{index}', field_type='file', order=100 + index,
+                validation={'allowed_extensions': ['.pdf'], 'allow_multiple': merge_files > 1, 'merge_to_word': merge_files > 1},
+            )
+        return channel
+
+    def _save(self, channel, files_per_field=1):
+        schema = get_channel_schema(channel)
+        cleaned = {}
+        upload_map = {}
+        for field in schema.fields:
+            if field.field_type == 'file':
+                upload_map[field.id] = [
+                    SimpleUploadedFile(f'scan{index}.pdf', b'%PDF-1.4', content_type='application/pdf')
+                    for index in range(files_per_field)
+                ]
+            else:
+                cleaned[field.id] = f'{field.label} 的内容'
+        with CaptureQueriesContext(connection) as queries:
+            submission = views._save_dynamic_submission(channel, self.club, self.user, schema.fields, cleaned, upload_map)
+        return submission, len(queries)
+
+    def test_query_count_is_flat_as_fields_are_added(self):
+        small_submission, small_count = self._save(self._channel('small', text_fields=3, file_fields=2))
+        large_submission, large_count = self._save(self._channel('large', text_fields=12, file_fields=6))
+
+        self.assertEqual(small_count, BASE_QUERY_COUNT)
+        self.assertEqual(large_count, BASE_QUERY_COUNT)
+        self.assertEqual(large_submission.values.count(), 12)
+        self.assertEqual(large_submission.uploaded_files.count(), 6)
+
+    def test_merge_field_uses_just_written_records_as_sources(self):
+        channel = self._channel('merge', text_fields=2, file_fields=1, merge_files=3)
+        with mock.patch('clubs.views.schedule_field_merge', wraps=schedule_field_merge) as scheduled:
+            submission, count = self._save(channel, files_per_field=3)
+
+        scheduled.assert_called_once()
+        sources = scheduled.call_args.kwargs['sources']
+        self.assertEqual(len(sources), 3)
+        self.assertTrue(all(record.pk for record in sources))
+        # 只多出合并文档占位行的一次插入，不回查源文件
+        if connection.features.can_return_rows_from_bulk_insert:
+            self.assertEqual(count, BASE_QUERY_COUNT + 1)
+        self.assertEqual(submission.uploaded_files.filter(is_generated=False).count(), 3)
+        self.assertEqual(submission.uploaded_files.filter(is_generated=True).count(), 1)
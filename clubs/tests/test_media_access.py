@@ -0,0 +1,66 @@
+"""/media/ 与 /download/ 必须对同一文件给出相同的访问结果。"""
+import os
+import shutil
+import tempfile
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from clubs.models import Club, FormChannel, FormSubmission, UserProfile
+from clubs.oobe_bootstrap import mark_setup_complete
+
+
+class MediaAccessTests(TestCase):
+    def setUp(self):
+        mark_setup_complete()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.submitter = self._user('submitter', 'president')
+        self.member = self._user('member', 'member')
+        self.staff = self._user('staff', 'staff')
+        club = Club.objects.create(name='测试社团', founded_date=date(2020, 1, 1))
+        channel = FormChannel.objects.create(name='测试通道', slug='media-access-test')
+        submission = FormSubmission.objects.create(channel=channel, club=club, submitter=self.submitter)
+
+        self.submission_path = self._write(f'form_submissions/{submission.public_id}/id.txt')
+        self.export_path = self._write('exports/submissions/all.zip')
+
+    def _user(self, username, role):
+        user = User.objects.create_user(username, password='pw123456!')
+        UserProfile.objects.create(user=user, role=role, real_name=username)
+        return user
+
+    def _write(self, relative_path):
+        full_path = os.path.join(self.media_root, relative_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as handle:
+            handle.write(b'secret')
+        return relative_path
+
+    def _statuses(self, user, relative_path):
+        self.client.force_login(user)
+        media = self.client.get(f'/media/{relative_path}')
+        download = self.client.get(reverse('clubs:download_file'), {'file_path': relative_path})
+        return media.status_code, download.status_code
+
+    def test_member_cannot_read_other_submission_files(self):
+        self.assertEqual(self._statuses(self.member, self.submission_path), (403, 403))
+
+    def test_member_cannot_read_staff_exports(self):
+        self.assertEqual(self._statuses(self.member, self.export_path), (403, 403))
+
+    def test_download_path_traversal_is_classified_by_real_location(self):
+        self.client.force_login(self.member)
+        response = self.client.get(reverse('clubs:download_file'), {'file_path': 'templates/../' + self.export_path})
+        self.assertEqual(response.status_code, 403)
+
+    def test_submitter_and_staff_can_read_submission_files(self):
+        self.assertEqual(self._statuses(self.submitter, self.submission_path), (200, 200))
+        self.assertEqual(self._statuses(self.staff, self.submission_path), (200, 200))
+        self.assertEqual(self._statuses(self.staff, self.export_path), (200, 200))
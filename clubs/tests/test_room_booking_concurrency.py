@@ -0,0 +1,83 @@
+"""并发预约同一房间同一时段：按 (房间, 日期) 锁行串行化后只能有一个成功。"""
+import threading
+from datetime import date, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TransactionTestCase
+
+from clubs.models import Room, RoomBooking, UserProfile
+from clubs.room_availability import RoomBookingConflict, reserve_room_booking, reserve_room_booking_series
+
+
+THREADS = 8
+BOOKING_DATE = date(2030, 3, 4)
+
+
+def _run_concurrently(targets):
+    """所有线程在 Barrier 处会合后同时开始，返回每个线程的结果或异常。"""
+    barrier = threading.Barrier(len(targets))
+    outcomes = [None] * len(targets)
+
+    def worker(index, target):
+        try:
+            barrier.wait()
+            outcomes[index] = target()
+        except Exception as exc:  # 异常按结果收集，由断言区分冲突与其他错误
+            outcomes[index] = exc
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(index, target)) for index, target in enumerate(targets)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+class RoomBookingConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('内存 SQLite 的共享缓存按表加锁且不等待忙超时，多线程写入需要文件测试库')
+        self.user = User.objects.create_user('booker', password='pw123456!')
+        UserProfile.objects.create(user=self.user, real_name='预约人')
+        self.room = Room.objects.create(name='活动室 101')
+
+    def _fields(self):
+        return {
+            'user': self.user,
+            'purpose': '社团例会',
+            'participant_count': 20,
+            'contact_phone': '13800000000',
+        }
+
+    def _reserve_single(self):
+        return reserve_room_booking(self.room, BOOKING_DATE, time(14, 0), time(16, 0), **self._fields())
+
+    def test_same_slot_from_many_threads_books_once(self):
+        outcomes = _run_concurrently([self._reserve_single] * THREADS)
+
+        successes = [item for item in outcomes if isinstance(item, RoomBooking)]
+        conflicts = [item for item in outcomes if isinstance(item, RoomBookingConflict)]
+        self.assertEqual(len(successes), 1, outcomes)
+        self.assertEqual(len(conflicts), THREADS - 1, outcomes)
+        self.assertEqual(RoomBooking.objects.filter(room=self.room, status='active').count(), 1)
+
+    def test_series_and_single_booking_on_overlapping_day(self):
+        series_days = [BOOKING_DATE + timedelta(weeks=week) for week in range(-2, 3)]
+
+        def reserve_series():
+            return reserve_room_booking_series(self.room, series_days, time(15, 0), time(17, 0), **self._fields())
+
+        outcomes = _run_concurrently([reserve_series, self._reserve_single] * (THREADS // 2))
+
+        series_successes = [item for item in outcomes if isinstance(item, list)]
+        single_successes = [item for item in outcomes if isinstance(item, RoomBooking)]
+        conflicts = [item for item in outcomes if isinstance(item, RoomBookingConflict)]
+        self.assertEqual(len(series_successes) + len(single_successes), 1, outcomes)
+        self.assertEqual(len(conflicts), THREADS - 1, outcomes)
+        bookings = RoomBooking.objects.filter(room=self.room, status='active')
+        expected = len(series_days) if series_successes else 1
+        self.assertEqual(bookings.count(), expected)
+        self.assertEqual(bookings.filter(booking_date=BOOKING_DATE).count(), 1)
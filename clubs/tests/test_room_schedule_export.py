@@ -0,0 +1,13 @@
+"""日程表导出的时间段配置不修改模块级默认值。"""
+from django.test import TestCase
+
+from clubs import export_views
+
+
+class ExportTimeSlotsTests(TestCase):
+    def test_default_slots_are_not_mutated(self):
+        slots = export_views._export_time_slots()
+
+        self.assertEqual(len(slots), len(export_views.DEFAULT_EXPORT_TIME_SLOTS))
+        self.assertEqual(slots[0]['text'], '第1-2节(08:15-09:55)')
+        self.assertTrue(all('text' not in slot for slot in export_views.DEFAULT_EXPORT_TIME_SLOTS))
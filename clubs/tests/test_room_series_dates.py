@@ -0,0 +1,64 @@
+"""周期预约日期序列的上限与边界，以及提交表单中周期参数的校验。"""
+from datetime import date, time
+
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from clubs.models import Room, RoomBooking, TimeSlot, UserProfile
+from clubs.oobe_bootstrap import mark_setup_complete
+from clubs.room_availability import MAX_SERIES_OCCURRENCES, series_dates
+
+
+class SeriesDatesTests(SimpleTestCase):
+    def test_biweekly_skips_excluded_dates(self):
+        dates = series_dates(date(2030, 3, 4), date(2030, 4, 30), 2, [date(2030, 3, 18)])
+        self.assertEqual(dates, [date(2030, 3, 4), date(2030, 4, 1), date(2030, 4, 15), date(2030, 4, 29)])
+
+    def test_far_until_date_stops_just_past_limit(self):
+        dates = series_dates(date(2030, 3, 4), date.max, limit=MAX_SERIES_OCCURRENCES)
+        self.assertEqual(len(dates), MAX_SERIES_OCCURRENCES + 1)
+
+    def test_series_ending_at_date_max_does_not_overflow(self):
+        dates = series_dates(date(9999, 12, 1), date.max, limit=MAX_SERIES_OCCURRENCES)
+        self.assertEqual(dates[-1], date(9999, 12, 29))
+
+
+class SubmitRoomBookingSeriesInputTests(TestCase):
+    def setUp(self):
+        mark_setup_complete()
+        self.staff = User.objects.create_user('staff', password='pw123456!')
+        UserProfile.objects.create(user=self.staff, role='staff', real_name='干事')
+        self.room = Room.objects.create(name='活动室 101')
+        TimeSlot.objects.create(start_time=time(14, 0), end_time=time(16, 0), label='下午')
+        self.client.force_login(self.staff)
+
+    def _submit(self, **series):
+        data = {
+            'room_id': self.room.pk,
+            'booking_date': '2030-03-04',
+            'start_time': '14:00',
+            'end_time': '16:00',
+            'purpose': '社团例会',
+            'contact_phone': '13800000000',
+            'participant_count': '20',
+            'repeat': 'weekly',
+            **series,
+        }
+        response = self.client.post(reverse('clubs:submit_room_booking'), data)
+        self.assertRedirects(response, reverse('clubs:submit_room_booking'), fetch_redirect_response=False)
+        self.assertFalse(RoomBooking.objects.exists())
+        return [str(message) for message in get_messages(response.wsgi_request)]
+
+    def test_malformed_exclude_date_gets_specific_message(self):
+        self.assertEqual(
+            self._submit(repeat_until='2030-04-01', exclude_dates='2030-03-11, 3/18'),
+            ['排除日期格式应为 YYYY-MM-DD，多个日期用逗号分隔'],
+        )
+
+    def test_malformed_repeat_until_gets_specific_message(self):
+        self.assertEqual(self._submit(repeat_until='2030/04/01'), ['周期截止日期格式应为 YYYY-MM-DD'])
+
+    def test_repeat_until_before_first_date_is_rejected(self):
+        self.assertEqual(self._submit(repeat_until='2030-03-01'), ['周期截止日期不能早于首次预约日期'])
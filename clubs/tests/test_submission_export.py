@@ -0,0 +1,48 @@
+"""通道批量打包：存储中缺失的个别文件不影响整个压缩包的生成。"""
+import shutil
+import tempfile
+import zipfile
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from clubs.models import Club, FormChannel, FormField, FormSubmission, FormUploadedFile, SubmissionExportJob, UserProfile
+from clubs.submission_export import archive_path, get_or_start_export, run_export_job
+from clubs.zip_stream import MISSING_NOTE_SUFFIX
+
+
+class SubmissionExportMissingFileTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        president = User.objects.create_user('president', password='pw123456!')
+        UserProfile.objects.create(user=president, role='president', real_name='社长')
+        club = Club.objects.create(name='测试社团', founded_date=date(2020, 1, 1))
+        self.channel = FormChannel.objects.create(name='年审', slug='export-test')
+        field = FormField.objects.create(channel=self.channel, label='材料', field_key='files', field_type='file')
+        self.submission = FormSubmission.objects.create(channel=self.channel, club=club, submitter=president)
+
+        kept = FormUploadedFile(submission=self.submission, field=field, original_name='kept.txt')
+        kept.file.save('kept.txt', ContentFile(b'kept'), save=True)
+        missing = FormUploadedFile(submission=self.submission, field=field, original_name='missing.pdf')
+        missing.file.save('missing.pdf', ContentFile(b'%PDF'), save=True)
+        missing.file.storage.delete(missing.file.name)
+
+    def test_missing_file_is_noted_and_job_completes(self):
+        job = get_or_start_export(self.channel)
+        run_export_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, 'done', job.error)
+        self.assertEqual(job.processed_files, 2)
+        prefix = f'测试社团/{self.submission.public_id}/材料/'
+        with zipfile.ZipFile(archive_path(job)) as archive:
+            self.assertEqual(sorted(archive.namelist()), [prefix + 'kept.txt', prefix + 'missing.pdf' + MISSING_NOTE_SUFFIX])
+            self.assertEqual(archive.read(prefix + 'kept.txt'), b'kept')
+        self.assertFalse(SubmissionExportJob.objects.filter(state='failed').exists())
@@ -0,0 +1,36 @@
+"""列表页只预取标题字段时，display_title 走内存，field_value 仍能读到其余字段。"""
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db.models import Prefetch
+from django.test import TestCase
+
+from clubs.models import Club, FormChannel, FormField, FormFieldValue, FormSubmission
+
+
+class SubmissionFieldValueTests(TestCase):
+    def setUp(self):
+        president = User.objects.create_user('president', password='pw123456!')
+        club = Club.objects.create(name='测试社团', founded_date=date(2020, 1, 1))
+        channel = FormChannel.objects.create(name='社团注册', slug='field-value-test')
+        submission = FormSubmission.objects.create(channel=channel, club=club, submitter=president)
+        for key, text in (('club_name', '新社团'), ('club_description', '社团介绍')):
+            field = FormField.objects.create(channel=channel, label=key, field_key=key, field_type='text')
+            FormFieldValue.objects.create(submission=submission, field=field, value_text=text)
+
+    def _with_display_values(self):
+        return FormSubmission.objects.select_related('club').prefetch_related(Prefetch(
+            'values',
+            queryset=FormFieldValue.objects.filter(field__field_key__in=FormSubmission.DISPLAY_TITLE_KEYS).select_related('field'),
+            to_attr='display_values',
+        )).get()
+
+    def test_display_title_reads_prefetched_values(self):
+        submission = self._with_display_values()
+        with self.assertNumQueries(0):
+            self.assertEqual(submission.display_title, '新社团')
+
+    def test_field_value_is_not_limited_by_display_prefetch(self):
+        submission = self._with_display_values()
+        self.assertEqual(submission.field_value('club_description'), '社团介绍')
+        self.assertEqual(submission.field_value('club_name'), '新社团')
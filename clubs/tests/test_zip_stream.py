@@ -0,0 +1,43 @@
+"""流式 ZIP 遇到存储中缺失的文件时仍输出完整的压缩包。"""
+import io
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db.models.fields.files import FieldFile
+from django.test import SimpleTestCase
+
+from clubs.models import FormUploadedFile
+from clubs.zip_stream import MISSING_NOTE_SUFFIX, iter_zip_stream
+
+
+class ZipStreamMissingFileTests(SimpleTestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.storage = FileSystemStorage(location=location)
+        self.field = FormUploadedFile._meta.get_field('file')
+
+    def _field_file(self, name, content=None):
+        if content is not None:
+            name = self.storage.save(name, ContentFile(content))
+        field_file = FieldFile(None, self.field, name)
+        field_file.storage = self.storage
+        return field_file
+
+    def test_missing_file_becomes_note_and_archive_stays_valid(self):
+        modified_at = datetime(2030, 3, 4, 12, 0)
+        entries = [
+            ('附件/a.txt', self._field_file('a.txt', b'first'), modified_at),
+            ('附件/gone.pdf', self._field_file('gone.pdf'), modified_at),
+            ('附件/b.txt', self._field_file('b.txt', b'second'), modified_at),
+        ]
+        data = b''.join(iter_zip_stream(entries))
+
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), ['附件/a.txt', '附件/gone.pdf' + MISSING_NOTE_SUFFIX, '附件/b.txt'])
+            self.assertEqual(archive.read('附件/b.txt'), b'second')
@@ -57,6 +57,7 @@ urlpatterns = [
     # 干事审核
     path('staff/audit-center/<str:tab>/', views.staff_audit_center, name='staff_audit_center'),  # 干事审核中心
     path('staff/audit-center/<str:tab>/<str:item_key>/delete/', views.delete_audit_request, name='delete_audit_request'),
+    path('staff/audit-center/<str:tab>/bulk-review/', views.bulk_review_submissions, name='bulk_review_submissions'),  # 审核中心批量通过/打回
     path('api/clubs/list/', views.get_clubs_list, name='get_clubs_list'),
     path('api/department/<int:department_id>/members/', views.get_department_members, name='get_department_members'),
     # path('staff/home/', auth_views.staff_dashboard_home, name='staff_dashboard_home'),
@@ -77,6 +78,8 @@ urlpatterns = [
 
     # 统一压缩下载路由：/zip-download/?type=<type>&id=<id>
     path('zip-download/', views.zip_download, name='zip_download'),
+    path('form-file/<int:file_id>/preview/', views.preview_uploaded_file, name='preview_uploaded_file'),
+    path('form-file/<int:file_id>/preview/page/<int:page_number>/', views.preview_uploaded_file_page, name='preview_uploaded_file_page'),
 
     # 统一审核路由
     
@@ -95,6 +98,7 @@ urlpatterns = [
     
     # 房间借用
     path('room/calendar/', views.room_calendar, name='room_calendar'),
+    path('api/room-availability/', views.room_availability_api, name='room_availability_api'),
     path('room/submit-booking/', views.submit_room_booking, name='submit_room_booking'),
     path('room/my-bookings/', views.my_room_bookings, name='my_room_bookings'),
     path('room/edit-booking/<int:booking_id>/', views.edit_room_booking, name='edit_room_booking'),
@@ -115,6 +119,9 @@ urlpatterns = [
     
     # 审核中心导出
     path('staff/audit-center/<str:tab>/export/', export_views.export_audit_center_data, name='export_audit_center_data'),
+    path('staff/audit-center/<str:tab>/export-files/', export_views.start_submission_export, name='start_submission_export'),
+    path('staff/exports/<int:job_id>/', export_views.submission_export_status, name='submission_export_status'),
+    path('staff/exports/<int:job_id>/download/', export_views.download_submission_export, name='download_submission_export'),
     
     # 管理员功能
     path('admin-panel/dashboard/', views.admin_dashboard, name='admin_dashboard'),
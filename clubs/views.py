@@ -7,19 +7,23 @@ Django 社团管理系统视图模块
 这对代码的实际功能没有影响，只是消除了 IDE 中的假性错误警告。
 """
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.urls import reverse
-from django.views.decorators.http import require_http_methods, require_GET, require_POST
+from django.views.decorators.clickjacking import xframe_options_sameorigin
+from django.views.decorators.http import condition, require_http_methods, require_GET, require_POST
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.safestring import mark_safe
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from django.conf import settings
-from django.http import HttpResponse, FileResponse, HttpResponseForbidden, JsonResponse, Http404
+from django.http import HttpResponse, FileResponse, HttpResponseForbidden, JsonResponse, Http404, StreamingHttpResponse
 from django.db import IntegrityError, transaction
-from django.db.models import Q, Prefetch, FileField, Count
+from django.db.models import Q, F, Prefetch, FileField, Count, Max, Case, When, Value, BooleanField, Window
+from django.db.models.functions import RowNumber
 from django.core.cache import cache
 from django.core.files.base import ContentFile
 from collections import defaultdict
@@ -28,6 +32,7 @@ import re
 import urllib.parse
 import os
 import base64
+import hashlib
 import tempfile
 import csv
 import io
@@ -45,7 +50,24 @@ from .business_forms import (
 from django.contrib.contenttypes.models import ContentType
 import shutil
 from PIL import Image
-from .context_processors import audit_center_counts as get_audit_center_counts
+from .context_processors import get_audit_center_counts
+from .nav_counters import approval_channel_counts, audit_channel_counts, invalidate_submission_counts
+from .file_preview import PREVIEW_DOCX, PREVIEW_IMAGE, PREVIEW_PDF, docx_preview_html, pdf_preview_page_count, pdf_preview_page_path, preview_kind
+from .file_serving import UnsafeFilePath, resolve_media_path, serve_file
+from .media_serving import can_access_media
+from .form_schema import get_channel_schema
+from .keyset_pagination import keyset_page
+from .principal import get_principal
+from .room_availability import (
+    MAX_SERIES_OCCURRENCES,
+    RoomAvailability,
+    RoomBookingConflict,
+    reserve_room_booking,
+    reserve_room_booking_series,
+    series_dates,
+)
+from .word_merge import safe_filename_part, schedule_field_merge, schedule_submission_merges
+from .zip_stream import iter_zip_stream, submission_zip_entries
 from .site_assets import process_site_logo
 from .lifecycle_utils import mark_profile_inactive
 
@@ -85,41 +107,22 @@ def rename_uploaded_file(file, club_name, request_type, material_type):
 
 def _is_president(user):
     """检查用户是否为社长"""
-    if not user.is_authenticated:
-        return False
-    try:
-        return user.profile.role == 'president'
-    except UserProfile.DoesNotExist:
-        return False
+    return get_principal(user).is_president
 
 
 def _is_staff(user):
     """检查用户是否为干事"""
-    if not user.is_authenticated:
-        return False
-    try:
-        return user.profile.role == 'staff'
-    except UserProfile.DoesNotExist:
-        return False
+    return get_principal(user).is_staff
 
 
 def _is_admin(user):
     """检查用户是否为管理员"""
-    if not user.is_authenticated:
-        return False
-    try:
-        return user.profile.role == 'admin'
-    except UserProfile.DoesNotExist:
-        return False
+    return get_principal(user).is_admin
 
 
 def _get_president_club_ids(user):
-    """获取社长可访问的社团ID（通过 Officer 表查询）。"""
-    return list(Officer.objects.filter(
-        user_profile__user=user,
-        position='president',
-        is_current=True,
-    ).values_list('club_id', flat=True))
+    """获取社长可访问的社团ID（来自请求级 Principal，不重复查询 Officer 表）。"""
+    return list(get_principal(user).president_club_ids)
 
 
 def _build_external_url(request, path: str) -> str:
@@ -164,13 +167,7 @@ def _make_qr_data_uri(payload: str) -> str:
 
 def is_staff_or_admin(user):
     """返回用户是否为干事或管理员（布尔）。超级用户也视为管理员。"""
-    try:
-        # 超级用户始终有管理员权限
-        if getattr(user, 'is_superuser', False):
-            return True
-        return getattr(user, 'profile', None) and user.profile.role in ['staff', 'admin']
-    except Exception:
-        return False
+    return get_principal(user).is_staff_or_admin
 
 
 def _validate_word_file(file, field_name):
@@ -208,6 +205,26 @@ def _validate_file_allowed(file, field_name, allowed_extensions, allowed_mimetyp
 
 import json
 
+
+def _normalize_download_path(file_path):
+    """把 file_path 参数（相对路径、/media/ 开头的路径或完整 URL）规范为相对 MEDIA_ROOT 的路径。"""
+    # 清理file_path，移除可能的查询参数或片段
+    file_path = file_path.split('?')[0].split('#')[0]
+
+    # 如果file_path包含完整URL，提取相对路径
+    if file_path.startswith('http://') or file_path.startswith('https://'):
+        file_path = urllib.parse.unquote(urllib.parse.urlparse(file_path).path)
+
+    # 移除 MEDIA_URL 前缀、开头的斜杠以及 media/ 前缀
+    media_url = settings.MEDIA_URL
+    if file_path.startswith(media_url):
+        file_path = file_path[len(media_url):]
+    file_path = file_path.lstrip('/')
+    if file_path.startswith('media/'):
+        file_path = file_path[6:]
+    return file_path
+
+
 @login_required(login_url=settings.LOGIN_URL)
 def download_file(request):
     """自定义文件下载视图，用于处理文件下载并重命名
@@ -215,140 +232,47 @@ def download_file(request):
     GET参数:
         file_path: 文件的相对路径（相对于MEDIA_ROOT）
         filename: 下载时使用的文件名
+
+    文件只能位于 MEDIA_ROOT 之内，并与 /media/ 做同样的访问检查（can_access_media）；配置 FILE_OFFLOAD_BACKEND 时由前端代理发送，
+    否则流式发送并支持 Range / ETag。DEBUG 下通过 X-Debug-Info 头返回处理过程。
     """
-    # 从GET请求中获取参数
     file_path = request.GET.get('file_path', '')
     filename = request.GET.get('filename', '')
+    trace = [] if settings.DEBUG else None
 
-    # 添加调试信息
-    debug_info = {
-        'received_params': {
-            'file_path': file_path,
-            'filename': filename,
-        },
-        'processing_steps': [],
-        'settings_info': {
-            'MEDIA_ROOT': str(getattr(settings, 'MEDIA_ROOT', 'Not set')),
-            'MEDIA_URL': str(getattr(settings, 'MEDIA_URL', 'Not set')),
-            'BASE_DIR': str(getattr(settings, 'BASE_DIR', 'Not set')),
-        }
-    }
-
-    debug_info['processing_steps'].append(f"Received parameters - file_path: {file_path}, filename: {filename}")
+    def finish(response):
+        if trace is not None:
+            response['X-Debug-Info'] = json.dumps(trace, ensure_ascii=False)
+        return response
 
     # 检查必要参数
     if not file_path:
-        debug_info['processing_steps'].append('Missing file_path parameter')
-        response = HttpResponse("缺少文件路径参数", status=400)
-        response['X-Debug-Info'] = json.dumps(debug_info, ensure_ascii=False)
-        return response
+        return finish(HttpResponse("缺少文件路径参数", status=400))
 
-    # 构建完整的文件路径
-    # 清理file_path，移除可能的查询参数或片段
-    if '?' in file_path:
-        file_path = file_path.split('?')[0]
-        debug_info['processing_steps'].append(f"Removed query parameters: {file_path}")
-    if '#' in file_path:
-        file_path = file_path.split('#')[0]
-        debug_info['processing_steps'].append(f"Removed fragment: {file_path}")
-
-    # 如果file_path包含完整URL，提取相对路径
-    if file_path.startswith('http://') or file_path.startswith('https://'):
-        # 移除域名部分，获取相对路径
-        from urllib.parse import urlparse
-        parsed_url = urlparse(file_path)
-        file_path = parsed_url.path
-        debug_info['processing_steps'].append(f"Extracted path from URL: {file_path}")
-
-        # 如果路径以MEDIA_URL开头，移除它
-        media_url = settings.MEDIA_URL
-        if file_path.startswith(media_url):
-            file_path = file_path[len(media_url):]
-            debug_info['processing_steps'].append(f"Removed MEDIA_URL prefix: {file_path}")
-        elif file_path.startswith('/' + media_url):
-            file_path = file_path[len('/' + media_url):]
-            debug_info['processing_steps'].append(f"Removed leading slash and MEDIA_URL prefix: {file_path}")
-    elif file_path.startswith('/'):
-        # 如果路径以斜杠开头，移除它
-        file_path = file_path[1:]
-        debug_info['processing_steps'].append(f"Removed leading slash: {file_path}")
-
-    # 特别处理以media/开头的路径
-    if file_path.startswith('media/'):
-        file_path = file_path[6:]  # 移除'media/'前缀
-        debug_info['processing_steps'].append(f"Removed media/ prefix: {file_path}")
-
-    full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-    debug_info['processing_steps'].append(f"Constructed full path: {full_path}")
-    debug_info['processing_steps'].append(f"MEDIA_ROOT: {settings.MEDIA_ROOT}")
+    relative_path = _normalize_download_path(file_path)
+    if trace is not None:
+        trace.append(f"Normalized path: {relative_path}")
 
-    # 检查文件是否存在
-    if not os.path.exists(full_path):
-        debug_info['processing_steps'].append(f"File not found at primary path: {full_path}")
-        # 尝试其他可能的路径
-        alternative_path = os.path.join(settings.BASE_DIR, file_path)
-        debug_info['processing_steps'].append(f"Trying alternative path: {alternative_path}")
-        if os.path.exists(alternative_path):
-            full_path = alternative_path
-            debug_info['processing_steps'].append(f"Found file at alternative path: {full_path}")
-        else:
-            debug_info['processing_steps'].append(f"Alternative path also not found: {alternative_path}")
-            response = HttpResponse(json.dumps(debug_info, ensure_ascii=False, indent=2), content_type='application/json', status=404)
-            response['X-Debug-Info'] = json.dumps(debug_info, ensure_ascii=False)
-            return response
-
-    debug_info['processing_steps'].append(f"File exists: {full_path}")
-
-    # 获取文件大小
-    try:
-        file_size = os.path.getsize(full_path)
-        debug_info['processing_steps'].append(f"File size: {file_size} bytes")
-    except Exception as e:
-        debug_info['processing_steps'].append(f"Error getting file size: {str(e)}")
-        file_size = None
-
-    # 如果没有提供文件名，使用原始文件名
-    if not filename:
-        filename = os.path.basename(full_path)
-        debug_info['processing_steps'].append(f"Using default filename: {filename}")
-    else:
-        # 确保文件名是安全的（移除路径分隔符）
-        filename = os.path.basename(filename)
-        debug_info['processing_steps'].append(f"Using provided filename: {filename}")
-
-    # 添加最终调试信息
-    debug_info['processing_steps'].append(f"Final filename: {filename}")
-
-    # 创建文件响应
     try:
-        # 打开文件并创建响应
-        with open(full_path, 'rb') as f:
-            response = HttpResponse(f.read(), content_type='application/octet-stream')
+        full_path = resolve_media_path(relative_path)
+    except UnsafeFilePath:
+        return finish(HttpResponse("非法的文件路径", status=400))
+    if trace is not None:
+        trace.append(f"Resolved path: {full_path}")
 
-            # 处理文件名编码以支持中文
-            ascii_filename = filename.encode('ascii', 'ignore').decode('ascii')
-            utf8_filename = filename.encode('utf-8')
+    if not can_access_media(request.user, full_path):
+        return finish(HttpResponseForbidden("无权访问此文件"))
 
-            # 设置Content-Disposition头以指定下载文件名
-            response['Content-Disposition'] = f"attachment; filename*=UTF-8''{urllib.parse.quote(utf8_filename)}"
-            debug_info['processing_steps'].append(f"Set Content-Disposition: attachment; filename*=UTF-8''{urllib.parse.quote(utf8_filename)}")
-
-            # 添加文件信息到响应头
-            if file_size:
-                response['Content-Length'] = str(file_size)
-                debug_info['processing_steps'].append(f"Set Content-Length: {file_size}")
-
-            # 添加调试信息到响应头
-            response['X-Debug-Info'] = json.dumps(debug_info, ensure_ascii=False)
-
-            return response
+    # 检查文件是否存在
+    if not os.path.isfile(full_path):
+        return finish(HttpResponse("文件不存在", status=404))
 
-    except Exception as e:
-        debug_info['processing_steps'].append(f"Error opening file: {str(e)}")
-        response = HttpResponse(json.dumps(debug_info, ensure_ascii=False, indent=2), content_type='application/json', status=500)
-        response['X-Debug-Info'] = json.dumps(debug_info, ensure_ascii=False)
-        return response
+    # 如果没有提供文件名，使用原始文件名；提供时确保文件名是安全的（移除路径分隔符）
+    filename = os.path.basename(filename) if filename else os.path.basename(full_path)
+    if trace is not None:
+        trace.append(f"Final filename: {filename}")
 
+    return finish(serve_file(request, full_path, filename=filename, content_type='application/octet-stream'))
 
 
 @login_required(login_url='clubs:login')
@@ -370,7 +294,7 @@ def user_detail(request, user_id):
         profile = target_user.profile
 
         # 检查是否为当前查看者(社长)负责的社团的干事
-        if request.user.is_authenticated and hasattr(request.user, 'profile') and request.user.profile.role == 'president':
+        if request.principal.is_president:
             if profile.role == 'staff':
                 # 获取该干事负责的社团
                 staff_club_ids = StaffClubRelation.objects.filter(
@@ -379,11 +303,7 @@ def user_detail(request, user_id):
                 ).values_list('club_id', flat=True)
 
                 # 获取当前用户(社长)负责的社团
-                president_club_ids = Officer.objects.filter(
-                    user_profile=request.user.profile,
-                    position='president',
-                    is_current=True
-                ).values_list('club_id', flat=True)
+                president_club_ids = request.principal.president_club_ids
 
                 # 检查是否有交集
                 if set(staff_club_ids) & set(president_club_ids):
@@ -534,13 +454,7 @@ def index(request):
     # 普通用户显示所有社团
     clubs = list(Club.objects.all())
     # 一次性查出当前用户担任社长的所有社团 ID，消除 N+1
-    president_club_ids = set(
-        Officer.objects.filter(
-            user_profile__user=request.user,
-            position='president',
-            is_current=True
-        ).values_list('club_id', flat=True)
-    )
+    president_club_ids = request.principal.president_club_ids
 
     clubs_data = [
         {'club': club, 'is_president': club.id in president_club_ids}
@@ -569,18 +483,10 @@ def club_detail(request, club_id):
     is_staff = False
     if request.user.is_authenticated:
         # 检查是否为社长
-        is_president = Officer.objects.filter(
-            user_profile__user=request.user,
-            club=club,
-            position='president',
-            is_current=True
-        ).exists()
+        is_president = request.principal.is_president_of(club)
 
         # 检查是否为干事或管理员
-        try:
-            is_staff = request.user.profile.role in ['staff', 'admin']
-        except:
-            is_staff = False
+        is_staff = request.principal.role in ['staff', 'admin']
 
     context = {
         'club': club,
@@ -598,12 +504,7 @@ def generate_member_join_token(request, club_id):
     """社长生成社员入会二维码令牌，支持可配置有效期和使用次数。"""
     club = get_object_or_404(Club, pk=club_id)
 
-    is_club_president = Officer.objects.filter(
-        user_profile__user=request.user,
-        club=club,
-        position='president',
-        is_current=True,
-    ).exists()
+    is_club_president = request.principal.is_president_of(club)
     if not is_club_president:
         return JsonResponse({'success': False, 'message': '仅该社团社长可生成入会二维码'}, status=403)
 
@@ -654,12 +555,7 @@ def generate_member_join_token(request, club_id):
 def delete_member_token(request, club_id, token_id):
     """社长删除指定招新令牌。"""
     club = get_object_or_404(Club, pk=club_id)
-    is_club_president = Officer.objects.filter(
-        user_profile__user=request.user,
-        club=club,
-        position='president',
-        is_current=True,
-    ).exists()
+    is_club_president = request.principal.is_president_of(club)
     if not is_club_president:
         return JsonResponse({'success': False, 'message': '仅该社团社长可删除令牌'}, status=403)
     deleted, _ = RegistrationToken.objects.filter(pk=token_id, club=club).delete()
@@ -672,12 +568,7 @@ def delete_member_token(request, club_id, token_id):
 def list_member_tokens(request, club_id):
     """社长查看当前有效的招新令牌列表（GET JSON）。"""
     club = get_object_or_404(Club, pk=club_id)
-    is_club_president = Officer.objects.filter(
-        user_profile__user=request.user,
-        club=club,
-        position='president',
-        is_current=True,
-    ).exists()
+    is_club_president = request.principal.is_president_of(club)
     if not is_club_president:
         return JsonResponse({'success': False, 'message': '仅该社团社长可查看令牌'}, status=403)
     now = timezone.now()
@@ -2498,37 +2389,68 @@ def zip_download(request):
         messages.warning(request, '这个提交没有可打包下载的文件')
         return redirect(request.META.get('HTTP_REFERER', 'clubs:staff_audit_center'))
 
-    import io
-    import zipfile
-    from pathlib import PurePath
-
-    buffer = io.BytesIO()
-    used_names = set()
-    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
-        for uploaded in uploaded_files:
-            field_label = uploaded.field.label if uploaded.field_id else '附件'
-            filename = uploaded.original_name or PurePath(uploaded.file.name).name
-            arcname = f'{field_label}/{filename}'
-            base, dot, suffix = arcname.rpartition('.')
-            candidate = arcname
-            counter = 2
-            while candidate in used_names:
-                candidate = f'{base}_{counter}.{suffix}' if dot else f'{arcname}_{counter}'
-                counter += 1
-            used_names.add(candidate)
-            uploaded.file.open('rb')
-            try:
-                archive.writestr(candidate, uploaded.file.read())
-            finally:
-                uploaded.file.close()
-
-    buffer.seek(0)
     filename = f'{submission.club.name}-{submission.channel.name}-{submission.public_id}.zip'
-    response = HttpResponse(buffer.getvalue(), content_type='application/zip')
+    response = StreamingHttpResponse(iter_zip_stream(submission_zip_entries(uploaded_files)), content_type='application/zip')
     response['Content-Disposition'] = f"attachment; filename*=UTF-8''{urllib.parse.quote(filename)}"
     return response
 
 
+def _can_view_submission_files(user, submission):
+    principal = get_principal(user)
+    return principal.is_staff_or_admin or principal.is_president_of(submission.club_id) or submission.submitter_id == user.pk
+
+
+@login_required(login_url=settings.LOGIN_URL)
+@require_GET
+@xframe_options_sameorigin
+def preview_uploaded_file(request, file_id):
+    """站内文件预览页（在审核页的预览弹窗中以 iframe 打开）。"""
+    uploaded = get_object_or_404(FormUploadedFile.objects.select_related('submission'), pk=file_id)
+    if not _can_view_submission_files(request.user, uploaded.submission):
+        return HttpResponseForbidden('无权预览此文件')
+    kind = preview_kind(uploaded)
+    if not kind:
+        raise Http404('该文件类型不支持预览')
+
+    context = {
+        'uploaded': uploaded,
+        'kind': kind,
+        'file_name': uploaded.original_name or os.path.basename(uploaded.file.name),
+    }
+    try:
+        if kind == PREVIEW_DOCX:
+            context['document_html'] = mark_safe(docx_preview_html(uploaded))
+        elif kind == PREVIEW_PDF:
+            context['page_urls'] = [
+                reverse('clubs:preview_uploaded_file_page', args=[uploaded.pk, page_number])
+                for page_number in range(1, pdf_preview_page_count(uploaded) + 1)
+            ]
+        elif kind == PREVIEW_IMAGE:
+            context['image_url'] = uploaded.file.url
+    except Exception as exc:
+        context['preview_error'] = f'无法解析这个文件，请下载原文件查看：{exc}'
+    response = render(request, 'clubs/file_preview.html', context)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required(login_url=settings.LOGIN_URL)
+@require_GET
+def preview_uploaded_file_page(request, file_id, page_number):
+    """PDF 预览的单页图片，首次请求时渲染并缓存。"""
+    uploaded = get_object_or_404(FormUploadedFile.objects.select_related('submission'), pk=file_id)
+    if not _can_view_submission_files(request.user, uploaded.submission):
+        return HttpResponseForbidden('无权预览此文件')
+    if preview_kind(uploaded) != PREVIEW_PDF:
+        raise Http404('该文件没有页面预览')
+    image_path = pdf_preview_page_path(uploaded, page_number)
+    if image_path is None:
+        raise Http404('页码不存在')
+    response = serve_file(request, image_path, as_attachment=False, content_type='image/png', cache_control='private, no-cache')
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
 
 
 def change_club_status(request, club_id):
@@ -2890,6 +2812,7 @@ def room222_calendar(request):
 
     # 为每个预订计算其在时间轴上的位置和高度
     bookings_with_position = []
+    permissions = RoomBooking.bulk_permissions(request.user, bookings)
     for booking in bookings:
         # 计算开始时间在时间轴上的位置（以分钟为单位，从8:15开始）
         start_minutes = (booking.start_time.hour * 60 + booking.start_time.minute) - day_start_minutes
@@ -2908,8 +2831,8 @@ def room222_calendar(request):
             'booking': booking,
             'top_percent': top_percent,
             'height_percent': height_percent,
-            'can_edit': booking.can_edit(request.user),
-            'can_delete': booking.can_delete(request.user),
+            'can_edit': permissions[booking.pk]['can_edit'],
+            'can_delete': permissions[booking.pk]['can_delete'],
         })
 
     # 计算周的起始日期（周一）
@@ -3332,16 +3255,20 @@ def room_calendar(request):
     week_start = view_date - timezone.timedelta(days=view_date.weekday())
 
     # 获取时间段
-    time_slots = TimeSlot.objects.filter(is_active=True).order_by('start_time')
+    time_slots = list(TimeSlot.objects.filter(is_active=True).order_by('start_time'))
+
+    # 一次查询加载当天预约，时段占用在内存中扫描得出
+    availability = RoomAvailability([selected_room], view_date)
+    slot_occupancy = availability.occupancy(time_slots)[selected_room.pk][view_date]
 
     # 计算整个日历的起止时间（用于计算百分比）
     # 默认 8:00 (480min) 到 22:00 (1320min)，总长 840min
     day_start_minutes = 8 * 60
     day_end_minutes = 22 * 60
 
-    if time_slots.exists():
-        first_slot = time_slots.first()
-        last_slot = time_slots.last()
+    if time_slots:
+        first_slot = time_slots[0]
+        last_slot = time_slots[-1]
         day_start_minutes = min(day_start_minutes, first_slot.start_time.hour * 60 + first_slot.start_time.minute)
         day_end_minutes = max(day_end_minutes, last_slot.end_time.hour * 60 + last_slot.end_time.minute)
 
@@ -3350,7 +3277,7 @@ def room_calendar(request):
         total_minutes = 14 * 60
 
     processed_slots = []
-    for slot in time_slots:
+    for slot, has_booking in zip(time_slots, slot_occupancy):
         slot_start_min = slot.start_time.hour * 60 + slot.start_time.minute
         slot_end_min = slot.end_time.hour * 60 + slot.end_time.minute
 
@@ -3358,15 +3285,6 @@ def room_calendar(request):
         top_percent = ((slot_start_min - day_start_minutes) / total_minutes) * 100
         height_percent = ((slot_end_min - slot_start_min) / total_minutes) * 100
 
-        # 检查该时间段是否已有预约
-        has_booking = RoomBooking.objects.filter(
-            room=selected_room,
-            booking_date=view_date,
-            status='active',
-            start_time__lt=slot.end_time,
-            end_time__gt=slot.start_time
-        ).exists()
-
         processed_slots.append({
             'start': slot.start_time,
             'end': slot.end_time,
@@ -3378,17 +3296,14 @@ def room_calendar(request):
         })
 
     # 获取当天的预约
-    bookings = RoomBooking.objects.filter(
-        room=selected_room,
-        booking_date=view_date,
-        status='active'
-    ).select_related('user__profile', 'club')
+    bookings = availability.bookings_for(selected_room, view_date)
 
     processed_bookings = []
+    # 权限检查：一次预取全部社团的现任社长
+    permissions = RoomBooking.bulk_permissions(request.user, bookings)
     for booking in bookings:
-        # 权限检查
-        can_edit = booking.can_edit(request.user)
-        can_delete = booking.can_delete(request.user)
+        can_edit = permissions[booking.pk]['can_edit']
+        can_delete = permissions[booking.pk]['can_delete']
 
         # 计算位置
         b_start_min = booking.start_time.hour * 60 + booking.start_time.minute
@@ -3462,6 +3377,98 @@ def delete_department(request, dept_id):
     return redirect('clubs:manage_departments')
 
 
+ROOM_AVAILABILITY_MAX_DAYS = 31
+
+
+def _room_availability_params(request):
+    """解析可用性接口参数并记忆在请求上；参数非法时返回 None。"""
+    if '_room_availability_params' in request.__dict__:
+        return request.__dict__['_room_availability_params']
+
+    params = None
+    try:
+        start_str = request.GET.get('start')
+        start_date = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else timezone.now().date()
+        days = int(request.GET.get('days') or 7)
+    except ValueError:
+        start_date, days = None, 0
+    if start_date and 1 <= days <= ROOM_AVAILABILITY_MAX_DAYS:
+        rooms = Room.objects.filter(status='available')
+        room_ids = [value for value in (request.GET.get('rooms') or '').split(',') if value.strip().isdigit()]
+        if room_ids:
+            rooms = rooms.filter(pk__in=room_ids)
+        rooms = list(rooms)
+        end_date = start_date + timezone.timedelta(days=days - 1)
+        state = RoomBooking.objects.filter(
+            room__in=rooms,
+            booking_date__gte=start_date,
+            booking_date__lte=end_date,
+        ).aggregate(latest=Max('updated_at'), total=Count('id'))
+        room_latest = max((room.updated_at for room in rooms), default=None)
+        latest = max(filter(None, [state['latest'], room_latest]), default=None)
+        slots = list(TimeSlot.objects.filter(is_active=True).order_by('start_time'))
+        params = {
+            'rooms': rooms,
+            'start_date': start_date,
+            'end_date': end_date,
+            'slots': slots,
+            'latest': latest,
+            # 预约被物理删除时 updated_at 最大值可能不变，需同时带上数量与时段配置
+            'etag': '"{}"'.format(hashlib.md5(repr((
+                [room.pk for room in rooms],
+                start_date.isoformat(),
+                days,
+                latest.isoformat() if latest else '',
+                state['total'],
+                [(slot.pk, str(slot.start_time), str(slot.end_time), slot.label) for slot in slots],
+            )).encode('utf-8')).hexdigest()),
+        }
+    request.__dict__['_room_availability_params'] = params
+    return params
+
+
+def _room_availability_etag(request):
+    params = _room_availability_params(request)
+    return params['etag'] if params else None
+
+
+def _room_availability_last_modified(request):
+    params = _room_availability_params(request)
+    return params['latest'] if params else None
+
+
+@login_required(login_url=settings.LOGIN_URL)
+@require_GET
+@condition(etag_func=_room_availability_etag, last_modified_func=_room_availability_last_modified)
+def room_availability_api(request):
+    """多房间、多日期的占用网格（JSON）。
+
+    参数：start=YYYY-MM-DD（默认今天）、days=1~31（默认 7）、rooms=逗号分隔的房间 ID（默认全部可用房间）。
+    ETag / Last-Modified 由预约最新 updated_at 推导，前端可一次拉取后在本地切换房间和日期。
+    """
+    params = _room_availability_params(request)
+    if params is None:
+        return JsonResponse({'success': False, 'message': f'参数无效，日期范围最多 {ROOM_AVAILABILITY_MAX_DAYS} 天'}, status=400)
+
+    availability = RoomAvailability(params['rooms'], params['start_date'], params['end_date'])
+    return JsonResponse({
+        'success': True,
+        'start': params['start_date'].isoformat(),
+        'end': params['end_date'].isoformat(),
+        'slots': [
+            {
+                'id': slot.pk,
+                'start': slot.start_time.strftime('%H:%M'),
+                'end': slot.end_time.strftime('%H:%M'),
+                'label': slot.label,
+            }
+            for slot in params['slots']
+        ],
+        'rooms': [{'id': room.pk, 'name': room.name, 'capacity': room.capacity} for room in params['rooms']],
+        'availability': availability.to_grid(params['slots']),
+    })
+
+
 @login_required
 @login_required
 @require_http_methods(["GET", "POST"])
@@ -3560,35 +3567,64 @@ def submit_room_booking(request):
                 messages.error(request, '普通用户必须选择社团进行申请')
                 return redirect('clubs:submit_room_booking')
 
-        # 检查冲突
-        existing_booking = RoomBooking.objects.filter(
-            room=room,
-            booking_date=booking_date,
-            status='active'
-        ).filter(
-            Q(start_time__lt=end_time) &
-            Q(end_time__gt=start_time)
-        ).exists()
+        booking_fields = {
+            'user': request.user,
+            'club': club,
+            'purpose': purpose,
+            'contact_phone': contact_phone,
+            'special_requirements': special_requirements,
+            'participant_count': int(participant_count),
+        }
 
-        if existing_booking:
-            messages.error(request, '该时间段已被预约，请选择其他时间')
-            # 返回并带上参数以便重填，这里简单处理直接跳回日历
+        # 周期预约：每周/隔周重复到截止日期，可排除若干日期
+        repeat = request.POST.get('repeat', 'none')
+        if repeat in ('weekly', 'biweekly'):
+            repeat_until_str = request.POST.get('repeat_until')
+            if not repeat_until_str:
+                messages.error(request, '请填写周期预约的截止日期')
+                return redirect('clubs:submit_room_booking')
+            try:
+                repeat_until = datetime.strptime(repeat_until_str, '%Y-%m-%d').date()
+            except ValueError:
+                messages.error(request, '周期截止日期格式应为 YYYY-MM-DD')
+                return redirect('clubs:submit_room_booking')
+            if repeat_until < booking_date:
+                messages.error(request, '周期截止日期不能早于首次预约日期')
+                return redirect('clubs:submit_room_booking')
+            try:
+                exclude_dates = [
+                    datetime.strptime(value.strip(), '%Y-%m-%d').date()
+                    for value in re.split(r'[,，\s]+', request.POST.get('exclude_dates', ''))
+                    if value.strip()
+                ]
+            except ValueError:
+                messages.error(request, '排除日期格式应为 YYYY-MM-DD，多个日期用逗号分隔')
+                return redirect('clubs:submit_room_booking')
+            dates = series_dates(
+                booking_date, repeat_until, 2 if repeat == 'biweekly' else 1, exclude_dates,
+                limit=MAX_SERIES_OCCURRENCES,
+            )
+            if not dates:
+                messages.error(request, '周期范围内没有可预约的日期')
+                return redirect('clubs:submit_room_booking')
+            if len(dates) > MAX_SERIES_OCCURRENCES:
+                messages.error(request, f'周期预约最多 {MAX_SERIES_OCCURRENCES} 次，请缩短截止日期')
+                return redirect('clubs:submit_room_booking')
+            try:
+                created = reserve_room_booking_series(room, dates, start_time, end_time, **booking_fields)
+            except RoomBookingConflict as exc:
+                messages.error(request, f'{exc}，整组预约未提交')
+                return redirect('clubs:room_calendar')
+            messages.success(request, f'周期预约提交成功，共 {len(created)} 次')
             return redirect('clubs:room_calendar')
 
-        # 创建预约
-        RoomBooking.objects.create(
-            room=room,
-            user=request.user,
-            club=club,
-            booking_date=booking_date,
-            start_time=start_time,
-            end_time=end_time,
-            purpose=purpose,
-            contact_phone=contact_phone,
-            special_requirements=special_requirements,
-            participant_count=int(participant_count),
-            status='active'
-        )
+        # 检查冲突并创建预约（同一房间同一天的提交在事务内串行）
+        try:
+            reserve_room_booking(room, booking_date, start_time, end_time, **booking_fields)
+        except RoomBookingConflict as exc:
+            messages.error(request, str(exc))
+            # 返回并带上参数以便重填，这里简单处理直接跳回日历
+            return redirect('clubs:room_calendar')
         messages.success(request, '预约提交成功')
     except Exception as e:
         messages.error(request, f'预约失败: {str(e)}')
@@ -3992,16 +4028,9 @@ def _get_submission_or_404(submission_key):
     )
 
 
-def _safe_filename_part(value, fallback='文件'):
-    value = (value or fallback).strip() or fallback
-    value = re.sub(r'[<>:"/\\|?*\x00-\x1f]+', '_', value)
-    value = re.sub(r'\s+', '', value)
-    return value[:80] or fallback
-
-
 def _renamed_upload_name(field, uploaded, index=1, total=1):
     ext = os.path.splitext(uploaded.name)[1].lower()
-    base = _safe_filename_part(field.label, '附件')
+    base = safe_filename_part(field.label, '附件')
     suffix = str(index) if total > 1 else ''
     return f'{base}{suffix}{ext}'
 
@@ -4049,12 +4078,7 @@ def _parse_validation(field_type, post):
 
 
 def _is_president_of_club(user, club):
-    return Officer.objects.filter(
-        club=club,
-        user_profile__user=user,
-        position='president',
-        is_current=True,
-    ).exists()
+    return get_principal(user).is_president_of(club)
 
 
 def _coerce_bool_text(value):
@@ -4065,28 +4089,28 @@ def _validate_dynamic_submission(channel, post, files, fields=None, force_requir
     cleaned = {}
     upload_map = {}
     errors = []
-    fields = fields or channel.fields.filter(is_active=True).order_by('order', 'id')
+    schema = get_channel_schema(channel)
+    fields = fields or schema.fields
     force_required_field_ids = set(force_required_field_ids or [])
     for field in fields:
         name = _field_input_name(field)
+        rules = schema.rules_for(field)
         is_required = field.required or field.id in force_required_field_ids
         if field.field_type == 'file':
             uploaded_files = files.getlist(name)
             if is_required and not uploaded_files:
                 errors.append(f'{field.label} 为必填文件')
                 continue
-            if uploaded_files and not field.allow_multiple_files() and len(uploaded_files) > 1:
+            if uploaded_files and not rules.allow_multiple and len(uploaded_files) > 1:
                 errors.append(f'{field.label} 只能上传 1 个文件')
                 continue
             valid_uploads = []
             for uploaded in uploaded_files:
                 ext = os.path.splitext(uploaded.name)[1].lower()
-                allowed = field.allowed_extensions()
-                if ext not in allowed:
-                    errors.append(f'{field.label} 文件类型不允许，允许：{", ".join(allowed)}')
-                max_bytes = field.max_size_mb() * 1024 * 1024
-                if uploaded.size > max_bytes:
-                    errors.append(f'{field.label} 文件不能超过 {field.max_size_mb()}MB')
+                if ext not in rules.allowed_extension_set:
+                    errors.append(f'{field.label} 文件类型不允许，允许：{", ".join(rules.allowed_extensions)}')
+                if uploaded.size > rules.max_size_bytes:
+                    errors.append(f'{field.label} 文件不能超过 {rules.max_size_mb}MB')
                 valid_uploads.append(uploaded)
             if valid_uploads:
                 upload_map[field.id] = valid_uploads
@@ -4106,212 +4130,84 @@ def _validate_dynamic_submission(channel, post, files, fields=None, force_requir
                 float(value)
             except ValueError:
                 errors.append(f'{field.label} 必须是数字')
-        max_length = field.validation.get('max_length')
-        if max_length and isinstance(value, str) and len(value) > int(max_length):
-            errors.append(f'{field.label} 不能超过 {max_length} 个字符')
-        if field.field_type in ['select', 'radio'] and value and field.options and value not in field.options:
+        if rules.max_length and isinstance(value, str) and len(value) > rules.max_length:
+            errors.append(f'{field.label} 不能超过 {rules.max_length} 个字符')
+        if field.field_type in ['select', 'radio'] and value and rules.option_set and value not in rules.option_set:
             errors.append(f'{field.label} 选项无效')
-        if field.field_type == 'checkbox' and value and field.options:
-            invalid = [item for item in value if item not in field.options]
+        if field.field_type == 'checkbox' and value and rules.option_set:
+            invalid = [item for item in value if item not in rules.option_set]
             if invalid:
                 errors.append(f'{field.label} 选项无效')
         cleaned[field.id] = value
     return fields, cleaned, upload_map, errors
 
 
-def _add_image_to_document(document, image_source):
-    from io import BytesIO
-    from docx.shared import Inches
-    from PIL import Image
-
-    if isinstance(image_source, (str, os.PathLike)):
-        image_buffer = BytesIO()
-        with Image.open(image_source) as image:
-            if image.mode not in ['RGB', 'RGBA']:
-                image = image.convert('RGB')
-            image.save(image_buffer, format='PNG')
-        image_buffer.seek(0)
-        document.add_picture(image_buffer, width=Inches(6))
-        return
-
-    document.add_picture(image_source, width=Inches(6))
-
-
-def _append_docx_text(document, path):
-    from docx import Document
-
-    source = Document(path)
-    appended = False
-    for paragraph in source.paragraphs:
-        text = paragraph.text.strip()
-        if text:
-            document.add_paragraph(text)
-            appended = True
-    for table in source.tables:
-        for row in table.rows:
-            cells = [cell.text.strip() for cell in row.cells if cell.text.strip()]
-            if cells:
-                document.add_paragraph(' | '.join(cells))
-                appended = True
-    if not appended:
-        document.add_paragraph('这个 Word 文档没有可提取的正文内容。')
-
-
-def _render_pdf_pages_to_document(document, path):
-    from io import BytesIO
-    import fitz
-
-    pdf = fitz.open(path)
-    try:
-        for page_number, page in enumerate(pdf, start=1):
-            document.add_paragraph(f'第 {page_number} 页')
-            pixmap = page.get_pixmap(matrix=fitz.Matrix(2, 2), alpha=False)
-            image_stream = BytesIO(pixmap.tobytes('png'))
-            _add_image_to_document(document, image_stream)
-    finally:
-        pdf.close()
-
-
-def _build_merged_word_file(field, uploaded_records):
-    from io import BytesIO
-    from docx import Document
-    from docx.oxml.ns import qn
-    from docx.shared import Cm, Pt
-
-    image_exts = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
-    document = Document()
-    section = document.sections[0]
-    section.top_margin = Cm(1.4)
-    section.bottom_margin = Cm(1.4)
-    section.left_margin = Cm(1.6)
-    section.right_margin = Cm(1.6)
-
-    for style_name in ['Normal', 'Title', 'Heading 1', 'Heading 2']:
-        style = document.styles[style_name]
-        style.font.name = '微软雅黑'
-        style._element.rPr.rFonts.set(qn('w:eastAsia'), '微软雅黑')
-    document.styles['Normal'].font.size = Pt(10.5)
-
-    title = document.add_paragraph()
-    title.paragraph_format.space_before = Pt(0)
-    title.paragraph_format.space_after = Pt(8)
-    title_run = title.add_run(field.label)
-    title_run.bold = True
-    title_run.font.name = '微软雅黑'
-    title_run._element.rPr.rFonts.set(qn('w:eastAsia'), '微软雅黑')
-    title_run.font.size = Pt(16)
-
-    intro = document.add_paragraph('以下内容由系统根据本字段一次上传的多个文件自动合并生成。')
-    intro.paragraph_format.space_before = Pt(0)
-    intro.paragraph_format.space_after = Pt(10)
-
-    for index, uploaded in enumerate(uploaded_records, start=1):
-        original_name = uploaded.original_name or os.path.basename(uploaded.file.name)
-        ext = os.path.splitext(original_name)[1].lower()
-        heading = document.add_paragraph()
-        heading.paragraph_format.space_before = Pt(4)
-        heading.paragraph_format.space_after = Pt(6)
-        heading_run = heading.add_run(f'{index}. {original_name}')
-        heading_run.bold = True
-        heading_run.font.name = '微软雅黑'
-        heading_run._element.rPr.rFonts.set(qn('w:eastAsia'), '微软雅黑')
-        heading_run.font.size = Pt(12)
-        try:
-            path = uploaded.file.path
-            if ext in image_exts:
-                _add_image_to_document(document, path)
-            elif ext == '.pdf':
-                _render_pdf_pages_to_document(document, path)
-            elif ext == '.docx':
-                _append_docx_text(document, path)
-            elif ext == '.doc':
-                document.add_paragraph('旧版 .doc 文件无法在当前环境中直接解析，原文件已随提交一并保存。')
-            else:
-                document.add_paragraph('该文件类型不支持合并进 Word，原文件已随提交一并保存。')
-        except Exception as exc:
-            document.add_paragraph(f'合并该文件时遇到问题：{exc}')
-
-    buffer = BytesIO()
-    document.save(buffer)
-    buffer.seek(0)
-    return ContentFile(buffer.getvalue(), name=f'{_safe_filename_part(field.label)}-合并文档.docx')
-
-
-def _create_uploaded_records(submission, field, uploaded_files):
-    created_uploads = []
+def _build_uploaded_records(submission, field, uploaded_files):
+    """按字段名重命名上传文件，返回尚未写入数据库的 FormUploadedFile 列表。"""
+    records = []
     total = len(uploaded_files)
     for index, uploaded in enumerate(uploaded_files, start=1):
         source_name = uploaded.name
         renamed_name = _renamed_upload_name(field, uploaded, index=index, total=total)
         uploaded.name = renamed_name
-        created_uploads.append(FormUploadedFile.objects.create(
+        records.append(FormUploadedFile(
             submission=submission,
             field=field,
             file=uploaded,
             original_name=renamed_name,
             source_name=source_name,
         ))
-    return created_uploads
-
-
-def _refresh_generated_merge_file(submission, field):
-    for uploaded in submission.uploaded_files.filter(field=field, is_generated=True):
-        _delete_uploaded_record(uploaded)
-    source_uploads = list(
-        submission.uploaded_files.filter(field=field, is_generated=False).exclude(review_status='rejected').order_by('uploaded_at', 'id')
-    )
-    if field.merge_files_to_word() and len(source_uploads) > 1:
-        merged_file = _build_merged_word_file(field, source_uploads)
-        FormUploadedFile.objects.create(
-            submission=submission,
-            field=field,
-            file=merged_file,
-            original_name=merged_file.name,
-            is_generated=True,
-            review_status='approved',
-        )
-
-
-def _ensure_generated_merge_files(submission):
-    file_field_ids = submission.uploaded_files.filter(is_generated=False).values_list('field_id', flat=True).distinct()
-    fields = FormField.objects.filter(id__in=file_field_ids)
-    for field in fields:
-        has_generated = submission.uploaded_files.filter(field=field, is_generated=True).exists()
-        source_count = submission.uploaded_files.filter(field=field, is_generated=False).exclude(review_status='rejected').count()
-        if field.merge_files_to_word() and source_count > 1 and not has_generated:
-            _refresh_generated_merge_file(submission, field)
+    return records
 
 
-def _refresh_submission_merge_files(submission):
-    file_field_ids = submission.uploaded_files.filter(is_generated=False).values_list('field_id', flat=True).distinct()
-    for field in FormField.objects.filter(id__in=file_field_ids):
-        if field.merge_files_to_word():
-            _refresh_generated_merge_file(submission, field)
+def _create_uploaded_records(submission, field, uploaded_files):
+    created_uploads = []
+    for record in _build_uploaded_records(submission, field, uploaded_files):
+        record.save()
+        created_uploads.append(record)
+    return created_uploads
 
 
 def _save_dynamic_submission(channel, club, user, fields, cleaned, upload_map, cycle=None):
+    """新建提交：字段值与上传记录各用一次 bulk_create 写入，全部在同一事务内完成。
+
+    新提交没有旧的合并文档，只有开启合并且上传了 2 个以上文件的字段需要排队生成，
+    且直接使用刚写入的记录作为源文件，不再回查数据库。
+    """
+    schema = get_channel_schema(channel)
     previous = FormSubmission.objects.filter(channel=channel, club=club, submitter=user)
     if cycle:
         previous = previous.filter(cycle=cycle)
-    previous_count = previous.count()
-    submission = FormSubmission.objects.create(
-        channel=channel,
-        club=club,
-        submitter=user,
-        cycle=cycle,
-        resubmission_count=previous_count + 1,
-    )
-    for field in fields:
-        if field.field_type == 'file':
-            uploaded_files = upload_map.get(field.id, [])
-            _create_uploaded_records(submission, field, uploaded_files)
-            _refresh_generated_merge_file(submission, field)
-            continue
-        value = cleaned.get(field.id, [] if field.field_type == 'checkbox' else '')
-        if field.field_type == 'checkbox':
-            FormFieldValue.objects.create(submission=submission, field=field, value_json=value)
-        else:
-            FormFieldValue.objects.create(submission=submission, field=field, value_text=str(value))
+    with transaction.atomic():
+        submission = FormSubmission.objects.create(
+            channel=channel,
+            club=club,
+            submitter=user,
+            cycle=cycle,
+            resubmission_count=previous.count() + 1,
+        )
+        values = []
+        uploads_by_field = []
+        for field in fields:
+            if field.field_type == 'file':
+                uploads_by_field.append((field, _build_uploaded_records(submission, field, upload_map.get(field.id, []))))
+                continue
+            value = cleaned.get(field.id, [] if field.field_type == 'checkbox' else '')
+            if field.field_type == 'checkbox':
+                values.append(FormFieldValue(submission=submission, field=field, value_json=value))
+            else:
+                values.append(FormFieldValue(submission=submission, field=field, value_text=str(value)))
+        FormFieldValue.objects.bulk_create(values)
+        FormUploadedFile.objects.bulk_create([record for _field, records in uploads_by_field for record in records])
+
+        for field, records in uploads_by_field:
+            if len(records) < 2 or not schema.rules_for(field).merge_to_word:
+                continue
+            if all(record.pk for record in records):
+                schedule_field_merge(submission, field, sources=records, generated=[])
+            else:
+                # 数据库不支持 bulk_create 回填主键（如 MySQL）时回查源文件
+                schedule_field_merge(submission, field)
     return submission
 
 
@@ -4319,27 +4215,15 @@ def _apply_builtin_action(submission):
     apply_business_action(submission)
 
 
-def _office_preview_url(request, uploaded):
-    if not uploaded.file:
-        return ''
-    filename = uploaded.original_name or uploaded.file.name
-    ext = os.path.splitext(filename)[1].lower()
-    if ext not in {'.doc', '.docx', '.ppt', '.pptx'}:
-        return ''
-    absolute_file_url = request.build_absolute_uri(uploaded.file.url) if request else uploaded.file.url
-    encoded_file_url = urllib.parse.quote(absolute_file_url, safe='')
-    return f'https://view.officeapps.live.com/op/embed.aspx?src={encoded_file_url}'
-
-
 def _submission_context(submission, request=None):
-    _ensure_generated_merge_files(submission)
+    schedule_submission_merges(submission)
     values = {value.field_id: value for value in submission.values.select_related('field')}
     files_by_field = defaultdict(list)
     for uploaded in submission.uploaded_files.filter(is_generated=False).select_related('field'):
-        uploaded.office_preview_url = _office_preview_url(request, uploaded)
+        uploaded.preview_url = reverse('clubs:preview_uploaded_file', args=[uploaded.pk]) if preview_kind(uploaded) else ''
         files_by_field[uploaded.field_id].append(uploaded)
     rows = []
-    for field in submission.channel.fields.filter(is_active=True).order_by('order', 'id'):
+    for field in get_channel_schema(submission.channel).fields:
         value_obj = values.get(field.id)
         rows.append({
             'field': field,
@@ -4358,9 +4242,9 @@ def _submission_has_files(submission):
 
 def _submission_review_summary(submission):
     current_reviews = submission.reviews.filter(submission_attempt=submission.resubmission_count).select_related('reviewer', 'reviewer__profile')
-    approved_count = current_reviews.filter(status='approved').count()
-    rejected_count = current_reviews.filter(status='rejected').count()
-    required_count = max(1, int(submission.channel.required_approval_count or 1))
+    approved_count = submission.current_approved_count
+    rejected_count = submission.current_rejected_count
+    required_count = submission.required_approval_count
     return {
         'current_reviews': current_reviews.order_by('-reviewed_at'),
         'all_reviews': submission.reviews.select_related('reviewer', 'reviewer__profile').order_by('-reviewed_at'),
@@ -4373,8 +4257,7 @@ def _submission_review_summary(submission):
 
 
 def _submission_generated_merge_files(submission):
-    _refresh_submission_merge_files(submission)
-    return list(submission.uploaded_files.filter(is_generated=True).exclude(file='').select_related('field'))
+    return list(submission.uploaded_files.filter(is_generated=True).select_related('field'))
 
 
 def _show_word_downloads(submission):
@@ -4405,10 +4288,10 @@ def _submission_common_context(submission, request=None):
     return context
 
 
-def _rejected_field_queryset(submission):
+def _rejected_fields(submission):
     rejected_value_ids = submission.values.filter(review_status='rejected').values_list('field_id', flat=True)
     rejected_file_ids = submission.uploaded_files.filter(review_status='rejected', is_generated=False).values_list('field_id', flat=True)
-    return submission.channel.fields.filter(id__in=set(rejected_value_ids) | set(rejected_file_ids), is_active=True).order_by('order', 'id')
+    return get_channel_schema(submission.channel).fields_with_ids(set(rejected_value_ids) | set(rejected_file_ids))
 
 
 def _form_field_items(fields, submission=None):
@@ -4460,7 +4343,7 @@ def submit_dynamic_form(request, channel_slug, club_id):
             messages.success(request, f'{channel.name} 已提交，等待审核')
             return redirect('clubs:approval_detail', item_type=channel.slug, submission_key=submission.public_id)
     else:
-        fields = channel.fields.filter(is_active=True).order_by('order', 'id')
+        fields = get_channel_schema(channel).fields
 
     return render(request, 'clubs/user/dynamic_form_submit.html', {
         'channel': channel,
@@ -4482,10 +4365,8 @@ def revise_dynamic_submission(request, submission_key):
         messages.error(request, '只有被打回的请求可以修改补交')
         return redirect('clubs:approval_detail', item_type=submission.channel.slug, submission_key=submission.public_id)
 
-    fields = _rejected_field_queryset(submission)
-    if not fields.exists():
-        fields = submission.channel.fields.filter(is_active=True).order_by('order', 'id')
-    force_required_ids = set(fields.values_list('id', flat=True))
+    fields = _rejected_fields(submission) or list(get_channel_schema(submission.channel).fields)
+    force_required_ids = {field.id for field in fields}
 
     if request.method == 'POST':
         fields, cleaned, upload_map, errors = _validate_dynamic_submission(
@@ -4509,7 +4390,7 @@ def revise_dynamic_submission(request, submission_key):
                             uploaded.review_status = 'pending'
                             uploaded.review_comment = ''
                             uploaded.save(update_fields=['review_status', 'review_comment'])
-                        _refresh_generated_merge_file(submission, field)
+                        schedule_field_merge(submission, field)
                         continue
 
                     value = cleaned.get(field.id, [] if field.field_type == 'checkbox' else '')
@@ -4531,6 +4412,8 @@ def revise_dynamic_submission(request, submission_key):
                 submission.reviewed_at = None
                 submission.submitted_at = timezone.now()
                 submission.resubmission_count += 1
+                submission.current_approved_count = 0
+                submission.current_rejected_count = 0
                 submission.is_read = False
                 submission.save(update_fields=[
                     'status',
@@ -4539,6 +4422,8 @@ def revise_dynamic_submission(request, submission_key):
                     'reviewed_at',
                     'submitted_at',
                     'resubmission_count',
+                    'current_approved_count',
+                    'current_rejected_count',
                     'is_read',
                 ])
             messages.success(request, '已补交被打回的内容，等待重新审核')
@@ -4571,34 +4456,103 @@ def _redirect_builtin_submit(request, club_id, slug):
 
 
 
+APPROVAL_ACTIVE_STATUSES = ('pending', 'rejected')
+
+
+def _positive_int(value, default=1):
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return default
+
+
 @login_required(login_url=settings.LOGIN_URL)
 def approval_center_tabs(request, tab='all'):
+    """社长审批记录：按通道分组展示本社团的提交。
+
+    各通道“进行中 / 已处理”两组的数量来自一条 values('channel').annotate() 分组统计；
+    列表数据一次查询取回，用窗口函数在每个（通道, 分组）内编号，只取当前页的行，
+    再在 Python 中分组。查询数不再随通道数量增长。
+    """
     if not _is_president(request.user):
         messages.error(request, '仅社长可以访问审批记录')
         return redirect('clubs:index')
-    clubs = Club.objects.filter(officers__user_profile__user=request.user, officers__position='president', officers__is_current=True)
-    items = FormSubmission.objects.filter(club__in=clubs).select_related('channel', 'club', 'reviewer').order_by('-submitted_at')
+    current_tab = tab.replace('_', '-')
+    items = FormSubmission.objects.filter(club_id__in=request.principal.president_club_ids)
     if tab and tab != 'all':
-        items = items.filter(channel__slug=tab.replace('_', '-'))
-    active_items = items.filter(status__in=['pending', 'rejected'])
-    completed_items = items.exclude(status__in=['pending', 'rejected'])
+        items = items.filter(channel__slug=current_tab)
     channels = list(_active_channels())
+    page_size = getattr(settings, 'APPROVAL_CENTER_GROUP_SIZE', 10)
+    page = _positive_int(request.GET.get('page')) if current_tab != 'all' else 1
+
+    totals = {
+        row['channel']: row
+        for row in items.order_by().values('channel').annotate(
+            total=Count('id'),
+            active=Count('id', filter=Q(status__in=APPROVAL_ACTIVE_STATUSES)),
+        )
+    }
+
+    is_active_bucket = Case(
+        When(status__in=APPROVAL_ACTIVE_STATUSES, then=Value(True)),
+        default=Value(False),
+        output_field=BooleanField(),
+    )
+    page_items = list(
+        items.annotate(
+            bucket_row=Window(
+                RowNumber(),
+                partition_by=[F('channel_id'), is_active_bucket],
+                order_by=[F('submitted_at').desc(), F('id').asc()],
+            ),
+        )
+        .filter(bucket_row__gt=(page - 1) * page_size, bucket_row__lte=page * page_size)
+        .select_related('club')
+        .only('public_id', 'status', 'submitted_at', 'channel_id', 'club__name')
+        .prefetch_related(Prefetch(
+            'values',
+            queryset=FormFieldValue.objects.filter(field__field_key__in=FormSubmission.DISPLAY_TITLE_KEYS).select_related('field'),
+            to_attr='display_values',
+        ))
+        .order_by('-submitted_at', 'id')
+    )
+
+    channel_map = {channel.id: channel for channel in channels}
+    missing_channel_ids = {item.channel_id for item in page_items} - set(channel_map)
+    if missing_channel_ids:
+        # 已停用通道的历史提交仍出现在汇总列表中
+        channel_map.update(FormChannel.objects.in_bulk(missing_channel_ids))
+    items_by_channel = defaultdict(lambda: {'active': [], 'completed': []})
+    for item in page_items:
+        item.channel = channel_map[item.channel_id]
+        bucket = 'active' if item.status in APPROVAL_ACTIVE_STATUSES else 'completed'
+        items_by_channel[item.channel_id][bucket].append(item)
+
     grouped_channels = []
     for channel in channels:
-        channel_items = items.filter(channel=channel)
+        total = totals.get(channel.id, {}).get('total', 0)
+        active_count = totals.get(channel.id, {}).get('active', 0)
         grouped_channels.append({
             'channel': channel,
-            'active_items': channel_items.filter(status__in=['pending', 'rejected']),
-            'completed_items': channel_items.exclude(status__in=['pending', 'rejected']),
-            'total_count': channel_items.count(),
+            'active_items': items_by_channel[channel.id]['active'],
+            'completed_items': items_by_channel[channel.id]['completed'],
+            'active_count': active_count,
+            'completed_count': total - active_count,
+            'total_count': total,
+            'has_more': max(active_count, total - active_count) > page * page_size,
         })
+
+    active_total = sum(row['active'] for row in totals.values())
     return render(request, 'clubs/user/dynamic_approval_center.html', {
-        'items': items,
-        'active_items': active_items,
-        'completed_items': completed_items,
+        'active_items': [item for item in page_items if item.status in APPROVAL_ACTIVE_STATUSES],
+        'completed_items': [item for item in page_items if item.status not in APPROVAL_ACTIVE_STATUSES],
+        'active_count': active_total,
+        'completed_count': sum(row['total'] for row in totals.values()) - active_total,
         'channels': channels,
         'grouped_channels': grouped_channels,
-        'current_tab': tab.replace('_', '-'),
+        'current_tab': current_tab,
+        'page': page,
+        'has_next_page': any(group['has_more'] for group in grouped_channels),
     })
 
 
@@ -4622,31 +4576,150 @@ def approval_detail(request, item_type, submission_key):
     return render(request, 'clubs/user/dynamic_approval_detail.html', context)
 
 
+AUDIT_CENTER_SECTIONS = {
+    'pending': ('pending',),
+    'completed': ('approved', 'rejected'),
+}
+
+
+def _audit_center_filters(params):
+    """解析审核中心的筛选参数：社团、周期、状态、提交人、提交日期范围。"""
+    filters = {
+        'club': params.get('club', '').strip(),
+        'cycle': params.get('cycle', '').strip(),
+        'status': params.get('status', '').strip(),
+        'submitter': params.get('submitter', '').strip(),
+        'date_from': params.get('date_from', '').strip(),
+        'date_to': params.get('date_to', '').strip(),
+    }
+    if not filters['club'].isdigit():
+        filters['club'] = ''
+    if not filters['cycle'].isdigit():
+        filters['cycle'] = ''
+    if filters['status'] not in dict(FormSubmission.STATUS_CHOICES):
+        filters['status'] = ''
+    for key in ('date_from', 'date_to'):
+        try:
+            datetime.strptime(filters[key], '%Y-%m-%d')
+        except ValueError:
+            filters[key] = ''
+    return filters
+
+
+def _filter_audit_queryset(queryset, filters):
+    if filters['club']:
+        queryset = queryset.filter(club_id=int(filters['club']))
+    if filters['cycle']:
+        queryset = queryset.filter(cycle_id=int(filters['cycle']))
+    if filters['status']:
+        queryset = queryset.filter(status=filters['status'])
+    if filters['submitter']:
+        queryset = queryset.filter(
+            Q(submitter__username__icontains=filters['submitter'])
+            | Q(submitter__profile__real_name__icontains=filters['submitter'])
+        )
+    if filters['date_from']:
+        queryset = queryset.filter(submitted_at__date__gte=filters['date_from'])
+    if filters['date_to']:
+        queryset = queryset.filter(submitted_at__date__lte=filters['date_to'])
+    return queryset
+
+
+def _audit_section_page(queryset, section, filters, cursor=None):
+    """某一栏（待审核 / 已处理）的一页；状态筛选与该栏不相交时不查询。"""
+    statuses = AUDIT_CENTER_SECTIONS[section]
+    if filters['status'] and filters['status'] not in statuses:
+        return [], ''
+    page_size = getattr(settings, 'AUDIT_CENTER_PAGE_SIZE', 20)
+    return keyset_page(queryset.filter(status__in=statuses), cursor=cursor, page_size=page_size)
+
+
+def _audit_item_payload(item):
+    return {
+        'public_id': item.public_id,
+        'title': item.display_title,
+        'channel': item.channel.name,
+        'club': item.club.name,
+        'submitter': item.submitter.username,
+        'status': item.status,
+        'status_label': item.get_status_display(),
+        'resubmission_count': item.resubmission_count,
+        'approval_progress': item.approval_progress_label(),
+        'submitted_at': item.submitted_at.isoformat(),
+        'reviewed_at': item.reviewed_at.isoformat() if item.reviewed_at else '',
+        'reviewer': item.reviewer.username if item.reviewer else '',
+        'review_url': reverse('clubs:staff_review_form_submission', args=[item.public_id]),
+    }
+
+
 @login_required(login_url=settings.LOGIN_URL)
 def staff_audit_center(request, tab='all'):
+    """审核中心：待审核与已处理两栏各自按 (-submitted_at, id) 游标分页。
+
+    带 format=json&section=pending|completed&cursor=... 时只返回该栏的下一页（含渲染好的卡片），
+    供页面“加载更多”使用；每页只查询一页数据，不随历史记录增长。
+    """
     if not is_staff_or_admin(request.user):
+        if request.GET.get('format') == 'json':
+            return JsonResponse({'success': False, 'message': '仅干事和管理员可以访问审核中心'}, status=403)
         messages.error(request, '仅干事和管理员可以访问审核中心')
         return redirect('clubs:index')
     slug = tab.replace('_', '-')
-    channels = list(_active_channels())
     current_channel = None
     if slug != 'all':
         current_channel = FormChannel.objects.filter(slug=slug).first()
-    qs = FormSubmission.objects.select_related('channel', 'club', 'submitter', 'reviewer').prefetch_related('reviews').order_by('-submitted_at')
+    filters = _audit_center_filters(request.GET)
+    qs = FormSubmission.objects.select_related('channel', 'club', 'submitter', 'reviewer').prefetch_related(Prefetch(
+        'values',
+        queryset=FormFieldValue.objects.filter(field__field_key__in=FormSubmission.DISPLAY_TITLE_KEYS).select_related('field'),
+        to_attr='display_values',
+    ))
     if current_channel:
         qs = qs.filter(channel=current_channel)
-    pending_items = qs.filter(status='pending')
-    completed_items = qs.exclude(status='pending')
+    qs = _filter_audit_queryset(qs, filters)
+    is_admin = _is_admin(request.user)
+
+    if request.GET.get('format') == 'json':
+        section = request.GET.get('section', 'pending')
+        if section not in AUDIT_CENTER_SECTIONS:
+            return JsonResponse({'success': False, 'message': '无效的分栏'}, status=400)
+        items, next_cursor = _audit_section_page(qs, section, filters, cursor=request.GET.get('cursor'))
+        html = render_to_string('clubs/staff/_audit_record_card.html', {'items': items, 'is_admin': is_admin}, request=request)
+        return JsonResponse({
+            'success': True,
+            'section': section,
+            'items': [_audit_item_payload(item) for item in items],
+            'html': html,
+            'next_cursor': next_cursor,
+        })
+
+    pending_items, pending_cursor = _audit_section_page(qs, 'pending', filters)
+    completed_items, completed_cursor = _audit_section_page(qs, 'completed', filters)
     return render(request, 'clubs/staff/dynamic_audit_center.html', {
-        'channels': channels,
+        'channels': list(_active_channels()),
         'current_channel': current_channel,
         'current_tab': slug,
         'pending_items': pending_items,
+        'pending_cursor': pending_cursor,
+        'pending_total': qs.filter(status='pending').count() if filters['status'] in ('', 'pending') else 0,
         'completed_items': completed_items,
-        'is_admin': _is_admin(request.user),
+        'completed_cursor': completed_cursor,
+        'filters': filters,
+        'filter_query': urllib.parse.urlencode({key: value for key, value in filters.items() if value}),
+        'filter_clubs': Club.objects.order_by('name').only('id', 'name'),
+        'export_cycles': current_channel.cycles.all() if current_channel else [],
+        'is_admin': is_admin,
     })
 
 
+# 审核结论写回提交时只保存这些列，避免用内存中的旧计数覆盖并发审核递增后的结果
+_REVIEW_DECISION_FIELDS = ['status', 'reviewer', 'reviewed_at', 'is_read', 'review_comment']
+
+
+def _increment_review_tally(submission, field_name):
+    """以 F() 原子递增本次审核计数，并把两项计数的最新值读回 submission。"""
+    FormSubmission.objects.filter(pk=submission.pk).update(**{field_name: F(field_name) + 1})
+    submission.refresh_from_db(fields=['current_approved_count', 'current_rejected_count'])
 
 
 def _mark_submission_approved(submission, reviewer, comment):
@@ -4664,7 +4737,8 @@ def _mark_submission_approved(submission, reviewer, comment):
         comment=comment,
         submission_attempt=submission.resubmission_count,
     )
-    approved_count = submission.approved_review_count()
+    _increment_review_tally(submission, 'current_approved_count')
+    approved_count = submission.current_approved_count
     required_count = submission.required_approval_count
 
     submission.reviewer = reviewer
@@ -4675,11 +4749,11 @@ def _mark_submission_approved(submission, reviewer, comment):
         submission.values.update(review_status='approved', review_comment='')
         submission.uploaded_files.update(review_status='approved', review_comment='')
         submission.status = 'approved'
-        submission.save()
+        submission.save(update_fields=_REVIEW_DECISION_FIELDS)
         _apply_builtin_action(submission)
     else:
         submission.status = 'pending'
-        submission.save()
+        submission.save(update_fields=_REVIEW_DECISION_FIELDS)
 
 
 def _mark_submission_rejected(submission, reviewer, comment, post):
@@ -4697,6 +4771,7 @@ def _mark_submission_rejected(submission, reviewer, comment, post):
         comment=comment,
         submission_attempt=submission.resubmission_count,
     )
+    _increment_review_tally(submission, 'current_rejected_count')
 
     rejected_value_ids = {
         int(key.rsplit('_', 1)[1])
@@ -4709,41 +4784,184 @@ def _mark_submission_rejected(submission, reviewer, comment, post):
         if key.startswith('reject_file_') and key.rsplit('_', 1)[1].isdigit()
     }
 
+    values = list(submission.values.all())
+    uploads = list(submission.uploaded_files.all())
     if not rejected_value_ids and not rejected_file_ids:
-        rejected_value_ids = set(submission.values.values_list('id', flat=True))
-        rejected_file_ids = set(submission.uploaded_files.filter(is_generated=False).values_list('id', flat=True))
+        rejected_value_ids = {value.id for value in values}
+        rejected_file_ids = {uploaded.id for uploaded in uploads if not uploaded.is_generated}
 
-    for value in submission.values.select_related('field'):
+    now = timezone.now()
+    for value in values:
         is_rejected = value.id in rejected_value_ids
         value.review_status = 'rejected' if is_rejected else 'approved'
         value.review_comment = post.get(f'comment_value_{value.id}', '').strip() if is_rejected else ''
         if is_rejected and not value.review_comment:
             value.review_comment = comment
-        value.save(update_fields=['review_status', 'review_comment', 'updated_at'])
+        value.updated_at = now
+    FormFieldValue.objects.bulk_update(values, ['review_status', 'review_comment', 'updated_at'])
 
-    for uploaded in submission.uploaded_files.select_related('field'):
+    # 只有被打回的源文件集合发生变化的字段才需要重新合并 Word
+    changed_field_ids = set()
+    for uploaded in uploads:
         if uploaded.is_generated:
             uploaded.review_status = 'approved'
             uploaded.review_comment = ''
-        else:
-            is_rejected = uploaded.id in rejected_file_ids
-            uploaded.review_status = 'rejected' if is_rejected else 'approved'
-            uploaded.review_comment = post.get(f'comment_file_{uploaded.id}', '').strip() if is_rejected else ''
-            if is_rejected and not uploaded.review_comment:
-                uploaded.review_comment = comment
-        uploaded.save(update_fields=['review_status', 'review_comment'])
-
-    for field_id in submission.uploaded_files.filter(is_generated=False).values_list('field_id', flat=True).distinct():
-        field = FormField.objects.filter(id=field_id).first()
-        if field:
-            _refresh_generated_merge_file(submission, field)
+            continue
+        was_rejected = uploaded.review_status == 'rejected'
+        is_rejected = uploaded.id in rejected_file_ids
+        uploaded.review_status = 'rejected' if is_rejected else 'approved'
+        uploaded.review_comment = post.get(f'comment_file_{uploaded.id}', '').strip() if is_rejected else ''
+        if is_rejected and not uploaded.review_comment:
+            uploaded.review_comment = comment
+        if was_rejected != is_rejected:
+            changed_field_ids.add(uploaded.field_id)
+    FormUploadedFile.objects.bulk_update(uploads, ['review_status', 'review_comment'])
+
+    if changed_field_ids:
+        # 审核事务提交后再调整合并文档，生成失败也不影响已保存的审核结论
+        transaction.on_commit(
+            lambda: schedule_submission_merges(submission, field_ids=changed_field_ids),
+            robust=True,
+        )
 
     submission.status = 'rejected'
     submission.review_comment = comment
     submission.reviewer = reviewer
-    submission.reviewed_at = timezone.now()
+    submission.reviewed_at = now
     submission.is_read = False
-    submission.save()
+    submission.save(update_fields=_REVIEW_DECISION_FIELDS)
+
+
+def _bulk_review_result(public_id, success, message, status=''):
+    return {'public_id': public_id, 'success': success, 'status': status, 'message': message}
+
+
+def _bulk_review_submissions(public_ids, reviewer, decision, comment):
+    """在调用方的事务内批量审核，返回与 public_ids 同序的逐条结果。
+
+    先以 select_for_update 锁住全部提交，跳过不存在、非待审核或本人已审核过本次提交的条目；
+    审核记录用一次 bulk_create 写入，提交的状态与计数用一次 bulk_update 写回。
+    锁内读到的计数就是最新值，因此直接在内存中加一，效果与单条审核的 F() 递增一致。
+    通过时只对达到所需通过次数的提交执行业务动作，每条各用一个保存点，失败的条目单独回滚并报告。
+    """
+    submissions = {
+        submission.public_id: submission
+        for submission in FormSubmission.objects.select_for_update().filter(public_id__in=public_ids).order_by('pk')
+    }
+    channels = FormChannel.objects.in_bulk({submission.channel_id for submission in submissions.values()})
+    reviewed = set(
+        FormSubmissionReview.objects.filter(
+            reviewer=reviewer,
+            submission_id__in=[submission.pk for submission in submissions.values()],
+        ).values_list('submission_id', 'submission_attempt')
+    )
+
+    results = {}
+    eligible = []
+    for public_id in public_ids:
+        submission = submissions.get(public_id)
+        if submission is None:
+            results[public_id] = _bulk_review_result(public_id, False, '提交不存在')
+        elif submission.status != 'pending':
+            results[public_id] = _bulk_review_result(public_id, False, '该提交已不是待审核状态', submission.status)
+        elif (submission.pk, submission.resubmission_count) in reviewed:
+            results[public_id] = _bulk_review_result(public_id, False, '您已经审核过本次提交，不能重复审核', submission.status)
+        else:
+            submission.channel = channels[submission.channel_id]
+            eligible.append(submission)
+
+    now = timezone.now()
+    decided = []
+    reached = []
+    for submission in eligible:
+        if decision == 'approved':
+            approved_count = submission.current_approved_count + 1
+            if approved_count >= submission.required_approval_count:
+                try:
+                    with transaction.atomic():
+                        _apply_builtin_action(submission)
+                except BusinessActionError as exc:
+                    results[submission.public_id] = _bulk_review_result(submission.public_id, False, str(exc), submission.status)
+                    continue
+                submission.status = 'approved'
+                reached.append(submission)
+                message = f'已通过，达到 {approved_count}/{submission.required_approval_count} 次通过'
+            else:
+                message = f'已记录本次通过，当前通过进度 {approved_count}/{submission.required_approval_count}'
+            submission.current_approved_count = approved_count
+        else:
+            submission.current_rejected_count += 1
+            submission.status = 'rejected'
+            message = '已打回'
+        submission.reviewer = reviewer
+        submission.reviewed_at = now
+        submission.is_read = False
+        submission.review_comment = comment
+        decided.append(submission)
+        results[submission.public_id] = _bulk_review_result(submission.public_id, True, message, submission.status)
+
+    if decided:
+        FormSubmissionReview.objects.bulk_create([
+            FormSubmissionReview(
+                submission=submission,
+                reviewer=reviewer,
+                status=decision,
+                comment=comment,
+                submission_attempt=submission.resubmission_count,
+            )
+            for submission in decided
+        ])
+        tally_field = 'current_approved_count' if decision == 'approved' else 'current_rejected_count'
+        FormSubmission.objects.bulk_update(decided, _REVIEW_DECISION_FIELDS + [tally_field])
+        # bulk_update 不触发 post_save，导航计数需要手动失效
+        invalidate_submission_counts()
+
+    if decision == 'approved' and reached:
+        FormFieldValue.objects.filter(submission__in=reached).update(review_status='approved', review_comment='')
+        FormUploadedFile.objects.filter(submission__in=reached).update(review_status='approved', review_comment='')
+    elif decision == 'rejected' and decided:
+        FormFieldValue.objects.filter(submission__in=decided).update(review_status='rejected', review_comment=comment, updated_at=now)
+        FormUploadedFile.objects.filter(submission__in=decided, is_generated=False).update(review_status='rejected', review_comment=comment)
+        FormUploadedFile.objects.filter(submission__in=decided, is_generated=True).update(review_status='approved', review_comment='')
+        # 与单条打回一致：审核事务提交后再逐条调整合并文档，某条生成失败既不回滚审核结论也不影响其余条目
+        for submission in decided:
+            transaction.on_commit(lambda submission=submission: schedule_submission_merges(submission), robust=True)
+
+    return [results[public_id] for public_id in public_ids]
+
+
+@login_required(login_url=settings.LOGIN_URL)
+@require_POST
+def bulk_review_submissions(request, tab):
+    """审核中心批量通过 / 打回：POST public_ids（可多个）、decision、comment，返回逐条结果 JSON。
+
+    整批在同一事务中完成；单条不满足条件时只在结果中标记失败，不影响其余条目。
+    """
+    if not request.principal.is_staff_or_admin:
+        return JsonResponse({'success': False, 'message': '仅干事和管理员可以审核'}, status=403)
+    decision = request.POST.get('decision')
+    if decision not in ['approved', 'rejected']:
+        return JsonResponse({'success': False, 'message': '请选择有效审核结果'}, status=400)
+    comment = request.POST.get('comment', '').strip()
+    public_ids = list(dict.fromkeys(
+        public_id.strip() for public_id in request.POST.getlist('public_ids') if public_id.strip()
+    ))
+    if not public_ids:
+        return JsonResponse({'success': False, 'message': '请至少选择一条提交'}, status=400)
+    max_items = getattr(settings, 'BULK_REVIEW_MAX_ITEMS', 100)
+    if len(public_ids) > max_items:
+        return JsonResponse({'success': False, 'message': f'每次最多批量审核 {max_items} 条'}, status=400)
+
+    with transaction.atomic():
+        results = _bulk_review_submissions(public_ids, request.user, decision, comment)
+    succeeded = sum(1 for result in results if result['success'])
+    return JsonResponse({
+        'success': True,
+        'decision': decision,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'results': results,
+    })
 
 
 @login_required(login_url=settings.LOGIN_URL)
@@ -5122,20 +5340,17 @@ def unregister_activity(request, activity_id):
 @require_http_methods(['GET'])
 def notification_counts(request):
     role = getattr(getattr(request.user, 'profile', None), 'role', '')
-    audit_counts = {}
-    approval_counts = {}
+    audit_total, audit_counts = 0, {}
+    approval_total, approval_counts = 0, {}
     if role in ['staff', 'admin'] or request.user.is_superuser:
-        for row in FormSubmission.objects.filter(status='pending').values('channel__slug').annotate(count=Count('id')):
-            audit_counts[row['channel__slug']] = row['count']
+        audit_total, audit_counts = audit_channel_counts()
     if role == 'president':
-        club_ids = _get_president_club_ids(request.user)
-        for row in FormSubmission.objects.filter(club_id__in=club_ids, status__in=['pending', 'rejected']).values('channel__slug').annotate(count=Count('id')):
-            approval_counts[row['channel__slug']] = row['count']
+        approval_total, approval_counts = approval_channel_counts(_get_president_club_ids(request.user))
     return JsonResponse({
         'role': role,
         'audit_counts': audit_counts,
-        'approval_counts': {**approval_counts, 'total': sum(approval_counts.values())},
-        'audit_total': sum(audit_counts.values()),
+        'approval_counts': {**approval_counts, 'total': approval_total},
+        'audit_total': audit_total,
     })
 
 
@@ -0,0 +1,134 @@
+"""访问统计写回缓冲：请求只在进程内存中累加，后台定时与进程退出时批量写入数据库。"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DailyStat, HourlyVisitStat
+
+
+logger = logging.getLogger(__name__)
+
+
+class VisitAggregator:
+    """按 (日期, 小时, 路由名) 聚合访问次数的进程内缓冲。
+
+    record() 只做一次加锁的内存自增；flush() 交换出当前缓冲并用一条 upsert
+    语句写入 HourlyVisitStat，再用一条写入 DailyStat 的日合计。写库失败时
+    计数会合并回缓冲，等待下次重试。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = Counter()
+        self._pid = None
+        self._timer = None
+
+    def _ensure_worker(self):
+        """每个（fork 后的）进程各自启动一次定时线程并注册退出钩子。"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        # fork 继承来的缓冲属于父进程，子进程里丢弃避免重复计数
+        self._buckets = Counter()
+        self._pid = pid
+        self._timer = threading.Thread(target=self._run, name='visit-stats-flush', daemon=True)
+        self._timer.start()
+        atexit.register(self.flush)
+
+    def record(self, route_name, now=None):
+        now = timezone.localtime(now)
+        key = (now.date(), now.hour, (route_name or '')[:150])
+        with self._lock:
+            self._ensure_worker()
+            self._buckets[key] += 1
+
+    def _run(self):
+        interval = max(1, getattr(settings, 'VISIT_STAT_FLUSH_SECONDS', 30))
+        while True:
+            time.sleep(interval)
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        with self._lock:
+            if not self._buckets:
+                return 0
+            buckets, self._buckets = self._buckets, Counter()
+
+        if settings.DATABASES['default']['ENGINE'] == 'django.db.backends.dummy':
+            return 0
+
+        try:
+            with transaction.atomic():
+                _upsert_hourly(buckets)
+                daily = Counter()
+                for (day, _hour, _route), visits in buckets.items():
+                    daily[day] += visits
+                _upsert_daily(daily)
+        except Exception as exc:
+            logger.warning('访问统计写入失败，将在下次重试: %s', exc)
+            with self._lock:
+                self._buckets.update(buckets)
+            return 0
+        return sum(buckets.values())
+
+
+def _upsert_sql(table, key_columns, value_column, row_count):
+    """生成“插入或累加”的批量 upsert 语句；不支持的数据库返回 None。"""
+    qn = connection.ops.quote_name
+    columns = [*key_columns, value_column]
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * row_count)
+    insert = f"INSERT INTO {qn(table)} ({', '.join(qn(c) for c in columns)}) VALUES {placeholders}"
+    value = qn(value_column)
+    if connection.vendor in ('sqlite', 'postgresql'):
+        conflict = ', '.join(qn(c) for c in key_columns)
+        return f"{insert} ON CONFLICT ({conflict}) DO UPDATE SET {value} = {qn(table)}.{value} + excluded.{value}"
+    if connection.vendor == 'mysql':
+        return f"{insert} ON DUPLICATE KEY UPDATE {value} = {value} + VALUES({value})"
+    return None
+
+
+def _upsert_rows(model, key_fields, rows):
+    if not rows:
+        return
+    table = model._meta.db_table
+    key_columns = [model._meta.get_field(name).column for name in key_fields]
+    sql = _upsert_sql(table, key_columns, 'visits', len(rows))
+    if sql is None:
+        for *keys, visits in rows:
+            lookup = dict(zip(key_fields, keys))
+            if not model.objects.filter(**lookup).update(visits=F('visits') + visits):
+                model.objects.create(visits=visits, **lookup)
+        return
+    fields = [model._meta.get_field(name) for name in (*key_fields, 'visits')]
+    params = [
+        field.get_db_prep_value(value, connection)
+        for row in rows
+        for field, value in zip(fields, row)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _upsert_hourly(buckets):
+    rows = [(day, hour, route, visits) for (day, hour, route), visits in buckets.items()]
+    _upsert_rows(HourlyVisitStat, ('date', 'hour', 'route_name'), rows)
+
+
+def _upsert_daily(daily):
+    rows = [(day, visits) for day, visits in daily.items()]
+    _upsert_rows(DailyStat, ('date',), rows)
+
+
+visit_aggregator = VisitAggregator()
@@ -0,0 +1,292 @@
+"""多文件字段的合并 Word：后台线程生成，按源文件与字段配置的哈希复用。
+
+生成文档的 FormUploadedFile（is_generated=True）先以占位行出现：content_hash 为本次
+源文件与配置的哈希、file 为空，页面据此显示“生成中”；后台线程写好文件后再把路径
+填回占位行。源文件或字段配置不变时哈希不变，直接复用已生成的文档，页面访问
+不会再触发重新生成。
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import FormField, FormUploadedFile
+from .pdf_raster import rasterize_pdf
+
+
+logger = logging.getLogger(__name__)
+
+# 合并文档的版式变化时递增，使旧文档的哈希失效
+MERGE_FORMAT_VERSION = 1
+
+_executor_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+
+
+def safe_filename_part(value, fallback='文件'):
+    value = (value or fallback).strip() or fallback
+    value = re.sub(r'[<>:"/\\|?*\x00-\x1f]+', '_', value)
+    value = re.sub(r'\s+', '', value)
+    return value[:80] or fallback
+
+
+def merged_document_name(field):
+    return f'{safe_filename_part(field.label)}-合并文档.docx'
+
+
+def _add_image_to_document(document, image_source):
+    from io import BytesIO
+    from docx.shared import Inches
+    from PIL import Image
+
+    if isinstance(image_source, (str, os.PathLike)):
+        image_buffer = BytesIO()
+        with Image.open(image_source) as image:
+            if image.mode not in ['RGB', 'RGBA']:
+                image = image.convert('RGB')
+            image.save(image_buffer, format='PNG')
+        image_buffer.seek(0)
+        document.add_picture(image_buffer, width=Inches(6))
+        return
+
+    document.add_picture(image_source, width=Inches(6))
+
+
+def _append_docx_text(document, path):
+    from docx import Document
+
+    source = Document(path)
+    appended = False
+    for paragraph in source.paragraphs:
+        text = paragraph.text.strip()
+        if text:
+            document.add_paragraph(text)
+            appended = True
+    for table in source.tables:
+        for row in table.rows:
+            cells = [cell.text.strip() for cell in row.cells if cell.text.strip()]
+            if cells:
+                document.add_paragraph(' | '.join(cells))
+                appended = True
+    if not appended:
+        document.add_paragraph('这个 Word 文档没有可提取的正文内容。')
+
+
+def _render_pdf_pages_to_document(document, path):
+    # 页面图片来自 pdf_raster 的磁盘缓存，缺失的页面由进程池并行渲染
+    for page_number, image_path in rasterize_pdf(path):
+        document.add_paragraph(f'第 {page_number} 页')
+        with open(image_path, 'rb') as image_stream:
+            _add_image_to_document(document, image_stream)
+
+
+def build_merged_word_file(field, uploaded_records):
+    from io import BytesIO
+    from docx import Document
+    from docx.oxml.ns import qn
+    from docx.shared import Cm, Pt
+
+    image_exts = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
+    document = Document()
+    section = document.sections[0]
+    section.top_margin = Cm(1.4)
+    section.bottom_margin = Cm(1.4)
+    section.left_margin = Cm(1.6)
+    section.right_margin = Cm(1.6)
+
+    for style_name in ['Normal', 'Title', 'Heading 1', 'Heading 2']:
+        style = document.styles[style_name]
+        style.font.name = '微软雅黑'
+        style._element.rPr.rFonts.set(qn('w:eastAsia'), '微软雅黑')
+    document.styles['Normal'].font.size = Pt(10.5)
+
+    title = document.add_paragraph()
+    title.paragraph_format.space_before = Pt(0)
+    title.paragraph_format.space_after = Pt(8)
+    title_run = title.add_run(field.label)
+    title_run.bold = True
+    title_run.font.name = '微软雅黑'
+    title_run._element.rPr.rFonts.set(qn('w:eastAsia'), '微软雅黑')
+    title_run.font.size = Pt(16)
+
+    intro = document.add_paragraph('以下内容由系统根据本字段一次上传的多个文件自动合并生成。')
+    intro.paragraph_format.space_before = Pt(0)
+    intro.paragraph_format.space_after = Pt(10)
+
+    for index, uploaded in enumerate(uploaded_records, start=1):
+        original_name = uploaded.original_name or os.path.basename(uploaded.file.name)
+        ext = os.path.splitext(original_name)[1].lower()
+        heading = document.add_paragraph()
+        heading.paragraph_format.space_before = Pt(4)
+        heading.paragraph_format.space_after = Pt(6)
+        heading_run = heading.add_run(f'{index}. {original_name}')
+        heading_run.bold = True
+        heading_run.font.name = '微软雅黑'
+        heading_run._element.rPr.rFonts.set(qn('w:eastAsia'), '微软雅黑')
+        heading_run.font.size = Pt(12)
+        try:
+            path = uploaded.file.path
+            if ext in image_exts:
+                _add_image_to_document(document, path)
+            elif ext == '.pdf':
+                _render_pdf_pages_to_document(document, path)
+            elif ext == '.docx':
+                _append_docx_text(document, path)
+            elif ext == '.doc':
+                document.add_paragraph('旧版 .doc 文件无法在当前环境中直接解析，原文件已随提交一并保存。')
+            else:
+                document.add_paragraph('该文件类型不支持合并进 Word，原文件已随提交一并保存。')
+        except Exception as exc:
+            document.add_paragraph(f'合并该文件时遇到问题：{exc}')
+
+    buffer = BytesIO()
+    document.save(buffer)
+    buffer.seek(0)
+    return ContentFile(buffer.getvalue(), name=merged_document_name(field))
+
+
+def merge_sources(submission, field):
+    """参与合并的源文件：该字段未被打回的用户上传文件，按上传顺序。"""
+    return list(
+        submission.uploaded_files.filter(field=field, is_generated=False)
+        .exclude(review_status='rejected')
+        .order_by('uploaded_at', 'id')
+    )
+
+
+def merge_content_hash(field, sources):
+    """源文件（存储路径唯一且上传后不再修改）与影响输出的字段配置的哈希。"""
+    payload = {
+        'version': MERGE_FORMAT_VERSION,
+        'label': field.label,
+        'validation': field.validation,
+        'sources': [(uploaded.pk, uploaded.file.name, uploaded.original_name) for uploaded in sources],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+def _delete_generated(records):
+    for uploaded in records:
+        if uploaded.file:
+            uploaded.file.delete(save=False)
+        uploaded.delete()
+
+
+def _stale_after():
+    return timedelta(seconds=getattr(settings, 'WORD_MERGE_STALE_SECONDS', 600))
+
+
+def schedule_field_merge(submission, field, sources=None, generated=None):
+    """确保该字段的合并文档与当前源文件一致：哈希未变则保留，否则换成新的占位行并排队生成。
+
+    sources / generated 可由调用方传入已查询好的列表，避免重复查询。
+    """
+    if generated is None:
+        generated = list(submission.uploaded_files.filter(field=field, is_generated=True))
+    if sources is None:
+        sources = merge_sources(submission, field) if field.merge_files_to_word() else []
+    if not field.merge_files_to_word() or len(sources) < 2:
+        _delete_generated(generated)
+        return None
+
+    content_hash = merge_content_hash(field, sources)
+    current = next((uploaded for uploaded in generated if uploaded.content_hash == content_hash), None)
+    _delete_generated([uploaded for uploaded in generated if uploaded is not current])
+    if current is not None:
+        # 进程在生成途中退出时占位行会一直为空，超时后重新排队
+        if not current.file and not current.generation_error and current.uploaded_at < timezone.now() - _stale_after():
+            _enqueue(current.pk)
+        return current
+
+    placeholder = FormUploadedFile.objects.create(
+        submission=submission,
+        field=field,
+        original_name=merged_document_name(field),
+        is_generated=True,
+        review_status='approved',
+        content_hash=content_hash,
+    )
+    _enqueue(placeholder.pk)
+    return placeholder
+
+
+def schedule_submission_merges(submission, field_ids=None):
+    """按提交中全部文件字段（或只检查 field_ids 中的字段）检查合并文档；两条查询取回上传文件与字段，只对变化的字段排队。"""
+    uploads = list(submission.uploaded_files.all())
+    if field_ids is not None:
+        uploads = [uploaded for uploaded in uploads if uploaded.field_id in field_ids]
+    field_ids = {uploaded.field_id for uploaded in uploads}
+    if not field_ids:
+        return
+    for field in FormField.objects.filter(id__in=field_ids):
+        generated = [uploaded for uploaded in uploads if uploaded.field_id == field.id and uploaded.is_generated]
+        merging = field.merge_files_to_word()
+        if not merging and not generated:
+            continue
+        sources = sorted(
+            (
+                uploaded for uploaded in uploads
+                if uploaded.field_id == field.id and not uploaded.is_generated and uploaded.review_status != 'rejected'
+            ),
+            key=lambda uploaded: (uploaded.uploaded_at, uploaded.id),
+        ) if merging else []
+        schedule_field_merge(submission, field, sources=sources, generated=generated)
+
+
+def _get_executor():
+    """每个（fork 后的）进程各自创建线程池。"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            workers = max(1, getattr(settings, 'WORD_MERGE_WORKERS', 1))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='word-merge')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _enqueue(uploaded_id):
+    # 占位行提交后再交给后台线程，避免线程读不到未提交的数据
+    transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, uploaded_id))
+
+
+def _run_in_thread(uploaded_id):
+    close_old_connections()
+    try:
+        generate_merged_document(uploaded_id)
+    finally:
+        close_old_connections()
+
+
+def generate_merged_document(uploaded_id):
+    """为占位行生成合并文档；占位行已被替换或删除时丢弃结果。"""
+    placeholder = FormUploadedFile.objects.select_related('submission', 'field').filter(pk=uploaded_id, is_generated=True).first()
+    if placeholder is None or placeholder.file:
+        return False
+    sources = merge_sources(placeholder.submission, placeholder.field)
+    if merge_content_hash(placeholder.field, sources) != placeholder.content_hash:
+        return False
+
+    try:
+        merged_file = build_merged_word_file(placeholder.field, sources)
+    except Exception as exc:
+        logger.exception('合并文档 %s 生成失败', uploaded_id)
+        FormUploadedFile.objects.filter(pk=uploaded_id, content_hash=placeholder.content_hash).update(generation_error=str(exc)[:2000])
+        return False
+
+    storage = placeholder.file.storage
+    name = storage.save(placeholder.file.field.generate_filename(placeholder, merged_file.name), merged_file)
+    updated = FormUploadedFile.objects.filter(pk=uploaded_id, content_hash=placeholder.content_hash, file='').update(file=name, generation_error='')
+    if not updated:
+        storage.delete(name)
+        return False
+    return True
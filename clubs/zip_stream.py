@@ -0,0 +1,151 @@
+"""流式 ZIP 打包：边读文件边产出压缩包字节块，内存中只保留一个小缓冲。
+
+zipfile 写入不可 seek 的输出时使用数据描述符（data descriptor）记录 CRC 与大小，
+因此无需预先知道压缩结果即可按文件顺序逐块发送；已是压缩格式的文件直接存储（STORED），
+避免在 PDF、图片、Office 文档上重复消耗 CPU。
+存储中缺失的源文件不会中断打包：原位置写入一个简短的说明条目，其余文件照常打包。
+"""
+import logging
+import os
+import zipfile
+from pathlib import PurePath
+
+from django.utils import timezone
+
+from .file_serving import FILE_CHUNK_SIZE
+
+
+logger = logging.getLogger(__name__)
+
+
+# 本身已经压缩的格式：再 DEFLATE 几乎没有收益
+STORED_EXTENSIONS = frozenset({
+    '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic',
+    '.zip', '.rar', '.7z', '.gz', '.bz2', '.xz',
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp',
+    '.mp3', '.mp4', '.m4a', '.mov', '.avi', '.mkv',
+})
+
+MISSING_NOTE_SUFFIX = '.文件缺失.txt'
+
+
+class ZipSourceUnavailable(OSError):
+    """源文件无法打开；抛出时尚未向 archive 写入该条目的任何内容，可以跳过后继续写入。"""
+
+
+class _ChunkSink:
+    """zipfile 的输出目标：只累积尚未发送的字节，由生成器取走。"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def unique_arcname(arcname, used_names):
+    """同名文件追加 _2、_3 … 后缀，并登记到 used_names。"""
+    base, dot, suffix = arcname.rpartition('.')
+    candidate = arcname
+    counter = 2
+    while candidate in used_names:
+        candidate = f'{base}_{counter}.{suffix}' if dot else f'{arcname}_{counter}'
+        counter += 1
+    used_names.add(candidate)
+    return candidate
+
+
+def compress_type_for(name):
+    if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def write_zip_entry(archive, arcname, file_field, modified_at, chunk_size=FILE_CHUNK_SIZE):
+    """把一个文件分块写入 archive；每写入一块 yield 一次，调用方可在块之间取走输出或更新进度。"""
+    info = zipfile.ZipInfo(arcname, date_time=_zip_date_time(modified_at))
+    info.compress_type = compress_type_for(arcname)
+    size = _safe_size(file_field)
+    try:
+        file_field.open('rb')
+    except OSError as exc:
+        raise ZipSourceUnavailable(f'{arcname}: {exc}') from exc
+    try:
+        with archive.open(info, 'w', force_zip64=size > zipfile.ZIP64_LIMIT) as target:
+            while True:
+                chunk = file_field.read(chunk_size)
+                if not chunk:
+                    break
+                target.write(chunk)
+                yield len(chunk)
+    finally:
+        file_field.close()
+
+
+def write_missing_note(archive, arcname, modified_at):
+    """在 arcname 旁写入“文件缺失”说明，代替无法读取的源文件。"""
+    info = zipfile.ZipInfo(arcname + MISSING_NOTE_SUFFIX, date_time=_zip_date_time(modified_at))
+    info.compress_type = zipfile.ZIP_DEFLATED
+    archive.writestr(info, f'文件缺失：{PurePath(arcname).name} 在服务器存储中已不存在，未能打包。\n')
+
+
+def iter_zip_stream(entries, chunk_size=FILE_CHUNK_SIZE):
+    """把 (arcname, file_field, modified_at) 依次写入 ZIP，逐块产出字节。
+
+    file_field 为 FieldFile（或任何带 open/read/close/size 的文件对象），
+    按 chunk_size 分块读取，任一时刻内存中只有一个块和少量压缩缓冲。
+    响应头发出后无法再返回错误，无法打开的文件改为写入说明条目，保证压缩包完整。
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for arcname, file_field, modified_at in entries:
+            try:
+                for _ in write_zip_entry(archive, arcname, file_field, modified_at, chunk_size):
+                    data = sink.take()
+                    if data:
+                        yield data
+            except ZipSourceUnavailable as exc:
+                logger.warning('打包时跳过无法读取的文件 %s', exc)
+                write_missing_note(archive, arcname, modified_at)
+            data = sink.take()
+            if data:
+                yield data
+    # 中央目录在 ZipFile 关闭时写出
+    data = sink.take()
+    if data:
+        yield data
+
+
+def submission_zip_entries(uploaded_files, prefix=''):
+    """动态表单上传文件 -> iter_zip_stream 的条目，按“[prefix/]字段名/文件名”组织并去重。"""
+    used_names = set()
+    for uploaded in uploaded_files:
+        field_label = uploaded.field.label if uploaded.field_id else '附件'
+        filename = uploaded.original_name or PurePath(uploaded.file.name).name
+        arcname = unique_arcname(f'{prefix}{field_label}/{filename}', used_names)
+        yield arcname, uploaded.file, uploaded.uploaded_at
+
+
+def _safe_size(file_field):
+    try:
+        return file_field.size
+    except (OSError, ValueError):
+        return 0
+
+
+def _zip_date_time(modified_at):
+    # ZIP 时间戳不早于 1980 年，且不含时区
+    if modified_at is None or modified_at.year < 1980:
+        return (1980, 1, 1, 0, 0, 0)
+    if modified_at.tzinfo is not None:
+        modified_at = timezone.localtime(modified_at)
+    return modified_at.timetuple()[:6]